@@ -2,128 +2,236 @@
 """
 Full funnel analysis: matches -> chats -> meetings
 """
+import argparse
 import json
-from datetime import datetime
-
-# Load both datasets
-with open('data/matches.json') as f:
-    matches = json.load(f)
-
-with open('data/conversations_features.min.json') as f:
-    convos = json.load(f)
-
-print("=" * 60)
-print("YOUR COMPLETE HINGE FUNNEL")
-print("=" * 60)
-
-# Stage 1: Total Matches
-total_matches = len(matches)
-print(f"\n📱 STAGE 1: Total Matches")
-print(f"   {total_matches:,} matches")
-
-# Stage 2: Matches with chats
-matches_with_chats = [m for m in matches if m.get('chats') and len(m['chats']) > 0]
-chat_rate = len(matches_with_chats) / total_matches * 100 if total_matches > 0 else 0
-print(f"\n💬 STAGE 2: Got a Response")
-print(f"   {len(matches_with_chats)} matches had chats ({chat_rate:.1f}%)")
-print(f"   ❌ {total_matches - len(matches_with_chats)} never responded")
-
-# Analyze chat depths
-chat_counts = [len(m['chats']) for m in matches_with_chats]
-if chat_counts:
-    avg_msgs = sum(chat_counts) / len(chat_counts)
-    print(f"   📊 Average messages per conversation: {avg_msgs:.1f}")
-    print(f"   📈 Range: {min(chat_counts)} - {max(chat_counts)} messages")
-
-    # Distribution
-    short_convos = sum(1 for c in chat_counts if c < 5)
-    medium_convos = sum(1 for c in chat_counts if 5 <= c < 20)
-    long_convos = sum(1 for c in chat_counts if c >= 20)
-    print(f"\n   Conversation lengths:")
-    print(f"   • Short (1-4 msgs): {short_convos}")
-    print(f"   • Medium (5-19 msgs): {medium_convos}")
-    print(f"   • Long (20+ msgs): {long_convos}")
-
-# Stage 3: We Met tracking
-matches_with_we_met = [m for m in matches if m.get('we_met') and len(m['we_met']) > 0]
-tracking_rate = len(matches_with_we_met) / len(matches_with_chats) * 100 if matches_with_chats else 0
-print(f"\n📝 STAGE 3: Tracked 'We Met' Status")
-print(f"   {len(matches_with_we_met)} conversations tracked ({tracking_rate:.1f}% of chats)")
-
-# Extract meeting data
-all_we_met_responses = []
-for match in matches_with_we_met:
-    for response in match['we_met']:
-        all_we_met_responses.append({
-            'did_meet': response.get('did_meet_subject'),
-            'was_my_type': response.get('was_my_type'),
-            'timestamp': response.get('timestamp')
-        })
-
-met_yes = sum(1 for r in all_we_met_responses if r['did_meet'] == 'Yes')
-met_no = sum(1 for r in all_we_met_responses if r['did_meet'] == 'No')
-
-print(f"\n🤝 STAGE 4: Actually Met")
-print(f"   {met_yes} met in person")
-print(f"   {met_no} did not meet")
-
-if met_yes > 0:
-    my_type = sum(1 for r in all_we_met_responses if r['did_meet'] == 'Yes' and r.get('was_my_type') == True)
-    print(f"   ❤️  {my_type} were your type ({my_type/met_yes*100:.1f}% of meetings)")
-
-# Calculate conversion rates
-print(f"\n" + "=" * 60)
-print("CONVERSION FUNNEL")
-print("=" * 60)
-print(f"Match → Response:  {chat_rate:.1f}%")
-if matches_with_chats:
-    meet_rate_of_chats = met_yes / len(matches_with_chats) * 100
-    print(f"Response → Meet:   {meet_rate_of_chats:.1f}%")
-overall_meet_rate = met_yes / total_matches * 100 if total_matches > 0 else 0
-print(f"Match → Meet:      {overall_meet_rate:.1f}%")
-
-# Who initiated the chats?
-print(f"\n" + "=" * 60)
-print("MESSAGE PATTERNS")
-print("=" * 60)
-
-total_messages = sum(len(m['chats']) for m in matches if m.get('chats'))
-print(f"Total messages sent/received: {total_messages:,}")
-
-# Try to detect who sent first message based on timestamps
-# (Hinge export shows messages from your side)
-first_msg_analysis = []
-for match in matches_with_chats:
-    if match['chats']:
-        first_msg_time = match['chats'][0].get('timestamp')
-        match_time = match.get('match', {}).get('timestamp') if isinstance(match.get('match'), dict) else None
-
-        if first_msg_time:
-            first_msg_analysis.append({
-                'first_msg': first_msg_time,
-                'match_time': match_time
-            })
-
-# Summary stats
-funnel_data = {
-    'total_matches': total_matches,
-    'matches_with_chats': len(matches_with_chats),
-    'chat_rate': round(chat_rate, 1),
-    'avg_messages_per_chat': round(avg_msgs, 1) if chat_counts else 0,
-    'tracked_we_met': len(matches_with_we_met),
-    'met_yes': met_yes,
-    'met_no': met_no,
-    'overall_meet_rate': round(overall_meet_rate, 2),
-    'meet_rate_of_chats': round(meet_rate_of_chats, 1) if matches_with_chats else 0,
-    'total_messages': total_messages,
-    'conversation_distribution': {
-        'short': short_convos,
-        'medium': medium_convos,
-        'long': long_convos
-    }
-}
-
-with open('data/funnel_stats.json', 'w') as f:
-    json.dump(funnel_data, f, indent=2)
-
-print(f"\n✅ Funnel data saved to data/funnel_stats.json")
+from pathlib import Path
+
+from atomic_write import atomic_write
+from hinge_export import export_path, iter_matches
+from profiling import get_profiler
+from sketches import Distribution
+from snapshot import SNAPSHOT_NAME, open_snapshot
+
+
+class FunnelCounter:
+    """Accumulate funnel counts one match at a time
+
+    Counters for separate shards of an export (or separate exports) can be
+    combined with merge().
+    """
+
+    def __init__(self):
+        self.total_matches = 0
+        self.matches_with_chats = 0
+        self.total_messages = 0
+        self.chat_lengths = Distribution()  # messages per conversation
+        self.short_convos = 0
+        self.medium_convos = 0
+        self.long_convos = 0
+        self.matches_with_we_met = 0
+        self.met_yes = 0
+        self.met_no = 0
+        self.my_type = 0
+
+    def add(self, match):
+        self.total_matches += 1
+
+        # Stage 2: Matches with chats
+        chats = match.get('chats')
+        if chats and len(chats) > 0:
+            count = len(chats)
+            self.matches_with_chats += 1
+            self.total_messages += count
+            self.chat_lengths.add(count)
+            if count < 5:
+                self.short_convos += 1
+            elif count < 20:
+                self.medium_convos += 1
+            else:
+                self.long_convos += 1
+
+        # Stage 3: We Met tracking
+        we_met = match.get('we_met')
+        if we_met and len(we_met) > 0:
+            self.matches_with_we_met += 1
+            for response in we_met:
+                did_meet = response.get('did_meet_subject')
+                if did_meet == 'Yes':
+                    self.met_yes += 1
+                    if response.get('was_my_type') == True:
+                        self.my_type += 1
+                elif did_meet == 'No':
+                    self.met_no += 1
+
+    def add_record(self, record, store=None):
+        """Same as add, for a message_store.MatchRecord"""
+        self.total_matches += 1
+        count = record.end - record.start
+        if count:
+            self.matches_with_chats += 1
+            self.total_messages += count
+            self.chat_lengths.add(count)
+            if count < 5:
+                self.short_convos += 1
+            elif count < 20:
+                self.medium_convos += 1
+            else:
+                self.long_convos += 1
+        if record.responses:
+            self.matches_with_we_met += 1
+            self.met_yes += record.met_yes
+            self.met_no += record.met_no
+            self.my_type += record.my_type
+
+    def merge(self, other):
+        """Add another counter's matches to this one; returns self"""
+        for name in ('total_matches', 'matches_with_chats', 'total_messages', 'short_convos',
+                     'medium_convos', 'long_convos', 'matches_with_we_met', 'met_yes', 'met_no', 'my_type'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.chat_lengths.merge(other.chat_lengths)
+        return self
+
+    @property
+    def min_msgs(self):
+        return self.chat_lengths.stats.min
+
+    @property
+    def max_msgs(self):
+        return self.chat_lengths.stats.max
+
+    @property
+    def chat_rate(self):
+        return self.matches_with_chats / self.total_matches * 100 if self.total_matches > 0 else 0
+
+    @property
+    def avg_msgs(self):
+        return self.total_messages / self.matches_with_chats if self.matches_with_chats else 0
+
+    @property
+    def meet_rate_of_chats(self):
+        return self.met_yes / self.matches_with_chats * 100 if self.matches_with_chats else 0
+
+    @property
+    def overall_meet_rate(self):
+        return self.met_yes / self.total_matches * 100 if self.total_matches > 0 else 0
+
+    def summary(self):
+        """Summary stats in the funnel_stats.json layout"""
+        return {
+            'total_matches': self.total_matches,
+            'matches_with_chats': self.matches_with_chats,
+            'chat_rate': round(self.chat_rate, 1),
+            'avg_messages_per_chat': round(self.avg_msgs, 1) if self.matches_with_chats else 0,
+            'tracked_we_met': self.matches_with_we_met,
+            'met_yes': self.met_yes,
+            'met_no': self.met_no,
+            'overall_meet_rate': round(self.overall_meet_rate, 2),
+            'meet_rate_of_chats': round(self.meet_rate_of_chats, 1) if self.matches_with_chats else 0,
+            'total_messages': self.total_messages,
+            'conversation_distribution': {
+                'short': self.short_convos,
+                'medium': self.medium_convos,
+                'long': self.long_convos
+            }
+        }
+
+
+def save_funnel(counter, path):
+    """Write the funnel summary to path"""
+    with atomic_write(path) as f:
+        json.dump(counter.summary(), f, indent=2)
+
+
+def print_report(counter):
+    """Print the funnel walkthrough for a finished counter"""
+    print("=" * 60)
+    print("YOUR COMPLETE HINGE FUNNEL")
+    print("=" * 60)
+
+    # Stage 1: Total Matches
+    print(f"\n📱 STAGE 1: Total Matches")
+    print(f"   {counter.total_matches:,} matches")
+
+    # Stage 2: Matches with chats
+    print(f"\n💬 STAGE 2: Got a Response")
+    print(f"   {counter.matches_with_chats} matches had chats ({counter.chat_rate:.1f}%)")
+    print(f"   ❌ {counter.total_matches - counter.matches_with_chats} never responded")
+
+    # Analyze chat depths
+    if counter.matches_with_chats:
+        print(f"   📊 Average messages per conversation: {counter.avg_msgs:.1f}")
+        print(f"   📈 Range: {counter.min_msgs} - {counter.max_msgs} messages")
+        p90 = counter.chat_lengths.sketch.quantile(0.9)
+        print(f"   📍 Median: {counter.chat_lengths.median} messages (90th percentile: {p90})")
+
+        # Distribution
+        print(f"\n   Conversation lengths:")
+        print(f"   • Short (1-4 msgs): {counter.short_convos}")
+        print(f"   • Medium (5-19 msgs): {counter.medium_convos}")
+        print(f"   • Long (20+ msgs): {counter.long_convos}")
+
+    # Stage 3: We Met tracking
+    tracking_rate = counter.matches_with_we_met / counter.matches_with_chats * 100 if counter.matches_with_chats else 0
+    print(f"\n📝 STAGE 3: Tracked 'We Met' Status")
+    print(f"   {counter.matches_with_we_met} conversations tracked ({tracking_rate:.1f}% of chats)")
+
+    print(f"\n🤝 STAGE 4: Actually Met")
+    print(f"   {counter.met_yes} met in person")
+    print(f"   {counter.met_no} did not meet")
+
+    if counter.met_yes > 0:
+        print(f"   ❤️  {counter.my_type} were your type ({counter.my_type/counter.met_yes*100:.1f}% of meetings)")
+
+    # Calculate conversion rates
+    print(f"\n" + "=" * 60)
+    print("CONVERSION FUNNEL")
+    print("=" * 60)
+    print(f"Match → Response:  {counter.chat_rate:.1f}%")
+    if counter.matches_with_chats:
+        print(f"Response → Meet:   {counter.meet_rate_of_chats:.1f}%")
+    print(f"Match → Meet:      {counter.overall_meet_rate:.1f}%")
+
+    # Who initiated the chats?
+    print(f"\n" + "=" * 60)
+    print("MESSAGE PATTERNS")
+    print("=" * 60)
+    print(f"Total messages sent/received: {counter.total_messages:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--data-dir', default='data',
+                        help='folder holding matches.json and receiving funnel_stats.json')
+    parser.add_argument('--export', metavar='PATH',
+                        help='matches.json or Hinge zip to read (default: <data-dir>/matches.json, '
+                             'or the one .zip in <data-dir>)')
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help=f'parse matches.json directly instead of using <data-dir>/{SNAPSHOT_NAME}')
+    parser.add_argument('--profile', action='store_true',
+                        help='write per-stage timings and memory to <data-dir>/analyze_full_funnel.profile.json')
+    args = parser.parse_args()
+    data_dir = Path(args.data_dir)
+    profiler = get_profiler(args.profile, 'analyze_full_funnel.py')
+
+    counter = FunnelCounter()
+    if args.no_snapshot:
+        add = profiler.wrap('aggregate', counter.add)
+        for match in profiler.iterate('parse', iter_matches(export_path(data_dir, args.export))):
+            add(match)
+    else:
+        add = profiler.wrap('aggregate', counter.add_record)
+        with open_snapshot(data_dir, profiler=profiler, source=args.export) as snapshot:
+            for record in snapshot:
+                add(record)
+
+    print_report(counter)
+
+    output_path = data_dir / 'funnel_stats.json'
+    with profiler.stage('write'):
+        save_funnel(counter, output_path)
+    print(f"\n✅ Funnel data saved to {output_path}")
+    profiler.save(data_dir / 'analyze_full_funnel.profile.json')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,122 +2,199 @@
 """
 Quick analysis script to compute personal Hinge statistics
 """
+import argparse
 import json
 from pathlib import Path
 
-# Load data
-data_path = Path(__file__).parent / 'data' / 'conversations_features.min.json'
-with open(data_path) as f:
-    data = json.load(f)
-
-# Filter valid entries
-valid_data = [d for d in data if d.get('met') in ['Yes', 'No', 'Not yet']]
-
-# Total conversations
-total_convos = len(valid_data)
-print(f"📊 Total Conversations: {total_convos}")
-
-# Meeting stats
-met_yes = [d for d in valid_data if d.get('met') == 'Yes']
-met_no = [d for d in valid_data if d.get('met') == 'No']
-met_not_yet = [d for d in valid_data if d.get('met') == 'Not yet']
-
-meet_count = len(met_yes)
-meet_rate = (meet_count / total_convos * 100) if total_convos > 0 else 0
-print(f"🤝 Met in Person: {meet_count} ({meet_rate:.1f}%)")
-print(f"❌ Did Not Meet: {len(met_no)}")
-print(f"⏳ Not Yet: {len(met_not_yet)}")
-
-# Concrete vs non-concrete invites
-concrete_invites = [d for d in met_yes if d.get('invite_is_concrete') == True]
-non_concrete_invites = [d for d in met_yes if d.get('invite_is_concrete') == False]
-
-print(f"\n📅 Concrete Invites → Met: {len(concrete_invites)}")
-print(f"💬 Non-Concrete Invites → Met: {len(non_concrete_invites)}")
-
-# Best invite timing (among successful meetings)
-invite_indices = [d.get('first_invite_msg_index') for d in met_yes if d.get('first_invite_msg_index') is not None]
-if invite_indices:
-    avg_invite_index = sum(invite_indices) / len(invite_indices)
-    print(f"\n⏱️  Average First Invite Message #: {avg_invite_index:.1f}")
-
-    # Most common range
-    early_invites = sum(1 for i in invite_indices if i <= 3)
-    mid_invites = sum(1 for i in invite_indices if 4 <= i <= 10)
-    late_invites = sum(1 for i in invite_indices if i > 10)
-    print(f"   Early (1-3): {early_invites}, Mid (4-10): {mid_invites}, Late (11+): {late_invites}")
-
-# Question density for successful meetings
-question_densities = [d.get('question_density_first10') for d in met_yes if d.get('question_density_first10') is not None]
-if question_densities:
-    avg_q_density = sum(question_densities) / len(question_densities)
-    print(f"\n❓ Your Avg Question Density (met): {avg_q_density:.2f}")
-
-# Message length for successful meetings
-msg_lengths = [d.get('median_len_first10') for d in met_yes if d.get('median_len_first10') is not None]
-if msg_lengths:
-    avg_msg_len = sum(msg_lengths) / len(msg_lengths)
-    print(f"📝 Your Avg Message Length (met): {avg_msg_len:.1f} chars")
-
-# Quadrants analysis
-print("\n📊 Your Meeting Success by Quadrant:")
-quadrants = {
-    'Short & Curious': [],
-    'Short & Silent': [],
-    'Long & Curious': [],
-    'Long & Silent': []
-}
-
-for d in valid_data:
-    q_density = d.get('question_density_first10')
-    msg_len = d.get('median_len_first10')
-    met = d.get('met')
-
-    if q_density is not None and msg_len is not None:
-        is_curious = q_density > 0.3
-        is_long = msg_len > 120
-
-        if is_curious and not is_long:
-            quadrant = 'Short & Curious'
-        elif is_curious and is_long:
-            quadrant = 'Long & Curious'
-        elif not is_curious and is_long:
-            quadrant = 'Long & Silent'
-        else:
-            quadrant = 'Short & Silent'
-
-        quadrants[quadrant].append(met)
-
-for q_name, outcomes in quadrants.items():
-    if outcomes:
-        yes_count = sum(1 for o in outcomes if o == 'Yes')
-        total = len(outcomes)
-        rate = (yes_count / total * 100) if total > 0 else 0
-        print(f"   {q_name}: {yes_count}/{total} ({rate:.1f}%)")
-
-# Generate JSON summary for dashboard
-summary = {
-    'total_conversations': total_convos,
-    'met_count': meet_count,
-    'meet_rate': round(meet_rate, 1),
-    'concrete_met': len(concrete_invites),
-    'non_concrete_met': len(non_concrete_invites),
-    'avg_invite_index': round(avg_invite_index, 1) if invite_indices else None,
-    'avg_question_density': round(avg_q_density, 2) if question_densities else None,
-    'avg_msg_length': round(avg_msg_len, 1) if msg_lengths else None,
-    'quadrant_stats': {
-        name: {
-            'met': sum(1 for o in outcomes if o == 'Yes'),
-            'total': len(outcomes),
-            'rate': round((sum(1 for o in outcomes if o == 'Yes') / len(outcomes) * 100) if outcomes else 0, 1)
+from atomic_write import atomic_write
+from feature_store import load_features, store_path
+from personal_stats_columns import QUADRANTS, STATS_COLUMNS
+from profiling import NULL_PROFILER, get_profiler
+
+# Feature tables to read, in order of preference: the full one
+# rebuild_features.py and the pipeline write (with its columnar store), else
+# the committed, trimmed table
+FEATURE_TABLES = ['conversations_features.json', 'conversations_features.min.json']
+
+
+def feature_table(data_dir):
+    """Name of the first table in FEATURE_TABLES present in data_dir, as JSON or columnar store"""
+    for name in FEATURE_TABLES:
+        path = Path(data_dir) / name
+        if path.exists() or store_path(path).exists():
+            return name
+    return FEATURE_TABLES[0]
+
+
+def compute_stats(data):
+    """Compute every personal statistic from a list of feature dicts"""
+    # Filter valid entries
+    valid_data = [d for d in data if d.get('met') in ['Yes', 'No', 'Not yet']]
+
+    # Meeting stats
+    met_yes = [d for d in valid_data if d.get('met') == 'Yes']
+    met_no = [d for d in valid_data if d.get('met') == 'No']
+    met_not_yet = [d for d in valid_data if d.get('met') == 'Not yet']
+
+    # Concrete vs non-concrete invites
+    concrete_invites = [d for d in met_yes if d.get('invite_is_concrete') == True]
+    non_concrete_invites = [d for d in met_yes if d.get('invite_is_concrete') == False]
+
+    # Best invite timing (among successful meetings)
+    invite_indices = [d.get('first_invite_msg_index') for d in met_yes if d.get('first_invite_msg_index') is not None]
+
+    # Question density and message length for successful meetings
+    question_densities = [d.get('question_density_first10') for d in met_yes if d.get('question_density_first10') is not None]
+    msg_lengths = [d.get('median_len_first10') for d in met_yes if d.get('median_len_first10') is not None]
+
+    # Quadrants analysis
+    quadrants = {name: [] for name in QUADRANTS}
+
+    for d in valid_data:
+        q_density = d.get('question_density_first10')
+        msg_len = d.get('median_len_first10')
+        met = d.get('met')
+
+        if q_density is not None and msg_len is not None:
+            is_curious = q_density > 0.3
+            is_long = msg_len > 120
+
+            if is_curious and not is_long:
+                quadrant = 'Short & Curious'
+            elif is_curious and is_long:
+                quadrant = 'Long & Curious'
+            elif not is_curious and is_long:
+                quadrant = 'Long & Silent'
+            else:
+                quadrant = 'Short & Silent'
+
+            quadrants[quadrant].append(met)
+
+    return {
+        'total_convos': len(valid_data),
+        'met_yes': len(met_yes),
+        'met_no': len(met_no),
+        'met_not_yet': len(met_not_yet),
+        'concrete_met': len(concrete_invites),
+        'non_concrete_met': len(non_concrete_invites),
+        'avg_invite_index': sum(invite_indices) / len(invite_indices) if invite_indices else None,
+        'early_invites': sum(1 for i in invite_indices if i <= 3),
+        'mid_invites': sum(1 for i in invite_indices if 4 <= i <= 10),
+        'late_invites': sum(1 for i in invite_indices if i > 10),
+        'avg_question_density': sum(question_densities) / len(question_densities) if question_densities else None,
+        'avg_msg_length': sum(msg_lengths) / len(msg_lengths) if msg_lengths else None,
+        'quadrants': {
+            name: (sum(1 for o in outcomes if o == 'Yes'), len(outcomes))
+            for name, outcomes in quadrants.items()
+        },
+    }
+
+
+def build_summary(stats):
+    """JSON summary for the dashboard (personal_stats.json layout)"""
+    total_convos = stats['total_convos']
+    meet_rate = (stats['met_yes'] / total_convos * 100) if total_convos > 0 else 0
+    return {
+        'total_conversations': total_convos,
+        'met_count': stats['met_yes'],
+        'meet_rate': round(meet_rate, 1),
+        'concrete_met': stats['concrete_met'],
+        'non_concrete_met': stats['non_concrete_met'],
+        'avg_invite_index': round(stats['avg_invite_index'], 1) if stats['avg_invite_index'] is not None else None,
+        'avg_question_density': round(stats['avg_question_density'], 2) if stats['avg_question_density'] is not None else None,
+        'avg_msg_length': round(stats['avg_msg_length'], 1) if stats['avg_msg_length'] is not None else None,
+        'quadrant_stats': {
+            name: {
+                'met': met,
+                'total': total,
+                'rate': round((met / total * 100) if total else 0, 1)
+            }
+            for name, (met, total) in stats['quadrants'].items() if total
         }
-        for name, outcomes in quadrants.items() if outcomes
     }
-}
 
-# Save to file
-output_path = Path(__file__).parent / 'data' / 'personal_stats.json'
-with open(output_path, 'w') as f:
-    json.dump(summary, f, indent=2)
 
-print(f"\n✅ Personal stats saved to {output_path}")
+def print_report(stats):
+    """Print the personal stats walkthrough"""
+    total_convos = stats['total_convos']
+    meet_count = stats['met_yes']
+    meet_rate = (meet_count / total_convos * 100) if total_convos > 0 else 0
+
+    print(f"📊 Total Conversations: {total_convos}")
+    print(f"🤝 Met in Person: {meet_count} ({meet_rate:.1f}%)")
+    print(f"❌ Did Not Meet: {stats['met_no']}")
+    print(f"⏳ Not Yet: {stats['met_not_yet']}")
+
+    print(f"\n📅 Concrete Invites → Met: {stats['concrete_met']}")
+    print(f"💬 Non-Concrete Invites → Met: {stats['non_concrete_met']}")
+
+    if stats['avg_invite_index'] is not None:
+        print(f"\n⏱️  Average First Invite Message #: {stats['avg_invite_index']:.1f}")
+        print(f"   Early (1-3): {stats['early_invites']}, Mid (4-10): {stats['mid_invites']}, Late (11+): {stats['late_invites']}")
+
+    if stats['avg_question_density'] is not None:
+        print(f"\n❓ Your Avg Question Density (met): {stats['avg_question_density']:.2f}")
+
+    if stats['avg_msg_length'] is not None:
+        print(f"📝 Your Avg Message Length (met): {stats['avg_msg_length']:.1f} chars")
+
+    print("\n📊 Your Meeting Success by Quadrant:")
+    for q_name, (yes_count, total) in stats['quadrants'].items():
+        if total:
+            rate = (yes_count / total * 100) if total > 0 else 0
+            print(f"   {q_name}: {yes_count}/{total} ({rate:.1f}%)")
+
+
+def save_summary(stats, path):
+    """Write the dashboard summary for stats to path"""
+    with atomic_write(path) as f:
+        json.dump(build_summary(stats), f, indent=2)
+
+
+def compute_personal_stats(data_dir, json_name=FEATURE_TABLES[0], profiler=NULL_PROFILER):
+    """Stats for the features in data_dir, vectorized when NumPy is available"""
+    try:
+        from personal_stats_engine import compute_stats_arrays, load_arrays
+    except ImportError:
+        with profiler.stage('load') as stage:
+            data = load_features(data_dir, json_name, columns=STATS_COLUMNS)
+            stage.items = len(data)
+        with profiler.stage('aggregate'):
+            return compute_stats(data)
+    with profiler.stage('load') as stage:
+        arrays = load_arrays(data_dir, json_name)
+        stage.items = len(arrays['met'])
+    with profiler.stage('aggregate'):
+        return compute_stats_arrays(arrays)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--data-dir', default=Path(__file__).parent / 'data', type=Path,
+                        help='folder holding the feature table and receiving personal_stats.json')
+    parser.add_argument('--features', metavar='NAME',
+                        help=f'feature table in <data-dir> to read (default: {FEATURE_TABLES[0]}, '
+                             f'or {FEATURE_TABLES[1]} when there is none)')
+    parser.add_argument('--profile', action='store_true',
+                        help='write per-stage timings and memory to <data-dir>/analyze_personal_stats.profile.json')
+    args = parser.parse_args()
+    data_dir = args.data_dir
+    profiler = get_profiler(args.profile, 'analyze_personal_stats.py')
+    json_name = args.features or feature_table(data_dir)
+    print(f"Reading {data_dir / json_name}\n")
+
+    # The table's columnar store if it is current, else the JSON
+    stats = compute_personal_stats(data_dir, json_name, profiler=profiler)
+    print_report(stats)
+
+    # Save to file
+    output_path = data_dir / 'personal_stats.json'
+    with profiler.stage('write'):
+        save_summary(stats, output_path)
+
+    print(f"\n✅ Personal stats saved to {output_path}")
+    profiler.save(data_dir / 'analyze_personal_stats.profile.json')
+
+
+if __name__ == '__main__':
+    main()
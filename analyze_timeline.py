@@ -2,46 +2,105 @@
 """
 Analyze timeline of Hinge activity
 """
+import argparse
 import json
-from datetime import datetime
 from collections import Counter
+from pathlib import Path
 
-# Load matches
-with open('data/matches.json') as f:
-    matches = json.load(f)
-
-# Extract all chat timestamps
-all_timestamps = []
-for match in matches:
-    if 'chats' in match and match['chats']:
-        for chat in match['chats']:
-            if 'timestamp' in chat and chat['timestamp']:
-                try:
-                    ts = datetime.strptime(chat['timestamp'], '%Y-%m-%d %H:%M:%S')
-                    all_timestamps.append(ts)
-                except:
-                    pass
-
-print(f"📅 Total messages: {len(all_timestamps)}")
-
-if all_timestamps:
-    all_timestamps.sort()
-    earliest = all_timestamps[0]
-    latest = all_timestamps[-1]
+from atomic_write import atomic_write
+from hinge_export import export_path, iter_matches
+from profiling import get_profiler
+from snapshot import SNAPSHOT_NAME, open_snapshot
+from time_index import INDEX_NAME, TimeIndex, write_index
+from timestamps import TimestampDecoder, from_epoch
+
+
+class TimelineCounter:
+    """Accumulate message activity one match at a time
+
+    Messages are counted per hour; every month/year/weekday/hour breakdown is
+    derived from those buckets, so no per-message timestamps are kept.
+    """
+
+    def __init__(self):
+        self.by_hour_bucket = Counter()  # hours since epoch -> messages
+        self.total_messages = 0
+        self.first_epoch = None
+        self.last_epoch = None
+        self.timestamps = TimestampDecoder()
+
+    def add(self, match):
+        if 'chats' in match and match['chats']:
+            self._add_epochs(self.timestamps.epochs(chat.get('timestamp') for chat in match['chats']))
+
+    def add_record(self, record, store):
+        """Same as add, for a message_store.MatchRecord (failures are counted by the store)"""
+        if record.end > record.start:
+            self._add_epochs(store.epochs(record))
+
+    def _add_epochs(self, epochs):
+        if not epochs:
+            return
+        self.total_messages += len(epochs)
+        self.by_hour_bucket.update(epoch // 3600 for epoch in epochs)
+        first, last = min(epochs), max(epochs)
+        if self.first_epoch is None or first < self.first_epoch:
+            self.first_epoch = first
+        if self.last_epoch is None or last > self.last_epoch:
+            self.last_epoch = last
+
+    @property
+    def earliest(self):
+        return from_epoch(self.first_epoch)
+
+    @property
+    def latest(self):
+        return from_epoch(self.last_epoch)
+
+    def breakdowns(self):
+        """Message counts by month, year, day of week and hour of day
+
+        Buckets are walked in time order so each Counter lists its keys in
+        order of first activity, as it would after sorting every timestamp.
+        """
+        by_month = Counter()
+        by_year = Counter()
+        by_dow = Counter()
+        by_hour = Counter()
+        for hour in sorted(self.by_hour_bucket):
+            count = self.by_hour_bucket[hour]
+            bucket = from_epoch(hour * 3600)
+            by_month[bucket.strftime('%Y-%m')] += count
+            by_year[bucket.year] += count
+            by_dow[bucket.strftime('%A')] += count
+            by_hour[bucket.hour] += count
+        return by_month, by_year, by_dow, by_hour
+
+
+def save_timeline(counter, path):
+    """Write the time index next to path, then the timeline summary rebuilt from it"""
+    index_path = Path(path).with_name(INDEX_NAME)
+    write_index(index_path, counter.by_hour_bucket, counter.first_epoch, counter.last_epoch)
+    with TimeIndex(index_path) as index:
+        summary = index.summary()
+    with atomic_write(path) as f:
+        json.dump(summary, f, indent=2)
+
+
+def print_report(counter):
+    """Print the activity breakdowns for a finished counter"""
+    earliest = counter.earliest
+    latest = counter.latest
+    by_month, by_year, by_dow, by_hour = counter.breakdowns()
 
     print(f"📆 Active from: {earliest.strftime('%B %Y')} to {latest.strftime('%B %Y')}")
     print(f"⏱️  Duration: {(latest - earliest).days} days")
 
-    # Group by month
-    by_month = Counter(ts.strftime('%Y-%m') for ts in all_timestamps)
-
     print(f"\n📊 Monthly Activity (top 10 months):")
     for month, count in by_month.most_common(10):
         bar = '█' * (count // 20)
         print(f"  {month}: {count:4d} {bar}")
 
-    # Group by year
-    by_year = Counter(ts.year for ts in all_timestamps)
     print(f"\n📅 By Year:")
     for year in sorted(by_year.keys()):
         count = by_year[year]
@@ -49,7 +108,6 @@ if all_timestamps:
         print(f"  {year}: {count:4d} {bar}")
 
     # Day of week analysis
-    by_dow = Counter(ts.strftime('%A') for ts in all_timestamps)
     days_ordered = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
     print(f"\n📊 Activity by Day of Week:")
@@ -58,28 +116,59 @@ if all_timestamps:
         bar = '█' * (count // 50)
         print(f"  {day:9s}: {count:4d} {bar}")
 
-    # Hour of day analysis
-    by_hour = Counter(ts.hour for ts in all_timestamps)
-
     print(f"\n🕐 Most Active Hours:")
     for hour in sorted(by_hour.keys(), key=lambda h: by_hour[h], reverse=True)[:5]:
         count = by_hour[hour]
         time_str = f"{hour:02d}:00-{hour+1:02d}:00"
         print(f"  {time_str}: {count:4d} messages")
 
-    # Save timeline data for viz
-    timeline_data = {
-        'earliest': earliest.isoformat(),
-        'latest': latest.isoformat(),
-        'total_messages': len(all_timestamps),
-        'duration_days': (latest - earliest).days,
-        'by_month': [{'month': k, 'count': v} for k, v in sorted(by_month.items())],
-        'by_year': {str(k): v for k, v in by_year.items()},
-        'by_day_of_week': dict(by_dow),
-        'by_hour': {str(k): v for k, v in by_hour.items()}
-    }
-
-    with open('data/timeline_stats.json', 'w') as f:
-        json.dump(timeline_data, f, indent=2)
-
-    print(f"\n✅ Timeline data saved to data/timeline_stats.json")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--data-dir', default='data',
+                        help='folder holding matches.json and receiving timeline_stats.json')
+    parser.add_argument('--export', metavar='PATH',
+                        help='matches.json or Hinge zip to read (default: <data-dir>/matches.json, '
+                             'or the one .zip in <data-dir>)')
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help=f'parse matches.json directly instead of using <data-dir>/{SNAPSHOT_NAME}')
+    parser.add_argument('--profile', action='store_true',
+                        help='write per-stage timings and memory to <data-dir>/analyze_timeline.profile.json')
+    args = parser.parse_args()
+    data_dir = Path(args.data_dir)
+    profiler = get_profiler(args.profile, 'analyze_timeline.py')
+
+    counter = TimelineCounter()
+    if args.no_snapshot:
+        add = profiler.wrap('aggregate', counter.add)
+        for match in profiler.iterate('parse', iter_matches(export_path(data_dir, args.export))):
+            add(match)
+        timestamps = counter.timestamps
+    else:
+        add = profiler.wrap('aggregate', counter.add_record)
+        with open_snapshot(data_dir, profiler=profiler, source=args.export) as snapshot:
+            for record in snapshot:
+                add(record, snapshot)
+            timestamps = snapshot.timestamps
+
+    print(f"📅 Total messages: {counter.total_messages}")
+    if timestamps.failures:
+        print(f"⚠️  Skipped {timestamps.failures} unparseable timestamps")
+
+    if counter.total_messages:
+        print_report(counter)
+
+        # Save timeline data for viz
+        output_path = data_dir / 'timeline_stats.json'
+        with profiler.stage('write'):
+            save_timeline(counter, output_path)
+        print(f"\n✅ Timeline data saved to {output_path}")
+
+    if profiler.enabled:
+        profiler.count('messages', counter.total_messages)
+        profiler.count('timestamps_unparseable', timestamps.failures)
+        profiler.save(data_dir / 'analyze_timeline.profile.json')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Replace output files in one rename, so readers never see a half-written one
+"""
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def tmp_path(path):
+    """Where a new version of path is written before it replaces path"""
+    return Path(f'{path}.tmp')
+
+
+@contextmanager
+def atomic_write(path, mode='w'):
+    """Open a temp file next to path; on success it replaces path
+
+    Until then readers - the stats server, an mmap of the old file - keep
+    seeing the previous version. If the block raises, the temp file is
+    removed and path is left as it was.
+    """
+    tmp = tmp_path(path)
+    try:
+        with open(tmp, mode) as f:
+            yield f
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp, path)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Batch runner: compute every output for many users' exports in one process pool
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from atomic_write import atomic_write
+from hinge_export import EXPORT_NAME, iter_matches
+from pipeline import STAGES, run_pipeline
+from sketches import Distribution, lifespan_distribution
+
+
+def find_exports(input_dir):
+    """{user: export path} for every <user>/matches.json or <user>.zip under input_dir
+
+    Zips are read in place (hinge_export.open_export): each worker inflates
+    its archive on a read-ahead thread while it parses.
+    """
+    exports = {}
+    for entry in sorted(Path(input_dir).iterdir()):
+        if entry.is_dir() and (entry / EXPORT_NAME).exists():
+            exports[entry.name] = entry / EXPORT_NAME
+        elif entry.suffix == '.zip' and entry.is_file():
+            exports[entry.stem] = entry
+    return exports
+
+
+def process_export(user, matches_path, output_dir, incremental=False):
+    """Funnel, timeline, features, personal stats, page aggregates and data cube for one user's export
+
+    Runs inside a pool worker; never raises, so one bad export can't take
+    down the batch. Returns a result dict for the report, with mergeable
+    'distributions' (sketches.Distribution JSON) for the batch-wide summary.
+    """
+    started = time.perf_counter()
+    out_dir = Path(output_dir) / user
+    try:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        options = {'features': {'incremental': incremental}}
+        stages = {name: stage(out_dir, **options.get(name, {})) for name, stage in STAGES.items()}
+        run_pipeline(iter_matches(matches_path, raw=True), stages)
+
+        return {
+            'user': user,
+            'ok': True,
+            'seconds': round(time.perf_counter() - started, 3),
+            'matches': stages['funnel'].counter.total_matches,
+            'conversations': stages['features'].writer.count,
+            'distributions': {
+                'messages_per_chat': stages['funnel'].counter.chat_lengths.to_json(),
+                'lifespan_hours': lifespan_distribution(out_dir).to_json(),
+            },
+        }
+    except Exception as exc:
+        return {
+            'user': user,
+            'ok': False,
+            'seconds': round(time.perf_counter() - started, 3),
+            'error': f'{type(exc).__name__}: {exc}',
+            'traceback': traceback.format_exc(),
+        }
+
+
+def run_batch(exports, output_dir, workers=None, incremental=False):
+    """Process {user: export path} across a worker pool; returns the batch report"""
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(process_export, user, path, output_dir, incremental): user
+                   for user, path in exports.items()}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as exc:
+                # The worker itself died (e.g. killed for running out of memory)
+                result = {'user': futures[future], 'ok': False, 'seconds': None,
+                          'error': f'{type(exc).__name__}: {exc}'}
+            results.append(result)
+            status = f"{result['seconds']:.2f}s" if result['ok'] else f"FAILED ({result['error']})"
+            print(f"  {'✅' if result['ok'] else '❌'} {result['user']}: {status}")
+
+    elapsed = time.perf_counter() - started
+    succeeded = sum(1 for r in results if r['ok'])
+    results.sort(key=lambda r: r['user'])
+
+    # Merged in user order, so the same exports always give the same summary
+    distributions = {}
+    for result in results:
+        for name, data in result.pop('distributions', {}).items():
+            distributions.setdefault(name, Distribution()).merge(Distribution.from_json(data))
+    return {
+        'exports': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'wall_seconds': round(elapsed, 3),
+        'exports_per_minute': round(len(results) / elapsed * 60, 1) if elapsed > 0 else None,
+        'workers': workers or os.cpu_count(),
+        'distributions': {name: distribution.summary(digits=2) for name, distribution in distributions.items()},
+        'users': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('input_dir', help='folder with a sub-folder per user holding matches.json, '
+                                          'or a Hinge zip per user (<user>.zip)')
+    parser.add_argument('output_dir', help='outputs are written to OUTPUT_DIR/<user>/')
+    parser.add_argument('--workers', type=int, default=None, metavar='N',
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='reuse cached feature rows in each user output folder')
+    args = parser.parse_args()
+
+    exports = find_exports(args.input_dir)
+    if not exports:
+        parser.error(f'no <user>/matches.json or <user>.zip exports found under {args.input_dir}')
+
+    print(f"Processing {len(exports)} exports...")
+    report = run_batch(exports, args.output_dir, args.workers, args.incremental)
+
+    report_path = Path(args.output_dir) / 'batch_report.json'
+    with atomic_write(report_path) as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n📦 {report['succeeded']}/{report['exports']} exports in {report['wall_seconds']:.1f}s "
+          f"({report['exports_per_minute']} exports/minute)")
+    lifespan = report['distributions'].get('lifespan_hours')
+    if lifespan and lifespan['count']:
+        print(f"⏳ Median conversation lifespan across users: {lifespan['p50']}h "
+              f"(p10 {lifespan['p10']}h, p90 {lifespan['p90']}h)")
+    if report['failed']:
+        print(f"❌ {report['failed']} failed, see {report_path}")
+    print(f"✅ Report saved to {report_path}")
+    if report['failed']:
+        # So a scheduler or CI job can tell a partial batch from a clean one
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark the analysis scripts on synthetic exports of increasing size
+
+For each size, a seeded export is generated with synth_export.py (and kept
+for later runs), then each script runs in its own process against it. Wall
+time, peak memory (max RSS) and rows/sec are written to a JSON results file;
+pass --baseline to flag scripts that got slower than an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from synth_export import write_export
+
+HERE = Path(__file__).parent
+
+# (script, what its rows are, extra arguments); run in this order, since
+# personal stats reads the features rebuild_features.py writes. Exports are
+# kept between runs, so the scripts that would otherwise build or reuse a
+# snapshot of one parse it every time, and every run measures the same work.
+SCRIPTS = [
+    ('rebuild_features.py', 'matches', ['--no-snapshot']),
+    ('analyze_timeline.py', 'matches', ['--no-snapshot']),
+    ('analyze_full_funnel.py', 'matches', ['--no-snapshot']),
+    ('analyze_personal_stats.py', 'conversations', []),
+]
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def prepare_export(work_dir, matches, seed):
+    """Data folder holding a synthetic export of `matches` matches, plus its counts
+
+    The export is reused when one with the same size and seed already exists.
+    """
+    data_dir = Path(work_dir) / f'{matches}-seed{seed}'
+    counts_path = data_dir / 'synth_counts.json'
+    if counts_path.exists():
+        with open(counts_path) as f:
+            return data_dir, json.load(f)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    print(f"🧪 Generating {matches:,} synthetic matches (seed {seed})...")
+    counts = write_export(data_dir / 'matches.json', matches, seed=seed)
+    with open(counts_path, 'w') as f:
+        json.dump(counts, f)
+    return data_dir, counts
+
+
+def run_script(script, data_dir, extra_args=()):
+    """Run one script against data_dir: (wall seconds, peak RSS in MB, return code)"""
+    started = time.perf_counter()
+    # stdout is discarded; errors still reach the terminal
+    process = subprocess.Popen([sys.executable, str(HERE / script), '--data-dir', str(data_dir), *extra_args],
+                               stdout=subprocess.DEVNULL)
+    # wait4 reports the child's own resource usage, including its max RSS
+    _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - started
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return wall, peak, os.waitstatus_to_exitcode(status)
+
+
+def run_benchmarks(sizes, work_dir, seed=0, scripts=SCRIPTS):
+    """Run every script at every size; returns the list of result records"""
+    results = []
+    for size in sizes:
+        data_dir, counts = prepare_export(work_dir, size, seed)
+        for script, unit, extra_args in scripts:
+            wall, peak, returncode = run_script(script, data_dir, extra_args)
+            rows = counts[unit]
+            results.append({
+                'script': script,
+                'matches': size,
+                'rows': rows,
+                'row_unit': unit,
+                'wall_seconds': round(wall, 3),
+                'peak_rss_mb': round(peak, 1),
+                'rows_per_second': round(rows / wall, 1) if wall > 0 else None,
+                'returncode': returncode,
+            })
+            status = '✅' if returncode == 0 else '❌'
+            print(f"  {status} {script:28s} {size:>9,} matches  {wall:7.2f}s  {peak:7.1f} MB  "
+                  f"{rows / wall:>10,.0f} {unit}/s")
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    """Results slower than the matching baseline entry by more than tolerance"""
+    previous = {(r['script'], r['matches']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['script'], result['matches']))
+        if not before or not before['wall_seconds'] or result['returncode']:
+            continue
+        ratio = result['wall_seconds'] / before['wall_seconds']
+        if ratio > 1 + tolerance:
+            regressions.append({**result, 'baseline_seconds': before['wall_seconds'], 'slowdown': round(ratio, 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='comma-separated export sizes in matches')
+    parser.add_argument('--seed', type=int, default=0, help='generator seed')
+    parser.add_argument('--work-dir', default='bench_data',
+                        help='where synthetic exports and script outputs live')
+    parser.add_argument('--output', default='benchmark_results.json', help='results file to write')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown against the baseline (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    results = run_benchmarks(sizes, args.work_dir, args.seed)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved to {args.output}")
+
+    failed = [r for r in results if r['returncode']]
+    if failed:
+        print(f"❌ {len(failed)} run(s) failed")
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"⚠️  {r['script']} at {r['matches']:,} matches: "
+                  f"{r['baseline_seconds']:.2f}s -> {r['wall_seconds']:.2f}s ({r['slowdown']}x)")
+        if not regressions:
+            print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
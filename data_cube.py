@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Precomputed data cube of meet counts over the feature table
+
+Every conversation with a known met outcome is counted into a cell of
+year x quadrant x invite_is_concrete x first-invite bin x first-message
+delay bin, using the page's bins and quadrant rules (story_stats.py). Each
+dimension also has an ALL member holding its rollup, so any slice - single
+members, lists of members, ALL - is summed from a handful of precomputed
+cells instead of rescanning every row. Written to data/data_cube.json.
+"""
+import argparse
+import json
+from itertools import product
+from pathlib import Path
+
+from atomic_write import atomic_write
+from feature_store import load_features
+from story_stats import (DELAY_BINS, INVITE_BINS, QUADRANTS, delay_bin, invite_bin,
+                         met_value, quadrant_id, wilson_interval)
+
+CUBE_VERSION = 1
+CUBE_NAME = 'data_cube.json'
+
+ALL = 'ALL'
+
+DIMENSIONS = ['year', 'quadrant', 'concrete', 'invite_bin', 'delay_bin']
+
+# Type of each dimension's members besides None. Years depend on the data,
+# so a well-typed year the cube has never seen is an empty slice; the other
+# dimensions list every member up front and anything else is a typo.
+MEMBER_TYPES = {'year': int, 'quadrant': str, 'concrete': bool, 'invite_bin': str, 'delay_bin': str}
+OPEN_DIMENSIONS = {'year'}
+
+CUBE_COLUMNS = ['year', 'met', 'invite_is_concrete', 'first_invite_msg_index',
+                'first_msg_delay_minutes', 'question_density_first10', 'median_len_first10']
+
+
+def row_members(d):
+    """The cube coordinates (one member per dimension) of a feature row"""
+    delay = delay_bin(d.get('first_msg_delay_minutes'))
+    concrete = d.get('invite_is_concrete')
+    return (
+        d.get('year'),
+        quadrant_id(d),
+        concrete if isinstance(concrete, bool) else None,
+        invite_bin(d.get('first_invite_msg_index'))['id'],
+        delay['id'] if delay else None,
+    )
+
+
+def _rate(successes, total):
+    """Same fields as story_stats.summarize_rate"""
+    return {
+        'rate': successes / total if total else None,
+        'total': total,
+        'successes': successes,
+        'ci': wilson_interval(successes, total),
+    }
+
+
+class DataCube:
+    """Met / total counts for every cell, with ALL rollups along each dimension
+
+    Cells are stored flat in row-major order; member i of a dimension has
+    index i and ALL comes last. None is a real member ("no value"), e.g. a
+    conversation without a first message has delay_bin None.
+    """
+
+    def __init__(self, members, met, total):
+        self.members = members
+        self.shape = [len(members[dim]) + 1 for dim in DIMENSIONS]
+        self.strides = []
+        stride = 1
+        for size in reversed(self.shape):
+            self.strides.insert(0, stride)
+            stride *= size
+        if len(met) != stride or len(total) != stride:
+            raise ValueError(f'expected {stride} cells, got {len(met)} / {len(total)}')
+        self.met = met
+        self.total = total
+        self._index = {dim: {member: i for i, member in enumerate(members[dim])} for dim in DIMENSIONS}
+
+    @classmethod
+    def build(cls, records):
+        """Count feature rows into a new cube and fill in its rollups"""
+        years = sorted({d.get('year') for d in records if isinstance(d.get('year'), int)})
+        members = {
+            'year': years + [None],
+            'quadrant': [q['id'] for q in QUADRANTS] + [None],
+            'concrete': [True, False, None],
+            'invite_bin': [b['id'] for b in INVITE_BINS],
+            'delay_bin': [b['id'] for b in DELAY_BINS] + [None],
+        }
+        index = [{member: i for i, member in enumerate(members[dim])} for dim in DIMENSIONS]
+        base = {}
+        for d in records:
+            met = met_value(d.get('met'))
+            if met is None:
+                continue
+            coords = row_members(d)
+            if not isinstance(coords[0], int):
+                coords = (None,) + coords[1:]
+            key = tuple(lookup[member] for lookup, member in zip(index, coords))
+            counts = base.setdefault(key, [0, 0])
+            counts[0] += met
+            counts[1] += 1
+
+        size = 1
+        for dim in DIMENSIONS:
+            size *= len(members[dim]) + 1
+        cube = cls(members, [0] * size, [0] * size)
+        for key, (met, total) in base.items():
+            flat = sum(i * s for i, s in zip(key, cube.strides))
+            cube.met[flat] = met
+            cube.total[flat] = total
+        cube._roll_up()
+        return cube
+
+    def _roll_up(self):
+        # Folding each dimension into its ALL slot in turn leaves every
+        # combination of ALLs holding the sum of the cells it covers
+        met, total = self.met, self.total
+        for n, stride in zip(self.shape, self.strides):
+            last = n - 1
+            for flat in range(len(total)):
+                coord = (flat // stride) % n
+                if coord != last and total[flat]:
+                    target = flat + (last - coord) * stride
+                    met[target] += met[flat]
+                    total[target] += total[flat]
+
+    def _positions(self, dim, value):
+        if value is ALL or value == ALL:
+            return [len(self.members[dim])]
+        values = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+        lookup = self._index[dim]
+        member_type = MEMBER_TYPES[dim]
+        positions = set()
+        for v in values:
+            # Checked before the lookup: True == 1 hashes alike, so year=True
+            # or concrete=1 would otherwise find a cell
+            if v is not None and (not isinstance(v, member_type)
+                                  or isinstance(v, bool) and member_type is not bool):
+                raise ValueError(f'{dim} members are {member_type.__name__} or None, not {v!r}')
+            if v in lookup:
+                positions.add(lookup[v])
+            elif dim not in OPEN_DIMENSIONS:
+                raise ValueError(f'unknown {dim} member {v!r}; have {self.members[dim]}')
+        return sorted(positions)
+
+    def counts(self, **filters):
+        """(met, total) for a slice; each filter is a member, a list of members or ALL
+
+        A year with no conversations counts as (0, 0); a member of the wrong
+        type, or an unknown quadrant or bin, raises ValueError.
+        """
+        unknown = set(filters) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"unknown dimension(s) {', '.join(sorted(unknown))}")
+        axes = [self._positions(dim, filters.get(dim, ALL)) for dim in DIMENSIONS]
+        met = total = 0
+        for coords in product(*axes):
+            flat = sum(i * s for i, s in zip(coords, self.strides))
+            met += self.met[flat]
+            total += self.total[flat]
+        return met, total
+
+    def query(self, **filters):
+        """Meet rate for a slice: {'rate', 'total', 'successes', 'ci'} (Wilson 95%)"""
+        return _rate(*self.counts(**filters))
+
+    def breakdown(self, dim, **filters):
+        """query() for each member of dim within the slice, skipping empty members"""
+        out = []
+        for member in self.members[dim]:
+            result = self.query(**{**filters, dim: member})
+            if result['total']:
+                out.append({dim: member, **result})
+        return out
+
+    def to_json(self):
+        return {
+            'version': CUBE_VERSION,
+            'dimensions': DIMENSIONS,
+            'members': self.members,
+            'shape': self.shape,
+            'met': self.met,
+            'total': self.total,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get('version') != CUBE_VERSION:
+            raise ValueError(f"unsupported data cube version {data.get('version')}")
+        return cls(data['members'], data['met'], data['total'])
+
+    def save(self, path):
+        with atomic_write(path) as f:
+            json.dump(self.to_json(), f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_json(json.load(f))
+
+
+def build_cube(data_dir, json_name='conversations_features.json'):
+    """Cube over the feature table in data_dir (columnar store when present)"""
+    return DataCube.build(load_features(data_dir, json_name, columns=CUBE_COLUMNS))
+
+
+def _parse_member(dim, text):
+    if text.lower() in ('null', 'none'):
+        return None
+    if dim == 'year':
+        return int(text)
+    if dim == 'concrete':
+        if text.lower() not in ('true', 'false'):
+            raise ValueError(f'concrete is true, false or null, not {text!r}')
+        return text.lower() == 'true'
+    return text
+
+
+def parse_filters(terms):
+    """['year=2022,2023', 'concrete=true'] -> {'year': [2022, 2023], 'concrete': True}"""
+    filters = {}
+    for term in terms:
+        dim, _, value = term.partition('=')
+        if dim not in DIMENSIONS or not value:
+            raise ValueError(f'bad filter {term!r}; use dimension=member[,member...] '
+                             f"with one of {', '.join(DIMENSIONS)}")
+        members = [_parse_member(dim, part) for part in value.split(',')]
+        filters[dim] = members if len(members) > 1 else members[0]
+    return filters
+
+
+def _format(result):
+    if result['rate'] is None:
+        return 'no conversations'
+    ci = result['ci']
+    return (f"{result['successes']}/{result['total']} met ({result['rate'] * 100:.1f}%, "
+            f"95% CI {ci['lower'] * 100:.1f}–{ci['upper'] * 100:.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default='data',
+                        help='folder holding the feature table and receiving data_cube.json')
+    parser.add_argument('--query', nargs='*', metavar='DIM=MEMBER',
+                        help='print a slice of the saved cube instead of rebuilding it, '
+                             'e.g. year=2023 concrete=true invite_bin=3-5,6-10')
+    parser.add_argument('--by', choices=DIMENSIONS, help='break the --query slice down by a dimension')
+    args = parser.parse_args()
+    cube_path = Path(args.data_dir) / CUBE_NAME
+
+    if args.query is not None or args.by:
+        try:
+            filters = parse_filters(args.query or [])
+            cube = DataCube.load(cube_path)
+            print(f"🧊 {' '.join(args.query or []) or 'everything'}: {_format(cube.query(**filters))}")
+            if args.by:
+                for row in cube.breakdown(args.by, **filters):
+                    print(f"   {str(row[args.by]):14s} {_format(row)}")
+        except (ValueError, FileNotFoundError) as exc:
+            parser.error(str(exc))
+        return
+
+    cube = build_cube(args.data_dir)
+    cube.save(cube_path)
+    print(f"🧊 Data cube over {cube.query()['total']:,} conversations with a known outcome")
+    for row in cube.breakdown('year'):
+        print(f"   {str(row['year']):6s} {_format(row)}")
+    print(f"✅ Data cube saved to {cube_path} ({cube_path.stat().st_size / 1024:.1f} KB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Persistent per-match feature cache for incremental rebuilds
+"""
+import hashlib
+import json
+from pathlib import Path
+
+from atomic_write import atomic_write
+
+CACHE_NAME = '.feature_cache.json'
+
+MISS = object()
+
+
+def match_key(match, raw=None):
+    """Stable key for a match: its timestamp plus a content hash
+
+    When the match's source JSON text is at hand (iter_matches(raw=True)),
+    that text is hashed directly, which is several times cheaper than
+    re-serializing chats and we_met; any edit to the record changes the key.
+    """
+    match_data = match.get('match', {})
+    match_time = match_data.get('timestamp') if isinstance(match_data, dict) else None
+    if raw is None:
+        raw = json.dumps([match.get('chats'), match.get('we_met')],
+                         sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    digest = hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    return f"{match_time or ''}|{digest}"
+
+
+def feature_signature(version, matcher):
+    """Fingerprint of everything besides the match that shapes a feature row"""
+    config = json.dumps([version, matcher.invite_keywords, matcher.concrete_indicators])
+    return hashlib.blake2b(config.encode(), digest_size=16).hexdigest()
+
+
+class FeatureCache:
+    """Map match keys to computed feature rows across runs
+
+    Rows computed under a different signature are discarded. Only keys seen
+    in the current run are saved back, so matches that disappeared from the
+    export are dropped.
+    """
+
+    def __init__(self, path, signature):
+        self.path = Path(path)
+        self.signature = signature
+        self.hits = 0
+        self.misses = 0
+        self._previous = {}
+        self._current = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                cached = json.load(f)
+            if cached.get('signature') == signature:
+                self._previous = cached['rows']
+
+    def get(self, key):
+        """Cached row for key (counted as a hit), or MISS"""
+        row = self._current.get(key, MISS)
+        if row is MISS:
+            row = self._previous.get(key, MISS)
+            if row is MISS:
+                return MISS
+            self._current[key] = row
+        self.hits += 1
+        return row
+
+    def cached_keys(self):
+        """Keys of the rows loaded from disk, for workers to skip"""
+        return frozenset(self._previous)
+
+    def put(self, key, row):
+        """Remember a freshly computed row (counted as a miss)"""
+        self.misses += 1
+        self._current[key] = row
+
+    def row(self, match, compute, raw=None):
+        """Cached feature row for match, computing (and remembering) it on a miss"""
+        key = match_key(match, raw)
+        row = self.get(key)
+        if row is MISS:
+            row = compute(match)
+            self.put(key, row)
+        return row
+
+    @property
+    def dropped(self):
+        """Cached matches that did not appear in this run"""
+        return sum(1 for key in self._previous if key not in self._current)
+
+    def save(self):
+        """Persist this run's rows (skipped when nothing changed)"""
+        if not self.misses and len(self._current) == len(self._previous):
+            return
+        with atomic_write(self.path) as f:
+            json.dump({'signature': self.signature, 'rows': self._current}, f, separators=(',', ':'))
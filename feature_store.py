@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Columnar, memory-mappable store for the conversation feature table
+
+File layout: an 8-byte magic, a little-endian uint32 header length, a JSON
+header describing each column, then one 8-byte aligned section per column
+(and per validity mask). Readers mmap the file and only touch the pages of
+the columns they ask for.
+
+A store mirrors one feature JSON - conversations_features.json ->
+conversations_features.cols - and records that file's size and mtime, so
+readers can tell when the JSON has changed since and fall back to it.
+"""
+import json
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from atomic_write import atomic_write
+
+MAGIC = b'HFEATCOL'
+VERSION = 1
+
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+# Column name -> (kind, array typecode). Timestamps are int64 epoch seconds,
+# enums are uint8 codes where 0 means null; everything else nullable carries
+# a uint8 validity mask (1 = value present).
+SCHEMA = {
+    'match_time': ('timestamp', 'q'),
+    'first_msg_time': ('timestamp', 'q'),
+    'last_msg_time': ('timestamp', 'q'),
+    'duration_hours': ('float', 'd'),
+    'first_msg_delay_minutes': ('float', 'd'),
+    'first_invite_msg_index': ('float', 'd'),
+    'invite_is_concrete': ('enum', 'B'),
+    'question_density_first10': ('float', 'd'),
+    'median_len_first10': ('float', 'd'),
+    'met': ('enum', 'B'),
+    'year': ('int', 'i'),
+    'num_messages': ('int', 'i'),
+}
+
+ENUMS = {
+    'invite_is_concrete': [False, True],
+    'met': ['Yes', 'No', 'Not yet'],
+}
+
+# met codes, for readers that work on the raw column
+MET_YES, MET_NO, MET_NOT_YET = 1, 2, 3
+
+STORE_NAME = 'conversations_features.cols'
+
+# Rows buffered per column before they are appended to its temp section file
+SPILL_ROWS = 16384
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def store_path(json_path):
+    """Path of the store mirroring a feature JSON: same folder and stem, .cols"""
+    return Path(json_path).with_suffix('.cols')
+
+
+def source_stamp(path):
+    """Name, size and mtime of a feature JSON, as recorded in its store's header"""
+    stat = Path(path).stat()
+    return {'name': Path(path).name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def timestamp_to_epoch(value):
+    """ISO timestamp string -> int epoch seconds"""
+    return (datetime.fromisoformat(value) - EPOCH) // ONE_SECOND
+
+
+def epoch_to_timestamp(value):
+    """int epoch seconds -> ISO timestamp string, as written by rebuild_features.py"""
+    return (EPOCH + timedelta(seconds=value)).isoformat()
+
+
+class FeatureStoreWriter:
+    """Collect feature rows into typed columns and write them as a store
+
+    Each column (and validity mask) is buffered for SPILL_ROWS rows, then
+    appended to its own anonymous temp file, so memory stays flat however
+    many rows arrive; close() concatenates the sections into the store.
+    source is the JSON the store mirrors; it is stamped when the store is
+    closed, so it must be complete by then.
+    """
+
+    def __init__(self, path, source=None):
+        self.path = path
+        self.source = source
+        self.count = 0
+        self.values = {name: array(code) for name, (kind, code) in SCHEMA.items()}
+        self.valid = {name: array('B') for name, (kind, code) in SCHEMA.items() if kind != 'enum'}
+        self.codes = {name: {value: code for code, value in enumerate(values, 1)}
+                      for name, values in ENUMS.items()}
+        self._spills = {}
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def write(self, row):
+        for name, (kind, code) in SCHEMA.items():
+            value = row.get(name)
+            if kind == 'enum':
+                self.values[name].append(self.codes[name].get(value, 0) if value is not None else 0)
+                continue
+            if value is None:
+                self.values[name].append(0)
+                self.valid[name].append(0)
+                continue
+            if kind == 'timestamp':
+                value = timestamp_to_epoch(value)
+            self.values[name].append(value)
+            self.valid[name].append(1)
+        self.count += 1
+        self._buffered += 1
+        if self._buffered >= SPILL_ROWS:
+            self._spill()
+
+    def _buffers(self):
+        """(section key, buffer) for every section, in file order"""
+        for name, (kind, code) in SCHEMA.items():
+            yield (name, 'values'), self.values[name]
+            if kind != 'enum':
+                yield (name, 'valid'), self.valid[name]
+
+    def _spill(self):
+        for key, buffer in self._buffers():
+            spill = self._spills.get(key)
+            if spill is None:
+                spill = self._spills[key] = tempfile.TemporaryFile(dir=Path(self.path).parent)
+            buffer.tofile(spill)
+            del buffer[:]
+        self._buffered = 0
+
+    def close(self):
+        self._spill()
+        columns = {}
+        offset = 0
+        for name, (kind, code) in SCHEMA.items():
+            column = {'kind': kind, 'type': code, 'offset': offset}
+            offset = _align(offset + self.count * self.values[name].itemsize)
+            if kind == 'enum':
+                column['values'] = ENUMS[name]
+            else:
+                column['valid_offset'] = offset
+                offset = _align(offset + self.count)
+            columns[name] = column
+
+        header = json.dumps({
+            'version': VERSION,
+            'rows': self.count,
+            'byteorder': sys.byteorder,
+            'source': source_stamp(self.source) if self.source is not None else None,
+            'columns': columns,
+        }).encode()
+        data_start = _align(len(MAGIC) + 4 + len(header))
+
+        with atomic_write(self.path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<I', len(header)) + header)
+            f.write(b'\0' * (data_start - f.tell()))
+            for key, buffer in self._buffers():
+                size = self.count * buffer.itemsize
+                spill = self._spills.get(key)
+                if spill is not None:
+                    spill.seek(0)
+                    shutil.copyfileobj(spill, f)
+                f.write(b'\0' * (_align(size) - size))
+        self.discard()
+
+    def discard(self):
+        """Drop the spilled sections without writing a store"""
+        for spill in self._spills.values():
+            spill.close()
+        self._spills = {}
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+def write_store(rows, path, source=None):
+    """Write an iterable of feature dicts to a columnar store at path"""
+    with FeatureStoreWriter(path, source) as writer:
+        for row in rows:
+            writer.write(row)
+    return writer.count
+
+
+class FeatureStore:
+    """Read-only, memory-mapped view of a columnar feature store"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a feature store')
+        (header_len,) = struct.unpack_from('<I', self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        self.header = json.loads(self._mmap[header_start:header_start + header_len])
+        if self.header['version'] != VERSION:
+            raise ValueError(f"unsupported feature store version {self.header['version']}")
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {self.header['byteorder']}-endian machine")
+        self.columns = self.header['columns']
+        self._data_start = _align(header_start + header_len)
+        self._buffer = memoryview(self._mmap)
+
+    def __len__(self):
+        return self.header['rows']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        try:
+            self._buffer.release()
+            self._mmap.close()
+        except BufferError:
+            # Column views are still in use; the map is released with them
+            pass
+
+    def _section(self, offset, code):
+        start = self._data_start + offset
+        size = len(self) * array(code).itemsize
+        return self._buffer[start:start + size].cast(code)
+
+    def values(self, name):
+        """Raw column as a zero-copy typed memoryview (enum codes for enums)"""
+        column = self.columns[name]
+        return self._section(column['offset'], column['type'])
+
+    def valid(self, name):
+        """Validity mask for a nullable column (uint8, 1 = present), or None for enums"""
+        column = self.columns[name]
+        if 'valid_offset' not in column:
+            return None
+        return self._section(column['valid_offset'], 'B')
+
+    def column(self, name):
+        """Decoded column as a list of Python values, None for nulls"""
+        column = self.columns[name]
+        values = self.values(name)
+        if column['kind'] == 'enum':
+            lookup = [None] + column['values']
+            return [lookup[code] for code in values]
+        valid = self.valid(name)
+        if column['kind'] == 'timestamp':
+            return [epoch_to_timestamp(v) if ok else None for v, ok in zip(values, valid)]
+        return [v if ok else None for v, ok in zip(values, valid)]
+
+    def rows(self, names=None):
+        """Rebuild row dicts (only for the requested columns)"""
+        names = list(names or self.columns)
+        columns = [self.column(name) for name in names]
+        return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+def open_store(json_path):
+    """The FeatureStore mirroring json_path, or None if there is none or it is stale
+
+    A store is current while the size and mtime recorded for its source match
+    the JSON on disk. With the JSON gone, the store is all there is.
+    """
+    path = store_path(json_path)
+    if not path.exists():
+        return None
+    store = FeatureStore(path)
+    try:
+        current = source_stamp(json_path)
+    except FileNotFoundError:
+        return store
+    if store.header.get('source') != current:
+        store.close()
+        return None
+    return store
+
+
+def load_features(data_dir, json_name='conversations_features.json', columns=None):
+    """Feature rows from json_name's columnar store if it is current, else from the JSON"""
+    json_path = Path(data_dir) / json_name
+    store = open_store(json_path)
+    if store is not None:
+        with store:
+            return store.rows(columns)
+    with open(json_path) as f:
+        return json.load(f)
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print(f"usage: {sys.argv[0]} FEATURES_JSON [OUTPUT]")
+        sys.exit(2)
+    source = Path(sys.argv[1])
+    target = Path(sys.argv[2]) if len(sys.argv) == 3 else store_path(source)
+
+    with open(source) as f:
+        rows = json.load(f)
+    count = write_store(rows, target, source)
+
+    print(f"✅ Wrote {count} rows to {target}")
+    print(f"   {source.stat().st_size / 1024:.1f} KB JSON -> {target.stat().st_size / 1024:.1f} KB columnar")
+
+
+if __name__ == '__main__':
+    main()
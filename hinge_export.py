@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Helpers for reading the Hinge "Download My Data" matches.json export
+
+The export can be read as a plain matches.json or straight from the
+downloaded zip: the member is inflated on the fly, never written to disk.
+"""
+import codecs
+import json
+import queue
+import threading
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+
+CHUNK_SIZE = 1 << 20
+EXPORT_NAME = 'matches.json'
+READ_AHEAD_CHUNKS = 4
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+
+
+def iter_matches(path, chunk_size=CHUNK_SIZE, raw=False):
+    """Yield matches from a matches.json export (or its zip) one at a time
+
+    The export is a single top-level JSON array. Instead of json.load-ing the
+    whole file, read it in chunks and decode one element at a time, so memory
+    stays bounded by the largest single match rather than the whole export.
+    With raw=True, yield (match, exact JSON text of the match) pairs.
+    """
+    with open_export(path, chunk_size) as f:
+        yield from iter_json_array(f, chunk_size, raw)
+
+
+def iter_match_texts(path, chunk_size=CHUNK_SIZE):
+    """Yield the exact JSON text of every match in an export, for other processes to parse
+
+    Finding where a match ends still means scanning it, and the C JSON
+    decoder does that faster than a regex or NumPy bracket scan; but each
+    parsed match is dropped at once, so the caller pays for the split only.
+    """
+    for _, text in iter_matches(path, chunk_size, raw=True):
+        yield text
+
+
+def export_path(data_dir, export=None):
+    """The export to read: export if given, else data_dir/matches.json, else
+    the only .zip in data_dir (a Download My Data archive dropped in as is)
+    """
+    if export is not None:
+        return Path(export)
+    data_dir = Path(data_dir)
+    path = data_dir / EXPORT_NAME
+    if not path.exists():
+        archives = sorted(data_dir.glob('*.zip'))
+        if len(archives) == 1:
+            return archives[0]
+    return path
+
+
+def find_member(archive):
+    """Name of the matches.json member of a Download My Data zip (the shallowest one)"""
+    names = [info.filename for info in archive.infolist()
+             if not info.is_dir() and PurePosixPath(info.filename).name.lower() == EXPORT_NAME]
+    if not names:
+        raise ValueError(f'no {EXPORT_NAME} in {archive.filename}')
+    return min(names, key=lambda name: (name.count('/'), name))
+
+
+@contextmanager
+def open_export(path, chunk_size=CHUNK_SIZE):
+    """Text stream of an export: a matches.json file, or the one inside a zip
+
+    A zip member is decompressed by a ReadAhead thread while the caller
+    parses, so inflating the next chunks overlaps with decoding this one.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive, archive.open(find_member(archive)) as member, \
+                ReadAhead(member, chunk_size) as stream:
+            yield stream
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield f
+
+
+class ReadAhead:
+    """Text reader over a binary stream, filled by a background thread
+
+    The thread reads (for a zip member: inflates) and UTF-8 decodes up to
+    `depth` chunks ahead of the consumer. zlib and file reads release the
+    GIL, so this work runs alongside parsing. read() returns whole chunks,
+    whatever size is asked for, and '' only at the end.
+    """
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE, depth=READ_AHEAD_CHUNKS):
+        self._queue = queue.Queue(depth)
+        self._closed = threading.Event()
+        self._done = False
+        self._thread = threading.Thread(target=self._fill, args=(stream, chunk_size), daemon=True)
+        self._thread.start()
+
+    def _fill(self, stream, chunk_size):
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            while True:
+                data = stream.read(chunk_size)
+                text = decoder.decode(data, final=not data)
+                # An empty string would read as end of file
+                if text and not self._put(text):
+                    return
+                if not data:
+                    self._put(None)
+                    return
+        except Exception as exc:
+            self._put(exc)
+
+    def _put(self, item):
+        """Queue item, blocking while full; False once the reader is closed"""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read(self, size=-1):
+        if self._done:
+            return ''
+        item = self._queue.get()
+        if item is None or isinstance(item, Exception):
+            self._done = True
+            if item is not None:
+                raise item
+            return ''
+        return item
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE, raw=False):
+    """Yield the elements of a top-level JSON array read from a text stream
+
+    With raw=True, yield (element, element's source text) pairs instead.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill(size):
+        nonlocal buf, pos, eof
+        data = stream.read(size)
+        if not data:
+            eof = True
+        # Drop consumed text so the buffer never grows with the file
+        buf = buf[pos:] + data
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill(chunk_size)
+
+    fill(chunk_size)
+    skip_whitespace()
+    if pos >= len(buf) or buf[pos] != '[':
+        raise ValueError('matches export must be a JSON array')
+    pos += 1
+
+    skip_whitespace()
+    if pos < len(buf) and buf[pos] == ']':
+        return
+
+    read_size = chunk_size
+    while True:
+        skip_whitespace()
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Element straddles the chunk boundary: read more and retry,
+            # doubling the read so one huge match stays linear
+            fill(read_size)
+            read_size *= 2
+            continue
+        if not eof and (end == len(buf) or buf[end] not in _DELIMITERS):
+            # A bare number could have been cut short; make sure it is complete
+            fill(read_size)
+            continue
+        read_size = chunk_size
+        if raw:
+            yield item, buf[pos:end]
+        else:
+            yield item
+        pos = end
+
+        skip_whitespace()
+        if pos >= len(buf):
+            raise ValueError('unexpected end of matches export')
+        if buf[pos] == ']':
+            return
+        if buf[pos] != ',':
+            raise ValueError(f'expected "," or "]" in matches export, got {buf[pos]!r}')
+        pos += 1
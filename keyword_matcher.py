@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Precompiled multi-keyword matcher for invite detection
+"""
+import json
+import re
+
+
+def trie_pattern(keywords):
+    """Compile keywords into one regex alternation factored by common prefixes
+
+    A trie-shaped pattern lets the regex engine reject a position after one
+    or two characters instead of retrying every keyword there.
+    """
+    if not keywords:
+        return '(?!)'  # never matches, like any() over an empty list
+
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        alternatives = [re.escape(ch) + build(child)
+                        for ch, child in sorted(node.items()) if ch != '']
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        if '' in node:
+            # A keyword ends here, so the longer continuations are optional
+            body = '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Invite / concrete-plan keyword lists compiled to single regexes"""
+
+    def __init__(self, invite_keywords, concrete_indicators):
+        self.invite_keywords = list(invite_keywords)
+        self.concrete_indicators = list(concrete_indicators)
+        self._invite = re.compile(trie_pattern(self.invite_keywords))
+        self._concrete = re.compile(trie_pattern(self.concrete_indicators))
+
+    @classmethod
+    def from_file(cls, path):
+        """Load keyword lists from JSON: {"invite": [...], "concrete": [...]}"""
+        with open(path) as f:
+            config = json.load(f)
+        return cls(config['invite'], config['concrete'])
+
+    def is_invite(self, text):
+        """True if any invite keyword occurs in text (already lowercased)"""
+        return self._invite.search(text) is not None
+
+    def is_concrete(self, text):
+        """True if any concrete-plan indicator occurs in text (already lowercased)"""
+        return self._concrete.search(text) is not None
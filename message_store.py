@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Compact, array-backed in-memory copy of a Hinge export
+
+A parsed export is a list of nested dicts with a string timestamp and the
+full body of every message - hundreds of bytes per message. The analyses
+only need each message's time, length and a few flags, so MessageStore
+keeps one small __slots__ record per match plus flat typed arrays for all
+messages (int64 epoch seconds, int32 body lengths, uint8 flag bits), with
+each record pointing at its [start, end) range. Bodies are dropped as soon
+as the flags are derived.
+
+Funnel, timeline and feature rows computed from a store are identical to
+the ones computed from the parsed export.
+"""
+import argparse
+import sys
+import time
+from array import array
+
+from feature_cache import match_key
+from hinge_export import export_path, iter_matches
+from rebuild_features import INVITE_MATCHER, feature_row, median_of_lengths, met_status
+from timestamps import MISSING, TimestampDecoder, from_epoch
+
+# Per-message flag bits
+QUESTION = 1      # body contains '?'
+FIRST_INVITE = 2  # first message in the conversation matching an invite keyword
+CONCRETE = 4      # ... and it names a concrete plan
+
+FEATURE_MESSAGES = 10  # question density / median length look at the first 10
+
+
+class MatchRecord:
+    """One match: its time, message range and we_met outcome"""
+
+    __slots__ = ('match_time', 'start', 'end', 'first_invite', 'met',
+                 'responses', 'met_yes', 'met_no', 'my_type', 'key', 'unparsed')
+
+    @property
+    def num_messages(self):
+        return self.end - self.start
+
+
+class MessageStore:
+    """Matches as MatchRecords over flat per-message arrays
+
+    matcher decides the invite flags. With keep_keys, each record also keeps its
+    feature cache key (feature_cache.match_key), for incremental rebuilds.
+    """
+
+    def __init__(self, matcher=INVITE_MATCHER, keep_keys=False):
+        self.matcher = matcher
+        self.keep_keys = keep_keys
+        self.records = []
+        self.times = array('q')
+        self.lengths = array('i')
+        self.flags = array('B')
+        self.timestamps = TimestampDecoder()  # message timestamps
+        self.match_timestamps = TimestampDecoder()
+        # Unparseable timestamps behind the feature rows built so far, counted
+        # like build_feature_row's parses (see MatchRecord.unparsed)
+        self.row_failures = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def add(self, match, raw=None):
+        """Compact one parsed match into the store; returns its record"""
+        record = MatchRecord()
+        match_data = match.get('match', {})
+        failures = self.match_timestamps.failures
+        epoch = self.match_timestamps.epoch(match_data.get('timestamp')) if isinstance(match_data, dict) else None
+        record.match_time = MISSING if epoch is None else epoch
+        record.start = len(self.times)
+        record.first_invite = 0
+        # Of the match, first and last message timestamps - the ones a
+        # feature row reads - how many were present but unparseable
+        record.unparsed = self.match_timestamps.failures - failures
+
+        chats = match.get('chats') or []
+        if chats:
+            self.times.extend(self.timestamps.epochs((chat.get('timestamp') for chat in chats),
+                                                     keep_missing=True))
+            for chat, at in ((chats[0], record.start), (chats[-1], record.start + len(chats) - 1)):
+                if chat.get('timestamp') and self.times[at] == MISSING:
+                    record.unparsed += 1
+            lengths = self.lengths
+            flags = self.flags
+            matcher = self.matcher
+            for idx, chat in enumerate(chats):
+                body = chat.get('body') or ''
+                lengths.append(len(body))
+                flag = QUESTION if '?' in body else 0
+                if not record.first_invite:
+                    lowered = body.lower()
+                    if matcher.is_invite(lowered):
+                        record.first_invite = idx + 1
+                        flag |= FIRST_INVITE | (CONCRETE if matcher.is_concrete(lowered) else 0)
+                flags.append(flag)
+        record.end = len(self.times)
+
+        we_met = match.get('we_met') or []
+        record.met = met_status(we_met)
+        record.responses = len(we_met)
+        record.met_yes = record.met_no = record.my_type = 0
+        for response in we_met:
+            did_meet = response.get('did_meet_subject')
+            if did_meet == 'Yes':
+                record.met_yes += 1
+                if response.get('was_my_type') == True:
+                    record.my_type += 1
+            elif did_meet == 'No':
+                record.met_no += 1
+
+        record.key = match_key(match, raw) if self.keep_keys and chats else None
+        self.records.append(record)
+        return record
+
+    def epochs(self, record):
+        """Epoch seconds of a record's parseable message timestamps"""
+        return [t for t in self.times[record.start:record.end] if t != MISSING]
+
+    def feature_row(self, record):
+        """Same row as rebuild_features.build_feature_row for the original match"""
+        start, end = record.start, record.end
+        if start == end:
+            return None
+        times = self.times
+        first = min(end, start + FEATURE_MESSAGES)
+        question_count = sum(1 for flag in self.flags[start:first] if flag & QUESTION)
+        concrete = None
+        if record.first_invite:
+            concrete = bool(self.flags[start + record.first_invite - 1] & CONCRETE)
+
+        def when(epoch):
+            return None if epoch == MISSING else from_epoch(epoch)
+
+        self.row_failures += record.unparsed
+
+        return feature_row(
+            when(record.match_time), when(times[start]), when(times[end - 1]),
+            record.first_invite or None, concrete, question_count / (first - start),
+            median_of_lengths(self.lengths[start:first]), record.met, end - start,
+        )
+
+    def nbytes(self):
+        """Approximate memory held by the store"""
+        arrays = sum(a.buffer_info()[1] * a.itemsize for a in (self.times, self.lengths, self.flags))
+        records = sys.getsizeof(self.records) + sum(sys.getsizeof(r) for r in self.records)
+        return arrays + records
+
+
+def load_store(path, matcher=INVITE_MATCHER, keep_keys=False):
+    """MessageStore for a matches.json export, built one streamed match at a time"""
+    store = MessageStore(matcher, keep_keys)
+    for match, text in iter_matches(path, raw=True):
+        store.add(match, text)
+    return store
+
+
+def _deep_size(value, seen=None):
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, list):
+        size += sum(_deep_size(v, seen) for v in value)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default='data', help='folder holding matches.json')
+    parser.add_argument('--compare', action='store_true',
+                        help='also measure the parsed export (slow: walks every dict)')
+    args = parser.parse_args()
+    path = export_path(args.data_dir)
+
+    started = time.perf_counter()
+    store = load_store(path)
+    elapsed = time.perf_counter() - started
+    messages = len(store.times)
+    size = store.nbytes()
+    print(f"🗜️  {len(store):,} matches, {messages:,} messages compacted in {elapsed:.2f}s")
+    print(f"   Store: {size / 2 ** 20:.1f} MB ({size / max(messages, 1):.0f} bytes/message)")
+    failures = store.timestamps.failures + store.match_timestamps.failures
+    if failures:
+        print(f"⚠️  {failures} unparseable timestamps")
+    if args.compare:
+        parsed = sum(_deep_size(match) for match in iter_matches(path))
+        print(f"   Parsed dicts: {parsed / 2 ** 20:.1f} MB ({parsed / max(messages, 1):.0f} bytes/message)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+"""
+Columns and quadrants shared by analyze_personal_stats.py and its NumPy engine
+"""
+
+QUADRANTS = ['Short & Curious', 'Short & Silent', 'Long & Curious', 'Long & Silent']
+
+STATS_COLUMNS = ['met', 'invite_is_concrete', 'first_invite_msg_index',
+                 'question_density_first10', 'median_len_first10']
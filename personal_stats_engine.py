@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Vectorized (NumPy) engine for the personal_stats.json aggregates
+
+Features are loaded once into arrays with null masks, and every statistic is
+computed with array operations. The output matches
+analyze_personal_stats.compute_stats exactly.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+from feature_store import ENUMS, MET_YES, open_store
+from personal_stats_columns import QUADRANTS, STATS_COLUMNS
+
+CONCRETE_FALSE, CONCRETE_TRUE = 1, 2
+
+
+def load_arrays(data_dir, json_name='conversations_features.json'):
+    """Feature columns as NumPy arrays: enum codes, or (values, valid mask) pairs
+
+    Columns are copied out of the mmap'd store when json_name has a current
+    one, and the store is closed again; otherwise the JSON rows are converted
+    once.
+    """
+    json_path = Path(data_dir) / json_name
+    store = open_store(json_path)
+    if store is not None:
+        arrays = {}
+        with store:
+            for name in STATS_COLUMNS:
+                values = np.array(store.values(name), dtype=np.dtype(store.columns[name]['type']))
+                valid = store.valid(name)
+                arrays[name] = values if valid is None else (values, np.array(valid, dtype=bool))
+        return arrays
+
+    with open(json_path) as f:
+        rows = json.load(f)
+    return rows_to_arrays(rows)
+
+
+def rows_to_arrays(rows):
+    """Convert feature dicts to the arrays load_arrays returns"""
+    arrays = {}
+    for name in STATS_COLUMNS:
+        values = [row.get(name) for row in rows]
+        if name in ENUMS:
+            codes = {value: code for code, value in enumerate(ENUMS[name], 1)}
+            arrays[name] = np.array([codes.get(v, 0) if v is not None else 0 for v in values], dtype=np.uint8)
+        else:
+            valid = np.array([v is not None for v in values], dtype=bool)
+            arrays[name] = (np.array([v if v is not None else 0.0 for v in values], dtype=np.float64), valid)
+    return arrays
+
+
+def _mean(values):
+    # Builtin sum over the (small) selected values keeps the exact summation
+    # order and rounding of the pure-Python script
+    return sum(values.tolist()) / len(values) if len(values) else None
+
+
+def compute_stats_arrays(arrays):
+    """Same result as analyze_personal_stats.compute_stats, from arrays"""
+    met = arrays['met']
+    concrete = arrays['invite_is_concrete']
+    invite, invite_ok = arrays['first_invite_msg_index']
+    density, density_ok = arrays['question_density_first10']
+    length, length_ok = arrays['median_len_first10']
+
+    valid = met != 0
+    yes = met == MET_YES
+    counts = np.bincount(met, minlength=4)
+
+    invite_indices = invite[yes & invite_ok]
+
+    # Quadrant code: bit 0 = long, bit 1 = curious
+    in_quadrant = valid & density_ok & length_ok
+    quadrant = ((density > 0.3).astype(np.int8) << 1) | (length > 120).astype(np.int8)
+    totals = np.bincount(quadrant[in_quadrant], minlength=4)
+    met_counts = np.bincount(quadrant[in_quadrant & yes], minlength=4)
+    codes = {
+        'Short & Curious': 2,
+        'Short & Silent': 0,
+        'Long & Curious': 3,
+        'Long & Silent': 1,
+    }
+
+    return {
+        'total_convos': int(counts[1:].sum()),
+        'met_yes': int(counts[1]),
+        'met_no': int(counts[2]),
+        'met_not_yet': int(counts[3]),
+        'concrete_met': int(np.count_nonzero(yes & (concrete == CONCRETE_TRUE))),
+        'non_concrete_met': int(np.count_nonzero(yes & (concrete == CONCRETE_FALSE))),
+        'avg_invite_index': _mean(invite_indices),
+        'early_invites': int(np.count_nonzero(invite_indices <= 3)),
+        'mid_invites': int(np.count_nonzero((invite_indices >= 4) & (invite_indices <= 10))),
+        'late_invites': int(np.count_nonzero(invite_indices > 10)),
+        'avg_question_density': _mean(density[yes & density_ok]),
+        'avg_msg_length': _mean(length[yes & length_ok]),
+        'quadrants': {
+            name: (int(met_counts[codes[name]]), int(totals[codes[name]]))
+            for name in QUADRANTS
+        },
+    }
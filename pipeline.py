@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Single-pass analysis: parse matches.json once and feed every stage
+"""
+import argparse
+from pathlib import Path
+
+from analyze_full_funnel import FunnelCounter, save_funnel
+from analyze_personal_stats import compute_personal_stats, save_summary
+from analyze_timeline import TimelineCounter, save_timeline
+from data_cube import CUBE_NAME, build_cube
+from feature_cache import CACHE_NAME, FeatureCache, feature_signature
+from feature_store import FeatureStoreWriter, load_features, store_path
+from hinge_export import export_path, iter_matches
+from keyword_matcher import KeywordMatcher
+from message_store import MessageStore
+from profiling import NULL_PROFILER, get_profiler
+from rebuild_features import (FEATURE_VERSION, INVITE_MATCHER, FeatureShards, FeatureWriter,
+                              build_feature_row, record_feature_row)
+from story_stats import STORY_NAME, save_story
+
+
+class FunnelStage:
+    """Funnel counters -> funnel_stats.json"""
+    output = 'funnel_stats.json'
+
+    def __init__(self, data_dir):
+        self.path = Path(data_dir) / self.output
+        self.counter = FunnelCounter()
+
+    def add(self, match, raw=None):
+        self.counter.add(match)
+
+    def add_record(self, record, store):
+        self.counter.add_record(record)
+
+    def close(self):
+        save_funnel(self.counter, self.path)
+        return f"{self.counter.total_matches:,} matches, {self.counter.matches_with_chats} with chats"
+
+
+class TimelineStage:
+    """Timeline counters -> timeline_stats.json"""
+    output = 'timeline_stats.json'
+
+    def __init__(self, data_dir):
+        self.path = Path(data_dir) / self.output
+        self.counter = TimelineCounter()
+
+    def add(self, match, raw=None):
+        self.counter.add(match)
+
+    def add_record(self, record, store):
+        self.counter.add_record(record, store)
+
+    def close(self):
+        if not self.counter.total_messages:
+            return "no timestamped messages, nothing written"
+        save_timeline(self.counter, self.path)
+        return f"{self.counter.total_messages:,} messages"
+
+
+class FeatureStage:
+    """Per-conversation features -> conversations_features.json (+ columnar store, year shards)"""
+    output = 'conversations_features.json'
+
+    def __init__(self, data_dir, matcher=INVITE_MATCHER, incremental=False):
+        self.path = Path(data_dir) / self.output
+        self.matcher = matcher
+        self.cache = None
+        if incremental:
+            self.cache = FeatureCache(Path(data_dir) / CACHE_NAME, feature_signature(FEATURE_VERSION, matcher))
+        self.writer = FeatureWriter(self.path).open()
+        self.store = FeatureStoreWriter(store_path(self.path), self.path)
+        try:
+            self.shards = FeatureShards(data_dir).open()
+        except BaseException:
+            self.writer.discard()
+            raise
+
+    def compute(self, match):
+        return build_feature_row(match, self.matcher)
+
+    def add(self, match, raw=None):
+        if self.cache is not None and match.get('chats'):
+            row = self.cache.row(match, self.compute, raw)
+        else:
+            row = self.compute(match)
+        if row is not None:
+            self.writer.write(row)
+            self.store.write(row)
+            self.shards.write(row)
+
+    def add_record(self, record, store):
+        row = record_feature_row(store, record, self.cache)
+        if row is not None:
+            self.writer.write(row)
+            self.store.write(row)
+            self.shards.write(row)
+
+    def close(self):
+        self.writer.close()
+        self.store.close()
+        self.shards.close()
+        if self.cache is not None:
+            self.cache.save()
+            return (f"{self.writer.count} conversations "
+                    f"(cache: {self.cache.hits} hits, {self.cache.misses} misses, {self.cache.dropped} dropped)")
+        return f"{self.writer.count} conversations"
+
+    def discard(self):
+        """Drop the half-written outputs and keep the previous ones"""
+        self.writer.discard()
+        self.store.discard()
+        self.shards.discard()
+
+
+class PersonalStage:
+    """Meeting success rates -> personal_stats.json
+
+    Like the story stage, built from the feature table after it is written.
+    """
+    output = 'personal_stats.json'
+
+    def __init__(self, data_dir):
+        self.data_dir = Path(data_dir)
+        self.path = self.data_dir / self.output
+
+    def add(self, match, raw=None):
+        pass
+
+    def add_record(self, record, store):
+        pass
+
+    def close(self):
+        stats = compute_personal_stats(self.data_dir, FeatureStage.output)
+        save_summary(stats, self.path)
+        return f"{stats['total_convos']} conversations, {stats['met_yes']} met"
+
+
+class StoryStage:
+    """Page chart aggregates -> story_stats.json
+
+    Built from the feature table once it is on disk, so it must run after
+    the features stage (or on top of an earlier run's features).
+    """
+    output = STORY_NAME
+
+    def __init__(self, data_dir):
+        self.data_dir = Path(data_dir)
+        self.path = self.data_dir / self.output
+
+    def add(self, match, raw=None):
+        pass
+
+    def add_record(self, record, store):
+        pass
+
+    def close(self):
+        records = load_features(self.data_dir)
+        save_story(records, self.path)
+        return f"{len(records)} conversations, {self.path.stat().st_size / 1024:.1f} KB"
+
+
+class CubeStage:
+    """Sliceable meet counts -> data_cube.json
+
+    Like the story stage, built from the feature table after it is written.
+    """
+    output = CUBE_NAME
+
+    def __init__(self, data_dir):
+        self.data_dir = Path(data_dir)
+        self.path = self.data_dir / self.output
+
+    def add(self, match, raw=None):
+        pass
+
+    def add_record(self, record, store):
+        pass
+
+    def close(self):
+        cube = build_cube(self.data_dir)
+        cube.save(self.path)
+        return f"{cube.query()['total']} conversations with a known outcome"
+
+
+STAGES = {
+    'funnel': FunnelStage,
+    'timeline': TimelineStage,
+    'features': FeatureStage,
+    'personal': PersonalStage,
+    'story': StoryStage,
+    'cube': CubeStage,
+}
+
+
+def close_stages(stages):
+    """Close stages in STAGES order, whatever order they were passed in
+
+    Personal, story and cube read the feature table when they close, so they
+    always follow the features stage. Returns {stage name: stage summary}.
+    """
+    order = list(STAGES)
+    return {name: stages[name].close() for name in sorted(stages, key=order.index)}
+
+
+def discard_stages(stages):
+    """Drop every stage's half-written outputs (stages without files have nothing to drop)"""
+    for stage in stages.values():
+        discard = getattr(stage, 'discard', None)
+        if discard is not None:
+            discard()
+
+
+def run_pipeline(matches, stages, profiler=NULL_PROFILER):
+    """Route every (match, raw JSON text) pair through each stage, then close them all
+
+    Stages close in dependency order (close_stages), so later stages can
+    read earlier outputs; if parsing or any stage raises, every stage's
+    temporary files are discarded before the error propagates. With a
+    profiler, each stage's per-match work is charged to its own name and
+    closing (writing the outputs) to 'write'. Returns {stage name: stage summary}.
+    """
+    try:
+        adds = [profiler.wrap(name, stage.add) for name, stage in stages.items()]
+        for match, raw in matches:
+            for add in adds:
+                add(match, raw)
+        with profiler.stage('write'):
+            return close_stages(stages)
+    except BaseException:
+        discard_stages(stages)
+        raise
+
+
+def run_store(store, stages, profiler=NULL_PROFILER):
+    """run_pipeline over the records of a MessageStore instead of parsed matches"""
+    try:
+        adds = [profiler.wrap(name, stage.add_record) for name, stage in stages.items()]
+        for record in store:
+            for add in adds:
+                add(record, store)
+        with profiler.stage('write'):
+            return close_stages(stages)
+    except BaseException:
+        discard_stages(stages)
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--data-dir', default='data',
+                        help='folder holding matches.json and receiving the outputs')
+    parser.add_argument('--export', metavar='PATH',
+                        help='matches.json or Hinge zip to read (default: <data-dir>/matches.json, '
+                             'or the one .zip in <data-dir>)')
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"comma-separated stages to run (default: {','.join(STAGES)})")
+    parser.add_argument('--keywords', metavar='JSON',
+                        help='invite/concrete keyword lists for the features stage')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'features stage reuses rows for unchanged matches from {CACHE_NAME}')
+    parser.add_argument('--compact', action='store_true',
+                        help='load the export into a compact MessageStore first, then run the stages on it')
+    parser.add_argument('--profile', action='store_true',
+                        help='write per-stage timings and memory to <data-dir>/pipeline.profile.json')
+    args = parser.parse_args()
+    profiler = get_profiler(args.profile, 'pipeline.py')
+
+    names = [name.strip() for name in args.stages.split(',') if name.strip()]
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    options = {'features': {'incremental': args.incremental}}
+    if args.keywords:
+        options['features']['matcher'] = KeywordMatcher.from_file(args.keywords)
+    stages = {name: STAGES[name](args.data_dir, **options.get(name, {})) for name in names}
+    matches_path = export_path(args.data_dir, args.export)
+    print(f"Streaming {matches_path} through {len(stages)} stage(s)...")
+
+    matches = profiler.iterate('parse', iter_matches(matches_path, raw=True))
+    if args.compact:
+        store = MessageStore(stages['features'].matcher if 'features' in stages else INVITE_MATCHER,
+                             keep_keys=args.incremental)
+        add = profiler.wrap('compact', store.add)
+        try:
+            for match, raw in matches:
+                add(match, raw)
+        except BaseException:
+            discard_stages(stages)
+            raise
+        print(f"🗜️  {len(store):,} matches, {len(store.times):,} messages in "
+              f"{store.nbytes() / 2 ** 20:.1f} MB")
+        results = run_store(store, stages, profiler)
+    else:
+        results = run_pipeline(matches, stages, profiler)
+
+    for name, result in results.items():
+        print(f"✅ {stages[name].path}: {result}")
+    profiler.save(Path(args.data_dir) / 'pipeline.profile.json')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-stage profiling for the analysis scripts (--profile)
+
+Each named stage (load, parse, extract, aggregate, write) accumulates wall
+time, CPU time, growth of the process's peak memory and an item count.
+Stages can interleave and nest - e.g. extract pulling matches out of parse -
+and cost is only charged to the innermost running stage. Peak memory comes
+from the RSS high-water mark, which is cheap enough to read at every stage
+switch; run under `python -X tracemalloc` to also get per-stage peaks of
+Python allocations (much slower). When profiling is off the scripts get
+NULL_PROFILER, whose wrappers hand back the original iterable or function,
+so a normal run pays nothing per item.
+"""
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def _max_rss():
+    """Process peak resident memory so far, in bytes (0 where unsupported)"""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+
+# Stages entered at most this many times get their memory growth measured
+# exactly; per-item stages only read it every RSS_SAMPLE_EVERY switches
+EXACT_SPANS = 64
+RSS_SAMPLE_EVERY = 64
+
+
+class Stage:
+    """Accumulated cost of one named stage"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rss_growth = 0
+        self.traced_peak = 0
+        self.calls = 0
+        self.items = 0
+
+    def __enter__(self):
+        self.profiler._push(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler._pop()
+        return False
+
+    def summary(self):
+        summary = {
+            'name': self.name,
+            'wall_seconds': round(self.wall, 4),
+            'cpu_seconds': round(self.cpu, 4),
+            'peak_rss_growth_mb': round(self.rss_growth / 2 ** 20, 2),
+            'calls': self.calls,
+            'items': self.items,
+        }
+        if self.profiler.tracing:
+            summary['traced_peak_mb'] = round(self.traced_peak / 2 ** 20, 2)
+        return summary
+
+
+class Profiler:
+    """Collects per-stage costs for one script run
+
+    Only one stage runs at a time (the innermost one entered), so the time
+    between two stage switches is charged to the stage being switched away
+    from.
+    """
+
+    enabled = True
+
+    def __init__(self, script):
+        self.script = script
+        self.stages = {}
+        self._stack = []
+        self.counters = {}
+        self.tracing = tracemalloc.is_tracing()
+        self._switches = 0
+        self._wall_start = self._wall_mark = time.perf_counter()
+        self._cpu_start = self._cpu_mark = time.process_time()
+        self._rss_mark = _max_rss()
+
+    def stage(self, name):
+        """Reusable context manager charging its body to stage `name`"""
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(self, name)
+        return stage
+
+    def _switch(self, paused):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if paused is not None:
+            paused.wall += wall - self._wall_mark
+            paused.cpu += cpu - self._cpu_mark
+            self._switches += 1
+            if paused.calls <= EXACT_SPANS or not self._switches % RSS_SAMPLE_EVERY:
+                rss = _max_rss()
+                paused.rss_growth += rss - self._rss_mark
+                self._rss_mark = rss
+            if self.tracing:
+                paused.traced_peak = max(paused.traced_peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+        self._wall_mark = wall
+        self._cpu_mark = cpu
+
+    def _push(self, stage):
+        stack = self._stack
+        self._switch(stack[-1] if stack else None)
+        stage.calls += 1
+        stack.append(stage)
+
+    def _pop(self):
+        self._switch(self._stack.pop())
+
+    def iterate(self, name, iterable):
+        """Yield from iterable, charging the time spent producing each item to `name`"""
+        stage = self.stage(name)
+        iterator = iter(iterable)
+        push, pop = self._push, self._pop
+        while True:
+            # Same as `with stage:`, minus the per-item __enter__/__exit__
+            push(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                pop()
+            stage.items += 1
+            yield item
+
+    def wrap(self, name, func):
+        """func, with every call charged to `name` and counted as one item"""
+        stage = self.stage(name)
+
+        def timed(*args, **kwargs):
+            with stage:
+                stage.items += 1
+                return func(*args, **kwargs)
+        return timed
+
+    def count(self, name, value):
+        """Record an extra counter (e.g. timestamps parsed) in the report"""
+        self.counters[name] = value
+
+    def report(self):
+        """The profile as a JSON-ready dict"""
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.process_time() - self._cpu_start
+        stages = [stage.summary() for stage in self.stages.values()]
+        accounted = sum(stage.wall for stage in self.stages.values())
+        report = {
+            'script': self.script,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(cpu, 4),
+            'unstaged_wall_seconds': round(max(0.0, wall - accounted), 4),
+            'max_rss_mb': round(_max_rss() / 2 ** 20, 1),
+            'stages': stages,
+        }
+        if self.counters:
+            report['counters'] = self.counters
+        return report
+
+    def save(self, path):
+        """Write the report to path and print a one-line-per-stage summary"""
+        report = self.report()
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n⏱️  Profile ({report['wall_seconds']:.2f}s wall, {report['cpu_seconds']:.2f}s CPU):")
+        for stage in report['stages']:
+            print(f"   {stage['name']:10s} {stage['wall_seconds']:8.3f}s wall {stage['cpu_seconds']:8.3f}s CPU "
+                  f"{stage['peak_rss_growth_mb']:+8.1f} MB peak {stage['items']:>10,} items")
+        print(f"✅ Profile saved to {path}")
+        return report
+
+
+class _NullStage:
+    calls = 0
+    items = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class NullProfiler:
+    """Stand-in used without --profile: every hook is a pass-through"""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def iterate(self, name, iterable):
+        return iterable
+
+    def wrap(self, name, func):
+        return func
+
+    def count(self, name, value):
+        pass
+
+    def save(self, path):
+        return None
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def get_profiler(enabled, script):
+    """A Profiler for script when enabled, else the shared no-op profiler"""
+    return Profiler(script) if enabled else NULL_PROFILER
+
@@ -2,36 +2,62 @@
 """
 Rebuild conversation features with complete timestamp data from matches.json
 """
+import argparse
 import json
-from datetime import datetime
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from pathlib import Path
+
+from atomic_write import atomic_write, tmp_path
+from feature_cache import CACHE_NAME, MISS, FeatureCache, feature_signature, match_key
+from feature_store import FeatureStoreWriter, load_features, store_path
+from hinge_export import export_path, iter_match_texts, iter_matches
+from keyword_matcher import KeywordMatcher
+from profiling import get_profiler
+from sketches import Distribution
+from story_stats import STORY_NAME, save_story
+from timestamps import TimestampDecoder
+
+# Bump whenever build_feature_row changes, so cached rows are recomputed
+FEATURE_VERSION = 1
+
+# Matches per work item in --workers mode
+CHUNK_MATCHES = 500
+
+# Per-year copies of the feature table, for the page to fetch lazily
+SHARD_NAME = 'conversations_features.{}.json'
+SHARD_FILE = re.compile(r'conversations_features\.(\d+|undated)\.json')
+MANIFEST_NAME = 'conversations_features.manifest.json'
+UNDATED = 'undated'
+
+TIMESTAMPS = TimestampDecoder()
 
 def parse_timestamp(ts_str):
-    """Parse timestamp string to datetime"""
-    if not ts_str:
-        return None
-    try:
-        return datetime.strptime(ts_str, '%Y-%m-%d %H:%M:%S')
-    except:
-        return None
+    """Parse timestamp string to datetime (None if blank or unparseable)"""
+    return TIMESTAMPS.parse(ts_str)
 
-def extract_invite_info(chats):
-    """Extract first invite message index and whether it's concrete"""
-    invite_keywords = ['meet', 'coffee', 'drink', 'dinner', 'lunch', 'date', 'hang', 'get together',
-                      'grab', 'catch up', 'see you', 'plans', 'free', 'available', 'tomorrow', 'tonight',
-                      'weekend', 'sunday', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
+INVITE_KEYWORDS = ['meet', 'coffee', 'drink', 'dinner', 'lunch', 'date', 'hang', 'get together',
+                   'grab', 'catch up', 'see you', 'plans', 'free', 'available', 'tomorrow', 'tonight',
+                   'weekend', 'sunday', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
 
-    concrete_indicators = ['tonight', 'tomorrow', 'sunday', 'monday', 'tuesday', 'wednesday',
-                          'thursday', 'friday', 'saturday', 'at ', 'pm', 'am', 'o\'clock',
-                          'this weekend', 'next week', 'bar', 'restaurant', 'cafe']
+CONCRETE_INDICATORS = ['tonight', 'tomorrow', 'sunday', 'monday', 'tuesday', 'wednesday',
+                       'thursday', 'friday', 'saturday', 'at ', 'pm', 'am', 'o\'clock',
+                       'this weekend', 'next week', 'bar', 'restaurant', 'cafe']
 
+INVITE_MATCHER = KeywordMatcher(INVITE_KEYWORDS, CONCRETE_INDICATORS)
+
+def extract_invite_info(chats, matcher=INVITE_MATCHER):
+    """Extract first invite message index and whether it's concrete"""
     for idx, chat in enumerate(chats):
         body = (chat.get('body') or '').lower()
 
         # Check if this is an invite
-        if any(keyword in body for keyword in invite_keywords):
-            is_concrete = any(indicator in body for indicator in concrete_indicators)
-            return idx + 1, is_concrete  # 1-indexed
+        if matcher.is_invite(body):
+            return idx + 1, matcher.is_concrete(body)  # 1-indexed
 
     return None, None
 
@@ -50,8 +76,11 @@ def analyze_message_length(chats, limit=10):
     if not first_n:
         return None
 
-    lengths = [len(chat.get('body') or '') for chat in first_n]
-    lengths.sort()
+    return median_of_lengths([len(chat.get('body') or '') for chat in first_n])
+
+def median_of_lengths(lengths):
+    """Median of message lengths (None for none)"""
+    lengths = sorted(lengths)
     mid = len(lengths) // 2
 
     if len(lengths) % 2 == 0 and len(lengths) > 0:
@@ -60,23 +89,26 @@ def analyze_message_length(chats, limit=10):
         return float(lengths[mid])
     return None
 
-# Load matches
-print("Loading matches.json...")
-with open('data/matches.json') as f:
-    matches = json.load(f)
-
-print(f"Processing {len(matches)} matches...")
-
-features = []
+def met_status(we_met):
+    """'Yes' / 'No' / 'Not yet' from the most recent we_met response, None without one"""
+    if not we_met:
+        return None
+    did_meet = we_met[-1].get('did_meet_subject')
+    if did_meet == 'Yes':
+        return 'Yes'
+    elif did_meet == 'No':
+        return 'No'
+    return 'Not yet'
 
-for match in matches:
+def build_feature_row(match, matcher=INVITE_MATCHER):
+    """Compute the feature row for one match, or None if it has no chats"""
     chats = match.get('chats', [])
     we_met = match.get('we_met', [])
     match_data = match.get('match', {})
 
     # Skip if no chats
     if not chats:
-        continue
+        return None
 
     # Extract timestamps
     match_time = None
@@ -86,6 +118,19 @@ for match in matches:
     first_msg_time = parse_timestamp(chats[0].get('timestamp')) if chats else None
     last_msg_time = parse_timestamp(chats[-1].get('timestamp')) if chats else None
 
+    # Extract invite info
+    invite_index, is_concrete = extract_invite_info(chats, matcher)
+
+    # Analyze messaging style
+    question_density = analyze_questions(chats)
+    median_length = analyze_message_length(chats)
+
+    return feature_row(match_time, first_msg_time, last_msg_time, invite_index, is_concrete,
+                       question_density, median_length, met_status(we_met), len(chats))
+
+def feature_row(match_time, first_msg_time, last_msg_time, invite_index, is_concrete,
+                question_density, median_length, met, num_messages):
+    """Assemble a feature row from a conversation's extracted parts"""
     # Calculate duration
     duration_hours = None
     if match_time and last_msg_time:
@@ -98,25 +143,6 @@ for match in matches:
     if match_time and first_msg_time:
         first_msg_delay_minutes = (first_msg_time - match_time).total_seconds() / 60
 
-    # Extract invite info
-    invite_index, is_concrete = extract_invite_info(chats)
-
-    # Analyze messaging style
-    question_density = analyze_questions(chats)
-    median_length = analyze_message_length(chats)
-
-    # Determine meeting status
-    met = None
-    if we_met:
-        latest_response = we_met[-1]  # Get most recent response
-        did_meet = latest_response.get('did_meet_subject')
-        if did_meet == 'Yes':
-            met = 'Yes'
-        elif did_meet == 'No':
-            met = 'No'
-        else:
-            met = 'Not yet'
-
     # Extract year
     year = None
     if first_msg_time:
@@ -124,7 +150,7 @@ for match in matches:
     elif match_time:
         year = match_time.year
 
-    feature_row = {
+    return {
         'match_time': match_time.isoformat() if match_time else None,
         'first_msg_time': first_msg_time.isoformat() if first_msg_time else None,
         'last_msg_time': last_msg_time.isoformat() if last_msg_time else None,
@@ -136,26 +162,361 @@ for match in matches:
         'median_len_first10': median_length,
         'met': met,
         'year': year,
-        'num_messages': len(chats)
+        'num_messages': num_messages
     }
 
-    features.append(feature_row)
+# Set in each worker process by _init_worker: (matcher, keys the cache already holds)
+_WORKER = None
+
+def _init_worker(matcher, cached_keys):
+    global _WORKER
+    _WORKER = (matcher, cached_keys)
+
+def extract_chunk(texts):
+    """Worker entry point: a (cache key, feature row) pair per raw match JSON text
+
+    The match is parsed and, with a cache, keyed here rather than in the
+    parent. The key is None without a cache or for a match without chats; the
+    row is None for a match without chats or one whose key the cache holds.
+    Returns (pairs, TimestampDecoder holding this chunk's parse counts).
+    """
+    matcher, cached_keys = _WORKER
+    parsed, failures = TIMESTAMPS.parsed, TIMESTAMPS.failures
+    pairs = []
+    for text in texts:
+        match = json.loads(text)
+        if cached_keys is None or not match.get('chats'):
+            pairs.append((None, build_feature_row(match, matcher)))
+            continue
+        key = match_key(match, text)
+        pairs.append((key, None if key in cached_keys else build_feature_row(match, matcher)))
+    counts = TimestampDecoder()
+    counts.parsed = TIMESTAMPS.parsed - parsed
+    counts.failures = TIMESTAMPS.failures - failures
+    return pairs, counts
+
+def iter_feature_rows(matches, matcher=INVITE_MATCHER, cache=None):
+    """Yield a feature row (or None) for every (match, raw JSON) pair, in input order"""
+    compute = partial(build_feature_row, matcher=matcher)
+    for match, raw in matches:
+        if cache is not None and match.get('chats'):
+            yield cache.row(match, compute, raw)
+        else:
+            yield compute(match)
+
+def iter_parallel_feature_rows(texts, matcher=INVITE_MATCHER, cache=None, workers=2):
+    """iter_feature_rows over raw match JSON texts, extracted in a process pool
+
+    The parent only splits the export (hinge_export.iter_match_texts) and
+    batches the texts; workers parse, key and extract them, skipping matches
+    the cache already has a row for. Results are re-sequenced, so rows and
+    cache counts match a serial run.
+    """
+    def finish(future):
+        pairs, counts = future.result()
+        TIMESTAMPS.merge(counts)
+        for key, row in pairs:
+            if key is not None:
+                cached = cache.get(key)
+                if cached is MISS:
+                    cache.put(key, row)
+                else:
+                    row = cached
+            yield row
+
+    cached_keys = cache.cached_keys() if cache is not None else None
+    texts = iter(texts)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(matcher, cached_keys)) as pool:
+        pending = deque()
+        while True:
+            chunk = list(islice(texts, CHUNK_MATCHES))
+            if not chunk:
+                break
+            pending.append(pool.submit(extract_chunk, chunk))
+            # Keep a bounded number of chunks in flight so memory stays flat
+            while len(pending) > 2 * workers:
+                yield from finish(pending.popleft())
+
+        while pending:
+            yield from finish(pending.popleft())
+
+def record_feature_row(store, record, cache=None):
+    """Feature row for a message_store record, through the cache when it has a key"""
+    if cache is None or record.key is None:
+        return store.feature_row(record)
+    row = cache.get(record.key)
+    if row is MISS:
+        row = store.feature_row(record)
+        cache.put(record.key, row)
+    return row
+
+class FeatureWriter:
+    """Write feature rows to a JSON array one row at a time
+
+    The file is byte-for-byte what json.dump(rows, f, indent=2) would produce,
+    but rows are serialized as they arrive instead of being collected first.
+    They go to a temp file that replaces path on close, so the previous table
+    stays readable until the new one is complete.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.with_timestamps = 0
+        self.with_duration = 0
+        self.with_met = 0
+        self.met_yes = 0
+        self._file = None
+
+    def open(self):
+        self._file = open(tmp_path(self.path), 'w')
+        self._file.write('[')
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def write(self, row):
+        # Rows sit one level deep in the array, so indent every line by two more
+        text = json.dumps(row, indent=2).replace('\n', '\n  ')
+        self._file.write(('\n  ' if self.count == 0 else ',\n  ') + text)
+        self.count += 1
+
+        if row['match_time'] or row['first_msg_time']:
+            self.with_timestamps += 1
+        if row['duration_hours']:
+            self.with_duration += 1
+        if row['met']:
+            self.with_met += 1
+            if row['met'] == 'Yes':
+                self.met_yes += 1
+
+    def close(self):
+        self._file.write('\n]' if self.count else ']')
+        self.size = self._file.tell()
+        self._file.close()
+        os.replace(tmp_path(self.path), self.path)
+
+    def discard(self):
+        """Drop the rows written so far and keep the previous file"""
+        self._file.close()
+        tmp_path(self.path).unlink(missing_ok=True)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+class ShardWriter(FeatureWriter):
+    """FeatureWriter that also keeps the summary aggregates listed in the manifest"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.met = {}
+        self.invites = 0
+        self.concrete_invites = 0
+        self.durations = Distribution()
+        self.first = None
+        self.last = None
+
+    def write(self, row):
+        super().write(row)
+        if row['met']:
+            self.met[row['met']] = self.met.get(row['met'], 0) + 1
+        if row['first_invite_msg_index']:
+            self.invites += 1
+            if row['invite_is_concrete']:
+                self.concrete_invites += 1
+        if row['duration_hours'] is not None and row['duration_hours'] >= 0:
+            self.durations.add(row['duration_hours'])
+        when = row['first_msg_time'] or row['match_time']
+        if when:
+            self.first = when if self.first is None or when < self.first else self.first
+            self.last = when if self.last is None or when > self.last else self.last
+
+    def summary(self):
+        durations = self.durations.summary(percentiles=[50, 90], digits=2)
+        return {
+            'rows': self.count,
+            'bytes': self.size,
+            'first': self.first,
+            'last': self.last,
+            'met': dict(sorted(self.met.items())),
+            'meet_rate': round(self.met_yes / self.with_met * 100, 1) if self.with_met else None,
+            'invites': self.invites,
+            'concrete_invites': self.concrete_invites,
+            'median_duration_hours': durations['p50'],
+            'p90_duration_hours': durations['p90'],
+        }
+
+class FeatureShards:
+    """Write feature rows into one JSON array per year, plus a manifest
+
+    Shards are named conversations_features.<year>.json (rows without a year
+    go to conversations_features.undated.json) and laid out exactly like the
+    full table, so the page can fetch a year at a time. The manifest lists
+    them oldest first with row counts and summary aggregates. Closing removes
+    shards left over from an earlier run for years that no longer occur.
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = Path(data_dir)
+        self.shards = {}
+
+    def open(self):
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def write(self, row):
+        key = UNDATED if row['year'] is None else row['year']
+        shard = self.shards.get(key)
+        if shard is None:
+            shard = self.shards[key] = ShardWriter(self.data_dir / SHARD_NAME.format(key)).open()
+        shard.write(row)
+
+    @property
+    def count(self):
+        return sum(shard.count for shard in self.shards.values())
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
+        written = {shard.path.name for shard in self.shards.values()}
+        for path in self.data_dir.glob(SHARD_NAME.format('*')):
+            if SHARD_FILE.fullmatch(path.name) and path.name not in written:
+                path.unlink()
+
+        years = sorted(key for key in self.shards if key != UNDATED)
+        keys = years + ([UNDATED] if UNDATED in self.shards else [])
+        manifest = {
+            'version': FEATURE_VERSION,
+            'rows': self.count,
+            'shards': [{'year': None if key == UNDATED else key, 'file': self.shards[key].path.name,
+                        **self.shards[key].summary()} for key in keys],
+        }
+        with atomic_write(self.data_dir / MANIFEST_NAME) as f:
+            json.dump(manifest, f, indent=2)
+
+    def discard(self):
+        for shard in self.shards.values():
+            shard.discard()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--data-dir', default='data',
+                        help='folder holding matches.json and receiving the feature files')
+    parser.add_argument('--export', metavar='PATH',
+                        help='matches.json or Hinge zip to read (default: <data-dir>/matches.json, '
+                             'or the one .zip in <data-dir>)')
+    parser.add_argument('--keywords', metavar='JSON',
+                        help='invite/concrete keyword lists: {"invite": [...], "concrete": [...]}')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'reuse rows for unchanged matches from <data-dir>/{CACHE_NAME}')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help='extract features in N processes, parsing matches.json directly '
+                             '(implies --no-snapshot; output is identical to a serial run)')
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help='parse matches.json directly instead of using its snapshot')
+    parser.add_argument('--profile', action='store_true',
+                        help='write per-stage timings and memory to <data-dir>/rebuild_features.profile.json')
+    args = parser.parse_args()
+    profiler = get_profiler(args.profile, 'rebuild_features.py')
+    matcher = KeywordMatcher.from_file(args.keywords) if args.keywords else INVITE_MATCHER
+    data_dir = Path(args.data_dir)
+    features_path = data_dir / 'conversations_features.json'
+    cols_path = store_path(features_path)
+
+    cache = None
+    if args.incremental:
+        with profiler.stage('load'):
+            cache = FeatureCache(data_dir / CACHE_NAME, feature_signature(FEATURE_VERSION, matcher))
+
+    source = export_path(data_dir, args.export)
+    snapshot = None
+    parsed, failures = TIMESTAMPS.parsed, TIMESTAMPS.failures
+    if args.no_snapshot or args.workers > 1:
+        # Stream matches one at a time instead of loading the whole export;
+        # the process pool works on the raw JSON, so it never uses the snapshot
+        print(f"Streaming {source}" + (f" through {args.workers} workers..." if args.workers > 1 else "..."))
+    else:
+        # Imported here: the snapshot module itself builds on this one
+        from snapshot import open_snapshot
+        snapshot = open_snapshot(data_dir, matcher, profiler, source)
+
+    # Parse and extract are charged as matches are pulled through them; the
+    # rest of the loop and closing the files is write time
+    with profiler.stage('write') as write_stage, \
+            FeatureStoreWriter(cols_path, features_path) as store, FeatureWriter(features_path) as writer, \
+            FeatureShards(data_dir) as shards:
+        processed = 0
+        if snapshot is None and args.workers > 1:
+            texts = profiler.iterate('parse', iter_match_texts(source))
+            rows = iter_parallel_feature_rows(texts, matcher, cache, args.workers)
+        elif snapshot is None:
+            matches = profiler.iterate('parse', iter_matches(source, raw=True))
+            rows = iter_feature_rows(matches, matcher, cache)
+        else:
+            rows = (record_feature_row(snapshot, record, cache) for record in snapshot)
+        for feature_row in profiler.iterate('extract', rows):
+            processed += 1
+            if feature_row is not None:
+                writer.write(feature_row)
+                store.write(feature_row)
+                shards.write(feature_row)
+    write_stage.items = writer.count
+    # Only the timestamps behind the rows built this run count, the same in
+    # both modes: the parses made here, or the snapshot's per-match tally
+    # for the rows it built (cached rows parse nothing either way)
+    if snapshot is not None:
+        unparseable = snapshot.row_failures
+        snapshot.close()
+    else:
+        unparseable = TIMESTAMPS.failures - failures
+
+    print(f"Processed {processed} matches")
+    if cache is not None:
+        with profiler.stage('write'):
+            cache.save()
+        print(f"♻️  Cache: {cache.hits} hits, {cache.misses} misses, {cache.dropped} dropped")
 
-print(f"\nExtracted features for {len(features)} conversations")
+    # The page renders from story_stats.json when it exists, so it has to
+    # follow the table it summarizes
+    story_path = data_dir / STORY_NAME
+    with profiler.stage('aggregate'):
+        save_story(load_features(data_dir), story_path)
+    print(f"\nExtracted features for {writer.count} conversations")
 
-# Stats
-with_timestamps = sum(1 for f in features if f['match_time'] or f['first_msg_time'])
-with_duration = sum(1 for f in features if f['duration_hours'])
-with_met = sum(1 for f in features if f['met'])
-met_yes = sum(1 for f in features if f['met'] == 'Yes')
+    # Stats
+    print(f"  With timestamps: {writer.with_timestamps}")
+    print(f"  With duration: {writer.with_duration}")
+    print(f"  With 'met' status: {writer.with_met} (Yes: {writer.met_yes})")
+    print(f"  Unparseable timestamps: {unparseable}")
 
-print(f"  With timestamps: {with_timestamps}")
-print(f"  With duration: {with_duration}")
-print(f"  With 'met' status: {with_met} (Yes: {met_yes})")
+    print(f"\n✅ Saved to {features_path}")
+    print(f"   File size: {writer.size / 1024:.1f} KB")
+    print(f"✅ Saved columnar copy to {cols_path}")
+    print(f"✅ Saved {len(shards.shards)} year shards listed in {data_dir / MANIFEST_NAME}")
+    print(f"✅ Saved page chart aggregates to {story_path}")
 
-# Save
-with open('data/conversations_features.json', 'w') as f:
-    json.dump(features, f, indent=2)
+    if profiler.enabled:
+        if snapshot is None:
+            profiler.count('timestamps_parsed', TIMESTAMPS.parsed - parsed)
+        profiler.count('timestamps_unparseable', unparseable)
+        if cache is not None:
+            profiler.count('cache_hits', cache.hits)
+            profiler.count('cache_misses', cache.misses)
+        profiler.save(data_dir / 'rebuild_features.profile.json')
 
-print(f"\n✅ Saved to data/conversations_features.json")
-print(f"   File size: {len(json.dumps(features)) / 1024:.1f} KB")
+if __name__ == '__main__':
+    main()
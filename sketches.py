@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Mergeable streaming summaries: running moments and KLL quantile sketches
+
+RunningStats keeps an exact count, mean, variance, min and max in constant
+memory. KLLSketch keeps a few hundred weighted samples from which any
+quantile can be read; with the default k=200 a reported quantile's rank is
+off by at most about 1.7% of the count (RANK_ERROR / k in general), and it
+is exact while fewer than k values have been added - the k-th triggers the
+first compaction. Both merge: summaries of shards, worker processes
+or users combined with merge() describe the union, RunningStats exactly
+(up to float rounding) and KLLSketch within the same error bound.
+Distribution pairs the two.
+
+Run directly to report median conversation lifespan, lifespan percentiles
+and median message length for data/ without holding or sorting every value.
+"""
+import argparse
+import math
+import random
+from pathlib import Path
+
+from feature_store import load_features, open_store
+from hinge_export import export_path
+
+DEFAULT_K = 200
+RANK_ERROR = 3.4  # rank error bound times k: about 1.7% of the count at k=200
+SHRINK = 2 / 3  # capacity ratio between adjacent KLL levels
+MIN_WIDTH = 8
+
+CHUNK = 65536  # values fed to a sketch per batch when streaming a column
+
+PERCENTILES = [10, 25, 50, 75, 90, 99]
+
+
+class RunningStats:
+    """Count, mean, variance, min and max without keeping the values
+
+    Uses Welford's update per value and Chan et al.'s pairwise formula to
+    merge, so batches and shards can be summarized separately.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from the mean
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def update(self, values):
+        """Add a sequence of values in one merge"""
+        if not len(values):
+            return self
+        batch = RunningStats()
+        batch.count = len(values)
+        batch.mean = sum(values) / batch.count
+        batch.m2 = sum((value - batch.mean) ** 2 for value in values)
+        batch.min, batch.max = min(values), max(values)
+        return self.merge(batch)
+
+    def merge(self, other):
+        """Fold other's values into this summary; returns self"""
+        if not other.count:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance, None when empty"""
+        return self.m2 / self.count if self.count else None
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance) if self.count else None
+
+    def to_json(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_json(cls, data):
+        stats = cls()
+        stats.count, stats.mean, stats.m2 = data['count'], data['mean'], data['m2']
+        stats.min, stats.max = data['min'], data['max']
+        return stats
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang & Liberty, 2016)
+
+    Values enter level 0. When the sketch is full, a level over its capacity
+    is sorted and every other item - odds or evens, at random - moves up a
+    level with twice the weight. Capacities shrink by 2/3 per level below
+    the top one (level 0 always buffers k values), so the sketch holds O(k)
+    items whatever the count. The
+    random choices come from a seeded generator, so a given input order
+    always produces the same sketch.
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [[]]
+        self._random = random.Random(seed)
+        self._resize(1)
+
+    def _resize(self, height):
+        """Grow to height levels and recompute the capacities"""
+        self.levels.extend([] for _ in range(height - len(self.levels)))
+        self._capacities = [max(MIN_WIDTH, math.ceil(self.k * SHRINK ** (height - level - 1)))
+                            for level in range(height)]
+        # Level 0 always buffers k raw values: far fewer (and no less
+        # accurate) compactions than its geometric share would allow
+        self._capacities[0] = max(self._capacities[0], self.k)
+        self._max_size = sum(self._capacities)
+        self._size = sum(len(items) for items in self.levels)
+
+    def add(self, value):
+        self.levels[0].append(value)
+        self.count += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update(self, values):
+        """Add many values, compacting exactly when add() would"""
+        values = values if isinstance(values, list) else list(values)
+        start = 0
+        while start < len(values):
+            batch = values[start:start + max(1, self._max_size - self._size)]
+            start += len(batch)
+            self.levels[0].extend(batch)
+            self.count += len(batch)
+            self._size += len(batch)
+            if self._size >= self._max_size:
+                self._compress()
+        return self
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            level = next(level for level, items in enumerate(self.levels)
+                         if len(items) >= self._capacities[level])
+            if level + 1 == len(self.levels):
+                self._resize(level + 2)
+            items = self.levels[level]
+            items.sort()
+            # An odd item out stays behind, so total weight always equals count
+            keep = len(items) % 2
+            promoted = items[keep + self._random.getrandbits(1)::2]
+            self.levels[level + 1].extend(promoted)
+            self._size -= len(items) - keep - len(promoted)
+            del items[keep:]
+
+    def merge(self, other):
+        """Fold other's values into this sketch; returns self"""
+        height = max(len(self.levels), len(other.levels))
+        self.levels.extend([] for _ in range(height - len(self.levels)))
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self._resize(height)
+        self._compress()
+        return self
+
+    @property
+    def exact(self):
+        """True while no values have been compacted away"""
+        return len(self.levels) == 1
+
+    @property
+    def rank_error(self):
+        """Bound on a reported quantile's rank error, as a fraction of the count"""
+        return 0.0 if self.exact else RANK_ERROR / self.k
+
+    def _weighted(self):
+        return sorted((value, 1 << level) for level, items in enumerate(self.levels) for value in items)
+
+    def quantiles(self, fractions):
+        """Values at each rank fraction (0-1); the median is quantiles([0.5])[0]
+
+        A fraction q picks the value at rank floor(q * count) of the sorted
+        data - exactly so while the sketch is exact - and None when empty.
+        """
+        if any(not 0 <= q <= 1 for q in fractions):
+            raise ValueError('quantile fractions must be between 0 and 1')
+        if not self.count:
+            return [None] * len(fractions)
+        weighted = self._weighted()
+        out = []
+        for q in fractions:
+            target = q * self.count
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative > target:
+                    break
+            out.append(value)
+        return out
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def rank(self, value):
+        """Approximate number of values <= value"""
+        return sum(1 << level for level, items in enumerate(self.levels) for item in items if item <= value)
+
+    def __len__(self):
+        """Items actually held (not the count of values seen)"""
+        return self._size
+
+    def to_json(self):
+        return {'k': self.k, 'count': self.count, 'levels': self.levels}
+
+    @classmethod
+    def from_json(cls, data, seed=0):
+        sketch = cls(data['k'], seed)
+        sketch.count = data['count']
+        sketch.levels = [list(items) for items in data['levels']]
+        sketch._resize(len(sketch.levels))
+        return sketch
+
+
+class Distribution:
+    """RunningStats and a KLLSketch fed the same values"""
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.stats = RunningStats()
+        self.sketch = KLLSketch(k, seed)
+
+    def add(self, value):
+        self.stats.add(value)
+        self.sketch.add(value)
+
+    def update(self, values):
+        values = values if isinstance(values, (list, tuple)) else list(values)
+        self.stats.update(values)
+        self.sketch.update(values)
+        return self
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def count(self):
+        return self.stats.count
+
+    @property
+    def median(self):
+        return self.sketch.quantile(0.5)
+
+    def summary(self, percentiles=PERCENTILES, digits=None):
+        """{'count', 'mean', 'min', 'max', 'p10', ...} (values rounded to digits if given)"""
+        values = {'mean': self.stats.mean if self.count else None, 'min': self.stats.min, 'max': self.stats.max}
+        quantiles = self.sketch.quantiles([p / 100 for p in percentiles])
+        values.update((f'p{p}', value) for p, value in zip(percentiles, quantiles))
+        if digits is not None:
+            values = {name: None if value is None else round(value, digits) for name, value in values.items()}
+        return {'count': self.count, 'exact': self.sketch.exact, 'rank_error': self.sketch.rank_error, **values}
+
+    def to_json(self):
+        return {'stats': self.stats.to_json(), 'sketch': self.sketch.to_json()}
+
+    @classmethod
+    def from_json(cls, data):
+        distribution = cls()
+        distribution.stats = RunningStats.from_json(data['stats'])
+        distribution.sketch = KLLSketch.from_json(data['sketch'])
+        return distribution
+
+
+def _chunks(values, size=CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def lifespan_distribution(data_dir, json_name='conversations_features.json', k=DEFAULT_K):
+    """Distribution of duration_hours (>= 0) over the feature table in data_dir
+
+    The columnar store is streamed a chunk at a time; the JSON fallback has
+    to be loaded whole.
+    """
+    distribution = Distribution(k)
+    store = open_store(Path(data_dir) / json_name)
+    if store is not None:
+        with store:
+            values, valid = store.values('duration_hours'), store.valid('duration_hours')
+            for chunk, ok in zip(_chunks(values), _chunks(valid)):
+                distribution.update([v for v, present in zip(chunk, ok) if present and v >= 0])
+        return distribution
+    rows = load_features(data_dir, json_name, columns=['duration_hours'])
+    distribution.update([d['duration_hours'] for d in rows
+                         if d.get('duration_hours') is not None and d['duration_hours'] >= 0])
+    return distribution
+
+
+def message_length_distribution(lengths, k=DEFAULT_K):
+    """Distribution of message body lengths, e.g. a MessageStore's or snapshot's lengths"""
+    distribution = Distribution(k)
+    for chunk in _chunks(lengths):
+        distribution.update(chunk.tolist())
+    return distribution
+
+
+def _format(summary, unit):
+    if not summary['count']:
+        return 'no values'
+    bound = '' if summary['exact'] else f" (±{summary['rank_error'] * 100:.2g}% rank)"
+    pcts = ', '.join(f"p{p} {summary[f'p{p}']:g}" for p in PERCENTILES if p != 50)
+    return (f"median {summary['p50']:g}{unit}{bound}, mean {summary['mean']:.1f}{unit}, "
+            f"max {summary['max']:g}{unit}\n      {pcts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default='data', help='folder holding the feature table and matches.json')
+    parser.add_argument('--k', type=int, default=DEFAULT_K,
+                        help=f'KLL accuracy parameter (rank error ~ {RANK_ERROR / DEFAULT_K * 100:.2g}%% '
+                             f'at the default {DEFAULT_K}, shrinks as 1/k)')
+    parser.add_argument('--shards', type=int, default=1, metavar='N',
+                        help='summarize the messages in N contiguous shards and merge them, '
+                             'as a sharded or parallel run would')
+    args = parser.parse_args()
+    data_dir = Path(args.data_dir)
+
+    lifespan = lifespan_distribution(data_dir, k=args.k).summary(digits=2)
+    print(f"⏳ Conversation lifespan over {lifespan['count']:,} conversations:")
+    print(f"      {_format(lifespan, 'h')}")
+
+    if export_path(data_dir).exists():
+        from snapshot import open_snapshot
+
+        with open_snapshot(data_dir) as snapshot:
+            lengths = snapshot.lengths
+            shards = max(1, args.shards)
+            bounds = [len(lengths) * shard // shards for shard in range(shards + 1)]
+            distribution = Distribution(args.k)
+            for start, end in zip(bounds, bounds[1:]):
+                distribution.merge(message_length_distribution(lengths[start:end], args.k))
+            messages = distribution.summary(digits=1)
+        shards = f" (merged from {args.shards} shards)" if args.shards > 1 else ''
+        print(f"💬 Message length over {messages['count']:,} messages{shards}:")
+        print(f"      {_format(messages, ' chars')}")
+
+
+if __name__ == '__main__':
+    main()
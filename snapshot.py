@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Persistent, memory-mapped snapshot of a parsed matches.json
+
+The first run converts the export (matches.json, or the Hinge zip) into a
+MessageStore (message_store.py) and writes it to data/.matches.snapshot; later runs of the funnel, timeline
+and feature scripts map that file instead of parsing the JSON again. The
+snapshot records the source's size, mtime and content hash plus the invite
+keyword signature, and is rebuilt automatically when any of them changes
+(a touched but unchanged export is recognized by its hash).
+
+File layout: an 8-byte magic, a little-endian uint32 header length, a JSON
+header, then 8-byte aligned per-message and per-match column sections.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+
+from atomic_write import atomic_write
+from feature_cache import feature_signature
+from hinge_export import export_path, iter_matches
+from message_store import MatchRecord, MessageStore
+from profiling import NULL_PROFILER
+from rebuild_features import INVITE_MATCHER
+
+MAGIC = b'HSNAPSHT'
+VERSION = 2
+
+SNAPSHOT_NAME = '.matches.snapshot'
+
+MET_CODES = [None, 'Yes', 'No', 'Not yet']
+
+# Section name -> array typecode; per-message sections first
+MESSAGE_SECTIONS = {'times': 'q', 'lengths': 'i', 'flags': 'B'}
+MATCH_SECTIONS = {
+    'match_time': 'q', 'bounds': 'q', 'first_invite': 'i', 'met': 'B',
+    'responses': 'i', 'met_yes': 'i', 'met_no': 'i', 'my_type': 'i', 'unparsed': 'B',
+    'key_offsets': 'q',
+}
+
+HASH_CHUNK = 1 << 20
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def file_hash(path):
+    """blake2b digest of a file's bytes"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_signature(matcher):
+    """Everything besides the export that shapes a snapshot's contents"""
+    return feature_signature(VERSION, matcher)
+
+
+def write_snapshot(store, path, source):
+    """Write a MessageStore built with keep_keys to path, atomically
+
+    source is {'size', 'mtime_ns', 'hash'} for the export it was built from.
+    """
+    records = store.records
+    columns = {name: array(code) for name, code in MATCH_SECTIONS.items()}
+    met_codes = {value: code for code, value in enumerate(MET_CODES)}
+    keys = bytearray()
+    columns['key_offsets'].append(0)
+    columns['bounds'].append(0)
+    for record in records:
+        columns['match_time'].append(record.match_time)
+        columns['bounds'].append(record.end)
+        columns['first_invite'].append(record.first_invite)
+        columns['met'].append(met_codes[record.met])
+        columns['responses'].append(record.responses)
+        columns['met_yes'].append(record.met_yes)
+        columns['met_no'].append(record.met_no)
+        columns['my_type'].append(record.my_type)
+        columns['unparsed'].append(record.unparsed)
+        if record.key:
+            keys += record.key.encode()
+        columns['key_offsets'].append(len(keys))
+
+    sections = [(name, getattr(store, name)) for name in MESSAGE_SECTIONS]
+    sections += list(columns.items()) + [('keys', array('B', keys))]
+    layout = {}
+    offset = 0
+    for name, section in sections:
+        layout[name] = {'offset': offset, 'type': section.typecode, 'length': len(section)}
+        offset = _align(offset + len(section) * section.itemsize)
+
+    header = json.dumps({
+        'version': VERSION,
+        'byteorder': sys.byteorder,
+        'signature': snapshot_signature(store.matcher),
+        'source': source,
+        'matches': len(records),
+        'messages': len(store.times),
+        'timestamps': {
+            'parsed': store.timestamps.parsed,
+            'failures': store.timestamps.failures,
+            'match_parsed': store.match_timestamps.parsed,
+            'match_failures': store.match_timestamps.failures,
+        },
+        'sections': layout,
+    }).encode()
+    data_start = _align(len(MAGIC) + 4 + len(header))
+
+    with atomic_write(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        f.write(b'\0' * (data_start - f.tell()))
+        for name, section in sections:
+            size = len(section) * section.itemsize
+            f.write(section.tobytes())
+            f.write(b'\0' * (_align(size) - size))
+
+
+class Snapshot(MessageStore):
+    """A MessageStore read back from a snapshot file via mmap
+
+    The message arrays are zero-copy views of the file and records are
+    rebuilt one at a time while iterating, so opening is near-instant at
+    any size. Read-only: add() is not available.
+    """
+
+    def __init__(self, path, matcher=INVITE_MATCHER):
+        super().__init__(matcher, keep_keys=True)
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a matches snapshot')
+        (header_len,) = struct.unpack_from('<I', self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        self.header = json.loads(self._mmap[header_start:header_start + header_len])
+        if self.header['version'] != VERSION:
+            raise ValueError(f"unsupported snapshot version {self.header['version']}")
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {self.header['byteorder']}-endian machine")
+        data_start = _align(header_start + header_len)
+        self._buffer = memoryview(self._mmap)
+        self._sections = {}
+        for name, section in self.header['sections'].items():
+            start = data_start + section['offset']
+            size = section['length'] * array(section['type']).itemsize
+            self._sections[name] = self._buffer[start:start + size].cast(section['type'])
+        self.times = self._sections['times']
+        self.lengths = self._sections['lengths']
+        self.flags = self._sections['flags']
+        counts = self.header['timestamps']
+        self.timestamps.parsed, self.timestamps.failures = counts['parsed'], counts['failures']
+        self.match_timestamps.parsed = counts['match_parsed']
+        self.match_timestamps.failures = counts['match_failures']
+
+    def __len__(self):
+        return self.header['matches']
+
+    def __iter__(self):
+        s = self._sections
+        match_time, bounds, first_invite, met = s['match_time'], s['bounds'], s['first_invite'], s['met']
+        responses, met_yes, met_no, my_type = s['responses'], s['met_yes'], s['met_no'], s['my_type']
+        unparsed = s['unparsed']
+        key_offsets, keys = s['key_offsets'], s['keys']
+        for i in range(len(self)):
+            record = MatchRecord()
+            record.match_time = match_time[i]
+            record.start = bounds[i]
+            record.end = bounds[i + 1]
+            record.first_invite = first_invite[i]
+            record.met = MET_CODES[met[i]]
+            record.responses = responses[i]
+            record.met_yes = met_yes[i]
+            record.met_no = met_no[i]
+            record.my_type = my_type[i]
+            record.unparsed = unparsed[i]
+            start, end = key_offsets[i], key_offsets[i + 1]
+            record.key = bytes(keys[start:end]).decode() if end > start else None
+            yield record
+
+    def add(self, match, raw=None):
+        raise TypeError('snapshots are read-only')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        try:
+            for section in self._sections.values():
+                section.release()
+            self._buffer.release()
+            self._mmap.close()
+        except BufferError:
+            # Views are still in use; the map is released with them
+            pass
+
+    def is_fresh(self, source_path, matcher=None):
+        """True if this snapshot still matches source_path (and matcher, if given)"""
+        if matcher is not None and self.header['signature'] != snapshot_signature(matcher):
+            return False
+        source = self.header['source']
+        stat = Path(source_path).stat()
+        if stat.st_size != source['size']:
+            return False
+        if stat.st_mtime_ns == source['mtime_ns']:
+            return True
+        # Touched or copied without changes: same bytes, same snapshot
+        return file_hash(source_path) == source['hash']
+
+
+def build_snapshot(source_path, snapshot_path, matcher=INVITE_MATCHER, profiler=NULL_PROFILER):
+    """Parse the export into a MessageStore and write its snapshot"""
+    stat = Path(source_path).stat()
+    store = MessageStore(matcher, keep_keys=True)
+    add = profiler.wrap('compact', store.add)
+    for match, raw in profiler.iterate('parse', iter_matches(source_path, raw=True)):
+        add(match, raw)
+    source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': file_hash(source_path)}
+    with profiler.stage('write'):
+        write_snapshot(store, snapshot_path, source)
+
+
+def open_snapshot(data_dir, matcher=None, profiler=NULL_PROFILER, source=None):
+    """Fresh Snapshot of the export in data_dir, (re)building it when missing or stale
+
+    source overrides the export (see hinge_export.export_path). matcher=None
+    accepts a snapshot built with any keywords (the funnel and timeline don't
+    look at invite flags); new snapshots use the default ones.
+    """
+    data_dir = Path(data_dir)
+    source_path = export_path(data_dir, source)
+    snapshot_path = data_dir / SNAPSHOT_NAME
+    with profiler.stage('load'):
+        if snapshot_path.exists():
+            try:
+                snapshot = Snapshot(snapshot_path, matcher or INVITE_MATCHER)
+            except (ValueError, struct.error):
+                # Truncated or from another version: rebuild it
+                snapshot = None
+            if snapshot is not None:
+                if snapshot.is_fresh(source_path, matcher):
+                    return snapshot
+                snapshot.close()
+    print(f"📸 Snapshotting {source_path} (parsed once, reused until it changes)...")
+    build_snapshot(source_path, snapshot_path, matcher or INVITE_MATCHER, profiler)
+    with profiler.stage('load'):
+        return Snapshot(snapshot_path, matcher or INVITE_MATCHER)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default='data', help='folder holding matches.json')
+    parser.add_argument('--export', metavar='PATH',
+                        help='matches.json or Hinge zip to read (default: the one in --data-dir)')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the snapshot is fresh')
+    args = parser.parse_args()
+    data_dir = Path(args.data_dir)
+    snapshot_path = data_dir / SNAPSHOT_NAME
+
+    started = time.perf_counter()
+    if args.force:
+        build_snapshot(export_path(data_dir, args.export), snapshot_path)
+    with open_snapshot(data_dir, source=args.export) as snapshot:
+        elapsed = time.perf_counter() - started
+        print(f"✅ {snapshot_path}: {len(snapshot):,} matches, {snapshot.header['messages']:,} messages, "
+              f"{snapshot_path.stat().st_size / 2 ** 20:.1f} MB ({elapsed:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
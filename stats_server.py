@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Async, caching HTTP server for the dashboard (index.html + data/*.json)
+
+Replaces `python3 -m http.server`: files are held in memory with their gzip
+(and brotli, when the `brotli` package is installed) encodings, refreshed
+when the file on disk changes, and served with ETags (If-None-Match -> 304),
+byte ranges (Range -> 206) and HEAD support. One asyncio event loop keeps
+hundreds of idle or slow keep-alive viewers open on a single core.
+
+GET /api/timeline?start=YYYY-MM-DD&end=YYYY-MM-DD answers date-range
+timeline queries from the time index (data/timeline_index.bin).
+
+GET /events is a Server-Sent Events stream: watch.py publishes an `update`
+event naming the data files it rewrote, so open pages refetch only those.
+
+Only the dashboard and the JSON outputs it reads are served, from an
+allowlist: the raw export (matches.json, user.json, ...), the feature cache
+and anything else dropped into data/ never leave disk.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import re
+import time
+from datetime import datetime
+from email.utils import formatdate
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from time_index import INDEX_NAME, TimeIndex
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.json': 'application/json',
+}
+
+# The dashboard's outputs; nothing else in data/ is served. Hinge exports
+# hold more personal files than matches.json, so this is an allowlist.
+PUBLIC_FILES = {'funnel_stats.json', 'timeline_stats.json', 'personal_stats.json',
+                'story_stats.json', 'data_cube.json'}
+# The feature table, its trimmed copy, its year shards and their manifest
+PUBLIC_FEATURES = re.compile(r'conversations_features(\.min|\.manifest|\.\d+|\.undated)?\.json')
+
+IDLE_TIMEOUT = 15
+HEARTBEAT = 15  # seconds between keep-alive comments on /events
+EVENT_HISTORY = 64  # updates remembered for reconnecting EventSources
+MAX_HEADER_BYTES = 16 * 1024
+
+REASONS = {
+    200: 'OK', 206: 'Partial Content', 304: 'Not Modified', 400: 'Bad Request',
+    404: 'Not Found', 405: 'Method Not Allowed', 416: 'Range Not Satisfiable',
+    431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+}
+
+_RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+class CachedFile:
+    """One file's bytes and encodings, valid for one (mtime, size) version"""
+
+    def __init__(self, path, stat):
+        self.version = (stat.st_mtime_ns, stat.st_size)
+        self.content_type = CONTENT_TYPES[path.suffix]
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.body = path.read_bytes()
+        tag = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        self.etag = f'"{tag}"'
+        # encoding -> (bytes, etag); only kept when actually smaller
+        self.encodings = {}
+        for encoding, data in (('br', self._encoded(path, stat, '.br')),
+                               ('gzip', self._encoded(path, stat, '.gz'))):
+            if data is not None and len(data) < len(self.body):
+                self.encodings[encoding] = (data, f'"{tag}-{encoding}"')
+
+    def _encoded(self, path, stat, suffix):
+        # A precompressed sibling (data/x.json.gz) wins when it is up to date
+        sibling = path.with_name(path.name + suffix)
+        try:
+            if sibling.stat().st_mtime_ns >= stat.st_mtime_ns:
+                return sibling.read_bytes()
+        except OSError:
+            pass
+        if suffix == '.gz':
+            return gzip.compress(self.body, compresslevel=6, mtime=0)
+        if brotli is not None:
+            return brotli.compress(self.body, quality=9)
+        return None
+
+
+class FileCache:
+    """In-memory copies of the served files, reloaded when they change on disk
+
+    Every request stats the file (cheap); a changed mtime or size reloads
+    and recompresses it once, off the event loop, however many requests
+    are waiting for it.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.locks = {}
+        self.loads = 0
+
+    async def get(self, path):
+        """CachedFile for path, or None if it doesn't exist"""
+        try:
+            stat = path.stat()
+        except OSError:
+            self.files.pop(path, None)
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self.files.get(path)
+        if cached is not None and cached.version == version:
+            return cached
+        lock = self.locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            cached = self.files.get(path)
+            if cached is None or cached.version != version:
+                cached = await asyncio.to_thread(CachedFile, path, stat)
+                self.files[path] = cached
+                self.loads += 1
+        return cached
+
+
+class EventHub:
+    """Fans update notifications out to the /events subscribers
+
+    Each update has an id; a reconnecting EventSource sends the last one it
+    saw (Last-Event-ID) and is told about every file changed since, or '*'
+    (refetch everything) when that is no longer known - e.g. after a restart.
+    """
+
+    def __init__(self):
+        self.boot = f'{time.time_ns():x}'
+        self.count = 0
+        self.history = []  # (number, files), oldest first
+        self.subscribers = set()
+
+    def publish(self, files):
+        """Announce that files (data/ names) changed; call from the event loop"""
+        self.count += 1
+        files = sorted(files)
+        self.history = (self.history + [(self.count, files)])[-EVENT_HISTORY:]
+        message = self.message(self.count, files)
+        for queue in self.subscribers:
+            queue.put_nowait(message)
+
+    def message(self, number, files):
+        data = json.dumps({'files': sorted(files)})
+        return f'id: {self.boot}-{number}\nevent: update\ndata: {data}\n\n'.encode()
+
+    def missed(self, last_event_id):
+        """Catch-up message for a client that last saw last_event_id, or None"""
+        if not last_event_id or not self.count:
+            return None
+        boot, _, number = last_event_id.rpartition('-')
+        if boot == self.boot and number.isdigit():
+            number = int(number)
+            if number == self.count:
+                return None
+            if self.history and number >= self.history[0][0] - 1:
+                files = {name for n, names in self.history if n > number for name in names}
+                return self.message(self.count, files)
+        return self.message(self.count, ['*'])
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+
+def is_public(name):
+    """Whether data/<name> is one of the dashboard's outputs"""
+    return name in PUBLIC_FILES or PUBLIC_FEATURES.fullmatch(name) is not None
+
+
+def resolve(root, target, data_dir=None):
+    """Filesystem path for a request target, or None if it isn't served
+
+    data_dir (default root/data) is what the page sees as ./data/.
+    """
+    path = target.split('?', 1)[0].split('#', 1)[0]
+    if path in ('/', '/index.html'):
+        return root / 'index.html'
+    parts = path.lstrip('/').split('/')
+    if len(parts) == 2 and parts[0] == 'data' and is_public(parts[1]):
+        return (root / 'data' if data_dir is None else data_dir) / parts[1]
+    return None
+
+
+def accepted_encodings(header):
+    """Content codings the client accepts (q > 0), from Accept-Encoding"""
+    accepted = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def etag_matches(header, etag):
+    """If-None-Match check (weak comparison, as RFC 9110 requires)"""
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+
+def parse_range(header, length):
+    """(start, end inclusive) for a single byte range, None to ignore it, or 'invalid'"""
+    match = _RANGE.match(header.strip())
+    if not match:
+        # Multiple or non-byte ranges: serving the whole file is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            return 'invalid'
+        return max(0, length - suffix), length - 1
+    start = int(first)
+    end = min(int(last), length - 1) if last else length - 1
+    if start >= length or (last and int(last) < start):
+        return 'invalid'
+    return start, end
+
+
+async def read_request(reader):
+    """(method, target, version, headers) for the next request, or None at EOF"""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), IDLE_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        return 431
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        return 400
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+class StatsServer:
+    """Serves the dashboard from root, and data_dir (default root/data) as /data/, with the FileCache"""
+
+    def __init__(self, root, data_dir=None):
+        self.root = Path(root)
+        self.data_dir = self.root / 'data' if data_dir is None else Path(data_dir)
+        self.cache = FileCache()
+        self.events = EventHub()
+        self.time_index = None
+        self.requests = 0
+
+    def response(self, status, headers, body=b'', head=False):
+        lines = [f'HTTP/1.1 {status} {REASONS[status]}']
+        if status != 304:
+            headers = {'Content-Length': str(len(body)), **headers}
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        data = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        return data if head else data + body
+
+    def _time_index(self):
+        """The time index, reopened when analyze_timeline.py rewrites it"""
+        path = self.data_dir / INDEX_NAME
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        if self.time_index is None or self.time_index[0] != version:
+            if self.time_index is not None:
+                self.time_index[1].close()
+            self.time_index = (version, TimeIndex(path))
+        return self.time_index[1]
+
+    def timeline_range(self, target, head):
+        """Timeline summary for ?start=&end= (ISO dates, end exclusive)"""
+        query = parse_qs(urlsplit(target).query)
+        try:
+            start, end = (datetime.fromisoformat(query[name][0]) if name in query else None
+                          for name in ('start', 'end'))
+        except ValueError:
+            return self.response(400, {'Content-Type': 'text/plain'}, b'Bad date\n', head)
+        index = self._time_index()
+        if index is None:
+            return self.response(404, {'Content-Type': 'text/plain'}, b'No time index\n', head)
+        body = json.dumps(index.summary(start, end)).encode()
+        return self.response(200, {'Content-Type': 'application/json', 'Cache-Control': 'no-cache'},
+                             body, head)
+
+    async def respond(self, method, target, headers):
+        """Response bytes for one parsed request"""
+        if method not in ('GET', 'HEAD'):
+            return self.response(405, {'Allow': 'GET, HEAD'})
+        head = method == 'HEAD'
+        if urlsplit(target).path == '/api/timeline':
+            return self.timeline_range(target, head)
+        path = resolve(self.root, target, self.data_dir)
+        cached = await self.cache.get(path) if path is not None else None
+        if cached is None:
+            return self.response(404, {'Content-Type': 'text/plain'}, b'Not found\n', head)
+
+        common = {
+            'Content-Type': cached.content_type,
+            'Cache-Control': 'no-cache',
+            'Last-Modified': cached.last_modified,
+            'Vary': 'Accept-Encoding',
+            'Accept-Ranges': 'bytes',
+        }
+
+        # Ranges address the identity bytes, so they are never compressed
+        range_header = headers.get('range')
+        if range_header:
+            if_range = headers.get('if-range')
+            if not if_range or if_range == cached.etag:
+                span = parse_range(range_header, len(cached.body))
+                if span == 'invalid':
+                    unsatisfiable = {**common, 'Content-Range': f'bytes */{len(cached.body)}'}
+                    return self.response(416, unsatisfiable, b'', head)
+                if span is not None:
+                    start, end = span
+                    return self.response(206, {
+                        **common, 'ETag': cached.etag,
+                        'Content-Range': f'bytes {start}-{end}/{len(cached.body)}',
+                    }, cached.body[start:end + 1], head)
+
+        body, etag, encoding = cached.body, cached.etag, None
+        accepted = accepted_encodings(headers.get('accept-encoding', ''))
+        for name in ('br', 'gzip'):
+            if name in accepted and name in cached.encodings:
+                body, etag = cached.encodings[name]
+                encoding = name
+                break
+        common['ETag'] = etag
+        if encoding:
+            common['Content-Encoding'] = encoding
+
+        if_none_match = headers.get('if-none-match')
+        if if_none_match and etag_matches(if_none_match, etag):
+            del common['Content-Type']
+            return self.response(304, common, b'', head=True)
+        return self.response(200, common, body, head)
+
+    async def stream_events(self, writer, headers):
+        """Hold the connection open as a Server-Sent Events stream until it drops"""
+        queue = self.events.subscribe()
+        try:
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                         b'Cache-Control: no-cache\r\nConnection: close\r\n\r\nretry: 2000\n\n')
+            missed = self.events.missed(headers.get('last-event-id'))
+            if missed:
+                writer.write(missed)
+            while True:
+                await writer.drain()
+                try:
+                    message = await asyncio.wait_for(queue.get(), HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle stream
+                    # and lets a vanished client surface as a write error
+                    message = b': ping\n\n'
+                writer.write(message)
+        finally:
+            self.events.unsubscribe(queue)
+
+    async def handle(self, reader, writer):
+        """Serve requests on one keep-alive connection until it closes"""
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                if isinstance(request, int):
+                    writer.write(self.response(request, {'Connection': 'close'}))
+                    break
+                method, target, version, headers = request
+                self.requests += 1
+                if method == 'GET' and urlsplit(target).path == '/events':
+                    await self.stream_events(writer, headers)
+                    break
+                try:
+                    data = await self.respond(method, target, headers)
+                except Exception:
+                    data = self.response(500, {'Connection': 'close'})
+                    writer.write(data)
+                    break
+                writer.write(data)
+                await writer.drain()
+                connection = headers.get('connection', '').lower()
+                if connection == 'close' or (version == 'HTTP/1.0' and connection != 'keep-alive'):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES,
+                                            backlog=1024)
+        encodings = 'gzip, br' if brotli is not None else 'gzip'
+        print(f"📡 Serving {self.root.resolve()} (data: {self.data_dir.resolve()}) "
+              f"on http://{host}:{port} ({encodings})")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on')
+    parser.add_argument('--root', default=Path(__file__).parent,
+                        help='folder holding index.html and data/')
+    parser.add_argument('--data-dir', help='folder to serve as data/ (default: <root>/data)')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(StatsServer(args.root, args.data_dir).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Precompute every index.html chart aggregate into data/story_stats.json
+
+Python ports of the page's computeSurvival, binFirstInvite, quadrantSummary,
+delaySummary, computeInviteTiming, computeHeatmap and findHotLane, with the
+same arithmetic in the same order, so the page can render from one small
+file instead of downloading and crunching every feature row.
+"""
+import argparse
+import json
+import math
+from datetime import datetime
+from pathlib import Path
+
+from atomic_write import atomic_write
+from feature_store import load_features
+
+STORY_VERSION = 1
+STORY_NAME = 'story_stats.json'
+
+MAX_HOURS = 168
+INACTIVITY_HOURS = 72
+SURVIVAL_SAMPLES_PER_HOUR = 10
+
+INVITE_BINS = [
+    {'id': '1-2', 'label': 'messages 1–2', 'min': -math.inf, 'max': 2},
+    {'id': '3-5', 'label': 'messages 3–5', 'min': 3, 'max': 5},
+    {'id': '6-10', 'label': 'messages 6–10', 'min': 6, 'max': 10},
+    {'id': '11-20', 'label': 'messages 11–20', 'min': 11, 'max': 20},
+    {'id': '21+', 'label': '21+ / never', 'min': 21, 'max': math.inf},
+]
+
+QUADRANTS = [
+    {'id': 'short-curious', 'label': 'Short & Curious', 'question': 'high', 'length': 'short'},
+    {'id': 'short-silent', 'label': 'Short & Silent', 'question': 'low', 'length': 'short'},
+    {'id': 'long-curious', 'label': 'Long & Curious', 'question': 'high', 'length': 'long'},
+    {'id': 'long-silent', 'label': 'Long & Silent', 'question': 'low', 'length': 'long'},
+]
+
+DELAY_BINS = [
+    {'id': 'lt10m', 'label': '<10 minutes', 'min': 0, 'max': 10},
+    {'id': '10-60m', 'label': '10–60 minutes', 'min': 10, 'max': 60},
+    {'id': '1-3h', 'label': '1–3 hours', 'min': 60, 'max': 180},
+    {'id': '3-6h', 'label': '3–6 hours', 'min': 180, 'max': 360},
+    {'id': '6-24h', 'label': '6–24 hours', 'min': 360, 'max': 1440},
+    {'id': '1-3d', 'label': '1–3 days', 'min': 1440, 'max': 4320},
+    {'id': 'gt3d', 'label': '>3 days', 'min': 4320, 'max': math.inf},
+]
+
+DAY_LABELS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+# Keys missing from a row behave like JS `undefined`, not like null
+_UNDEFINED = object()
+
+
+def _is_finite(value):
+    """JS Number.isFinite"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def parse_date(value):
+    """ISO timestamp -> datetime, or None (the page's parseDate)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _js_number(value):
+    """Infinities become null so the output stays valid JSON"""
+    return None if isinstance(value, float) and math.isinf(value) else value
+
+
+def wilson_interval(successes, total, z=1.96):
+    """Wilson score interval for a proportion, or None when total is 0"""
+    if not total:
+        return None
+    p = successes / total
+    denom = 1 + (z ** 2) / total
+    centre = p + (z ** 2) / (2 * total)
+    margin = z * math.sqrt((p * (1 - p) + (z ** 2) / (4 * total)) / total)
+    lower = max(0, (centre - margin) / denom)
+    upper = min(1, (centre + margin) / denom)
+    return {'lower': lower, 'upper': upper}
+
+
+def met_value(entry):
+    """'Yes' -> True, 'No' / 'Not yet' -> False, anything else -> None"""
+    if not entry:
+        return None
+    if entry == 'Yes':
+        return True
+    if entry in ('No', 'Not yet'):
+        return False
+    return None
+
+
+def summarize_rate(values):
+    """Meet rate, counts and Wilson interval over True/False/None outcomes"""
+    valid = [v for v in values if v is not None]
+    if not valid:
+        return {'rate': None, 'total': 0, 'successes': 0, 'ci': None}
+    successes = sum(1 for v in valid if v is True)
+    total = len(valid)
+    return {'rate': successes / total, 'total': total, 'successes': successes,
+            'ci': wilson_interval(successes, total)}
+
+
+def moving_average(values, window=3):
+    """Centred moving average, shrinking the window at the edges"""
+    out = []
+    for i in range(len(values)):
+        start = max(0, i - window // 2)
+        end = min(len(values), i + math.ceil(window / 2))
+        # Plain left-to-right addition, like d3.mean (not math.fsum)
+        total = 0
+        for value in values[start:end]:
+            total += value
+        out.append(total / (end - start))
+    return out
+
+
+def compute_survival(records, max_hours=MAX_HOURS, inactivity=INACTIVITY_HOURS):
+    """Kaplan–Meier curve, hazard series, median life and 72h meet rates"""
+    survival_records = []
+    for d in records:
+        span = d.get('duration_hours')
+        span = span if _is_finite(span) else None
+        if span is None:
+            match = parse_date(d.get('match_time'))
+            last = parse_date(d.get('last_msg_time'))
+            if match and last:
+                span = (last - match).total_seconds() / 3600
+        if not _is_finite(span) or span < 0:
+            continue
+        death_time = span + inactivity
+        survival_records.append({
+            'time': min(death_time, max_hours),
+            'raw_time': death_time,
+            'event': death_time <= max_hours,
+            'met': met_value(d.get('met')),
+        })
+
+    if not survival_records:
+        return {
+            'curve': [{'time': 0, 'survival': 1}, {'time': max_hours, 'survival': 1}],
+            'hazard': [],
+            'medianLife': None,
+            'surviveMetRate': None,
+            'dieMetRate': None,
+        }
+
+    # Deaths before censorings at the same time, as the page sorts them
+    ordered = sorted(survival_records, key=lambda r: (r['time'], not r['event']))
+
+    aggregated = []
+    for rec in ordered:
+        if aggregated and abs(aggregated[-1][0] - rec['time']) < 1e-6:
+            aggregated[-1][1 if rec['event'] else 2] += 1
+        else:
+            aggregated.append([rec['time'], 1 if rec['event'] else 0, 0 if rec['event'] else 1])
+
+    at_risk = len(ordered)
+    survival = 1
+    curve = [{'time': 0, 'survival': 1}]
+    for time, deaths, censored in aggregated:
+        curve.append({'time': time, 'survival': curve[-1]['survival']})
+        if deaths > 0 and at_risk > 0:
+            survival *= (1 - deaths / at_risk)
+        curve.append({'time': time, 'survival': survival})
+        at_risk -= deaths + censored
+        if at_risk <= 0:
+            break
+    if curve[-1]['time'] < max_hours:
+        curve.append({'time': max_hours, 'survival': curve[-1]['survival']})
+
+    buckets = [[0, 0] for _ in range(max_hours)]
+    for rec in ordered:
+        bucket = min(max_hours - 1, math.floor(min(max(rec['time'] - 1e-6, 0), max_hours - 1)))
+        if rec['event'] and rec['time'] < max_hours:
+            buckets[bucket][0] += 1
+        else:
+            buckets[bucket][1] += 1
+    hazard = []
+    at_risk = len(ordered)
+    for h, (deaths, censored) in enumerate(buckets):
+        hazard.append({'hour': h + 0.5, 'hazard': deaths / at_risk if at_risk > 0 else 0, 'atRisk': at_risk})
+        at_risk -= deaths + censored
+        if at_risk <= 0:
+            hazard.extend({'hour': rest + 0.5, 'hazard': 0, 'atRisk': 0}
+                          for rest in range(h + 1, len(buckets)))
+            break
+    for point, smooth in zip(hazard, moving_average([p['hazard'] for p in hazard], 5)):
+        point['smooth'] = smooth
+
+    median_life = next((pt['time'] for pt in curve if pt['survival'] <= 0.5), None)
+
+    survivors = [r['met'] for r in survival_records if r['raw_time'] >= 72 or not r['event']]
+    early_deaths = [r['met'] for r in survival_records if r['event'] and r['raw_time'] < 72]
+
+    return {
+        'curve': curve,
+        'hazard': hazard,
+        'medianLife': median_life,
+        'surviveMetRate': summarize_rate(survivors),
+        'dieMetRate': summarize_rate(early_deaths),
+    }
+
+
+def sample_survival(curve, max_hours=MAX_HOURS, per_hour=SURVIVAL_SAMPLES_PER_HOUR):
+    """Survival at every 1/per_hour of an hour, as the page's survivalAt reads the curve
+
+    The step curve has a point per distinct death time, so it grows with the
+    export; the page only ever asks for survival at 0.5h ticks and at the
+    hover position (shown to 0.1h), so a fixed grid keeps the payload flat.
+    """
+    grid = []
+    i = 0
+    survival = 1
+    for step in range(max_hours * per_hour + 1):
+        t = step / per_hour
+        while i < len(curve) and curve[i]['time'] <= t:
+            survival = curve[i]['survival']
+            i += 1
+        grid.append(survival)
+    return grid
+
+
+def invite_bin(index):
+    """INVITE_BINS entry for a first-invite message index (no invite -> last bin)"""
+    if not _is_finite(index):
+        return INVITE_BINS[-1]
+    return next((b for b in INVITE_BINS if b['min'] <= index <= b['max']), INVITE_BINS[-1])
+
+
+def delay_bin(delay):
+    """DELAY_BINS entry for a first-message delay in minutes, or None"""
+    if not _is_finite(delay):
+        return None
+    return next((b for b in DELAY_BINS if b['min'] <= delay < b['max']), None)
+
+
+def quadrant_id(d):
+    """QUADRANTS id for a record, or None without density / length
+
+    A missing key counts as low / short, like JS undefined in the page.
+    """
+    density = d.get('question_density_first10', _UNDEFINED)
+    length = d.get('median_len_first10', _UNDEFINED)
+    if density is None or length is None:
+        return None
+    questions_high = density is not _UNDEFINED and density > 0.3
+    length_long = length is not _UNDEFINED and length > 120
+    return f"{'long' if length_long else 'short'}-{'curious' if questions_high else 'silent'}"
+
+
+def bin_first_invite(records):
+    """Meet rate by first-invite message bin, split by concrete / loose invite"""
+    results = []
+    for bin_ in INVITE_BINS:
+        results.append({**bin_, 'concrete': True, 'values': []})
+        results.append({**bin_, 'concrete': False, 'values': []})
+
+    for d in records:
+        idx = d.get('first_invite_msg_index')
+        idx = idx if _is_finite(idx) else None
+        bin_ = invite_bin(idx)
+        is_concrete = d.get('invite_is_concrete') is True if idx is not None else False
+        met = met_value(d.get('met'))
+        if met is None:
+            continue
+        next(r for r in results if r['id'] == bin_['id'] and r['concrete'] == is_concrete)['values'].append(met)
+
+    out = []
+    for result in results:
+        summary = summarize_rate(result['values'])
+        out.append({
+            'id': result['id'],
+            'label': result['label'],
+            'min': _js_number(result['min']),
+            'max': _js_number(result['max']),
+            'concrete': result['concrete'],
+            'count': summary['total'],
+            'successes': summary['successes'],
+            'rate': summary['rate'],
+            'ci': summary['ci'],
+        })
+    return out
+
+
+def quadrant_summary(records):
+    """Meet rate by question density (>0.3) x median message length (>120)"""
+    values = {q['id']: [] for q in QUADRANTS}
+    for d in records:
+        quadrant = quadrant_id(d)
+        if quadrant is None:
+            continue
+        met = met_value(d.get('met'))
+        if met is None:
+            continue
+        values[quadrant].append(met)
+
+    out = []
+    for q in QUADRANTS:
+        summary = summarize_rate(values[q['id']])
+        out.append({**q, 'rate': summary['rate'], 'count': summary['total']})
+    return out
+
+
+def delay_summary(records):
+    """Meet rate by delay between match and first message"""
+    values = {b['id']: [] for b in DELAY_BINS}
+    for d in records:
+        bin_ = delay_bin(d.get('first_msg_delay_minutes'))
+        if bin_ is None:
+            continue
+        met = met_value(d.get('met'))
+        if met is None:
+            continue
+        values[bin_['id']].append(met)
+
+    out = []
+    for b in DELAY_BINS:
+        summary = summarize_rate(values[b['id']])
+        out.append({**b, 'max': _js_number(b['max']),
+                    'rate': summary['rate'], 'count': summary['total'], 'ci': summary['ci']})
+    return out
+
+
+def compute_invite_timing(records):
+    """(invites, timing method label); invites are (datetime, is_concrete) pairs"""
+    invites = []
+    methods = []
+    for d in records:
+        invite_time = None
+        for field, method in (('first_invite_time', 'Exact timestamp'),
+                              ('first_msg_time', 'First message proxy'),
+                              ('match_time', 'Match time proxy'),
+                              ('last_msg_time', 'Last message proxy')):
+            invite_time = parse_date(d.get(field))
+            if invite_time:
+                if method not in methods:
+                    methods.append(method)
+                break
+        if not invite_time:
+            continue
+        invites.append((invite_time, d.get('invite_is_concrete') is True))
+
+    if not methods:
+        method = 'No timestamp available'
+    elif len(methods) == 1:
+        method = methods[0]
+    elif 'Exact timestamp' in methods and len(methods) == 2:
+        other = next(m for m in methods if m != 'Exact timestamp')
+        method = f'Exact timestamp + {other}'
+    else:
+        method = 'Mixed timing estimates'
+    return invites, method
+
+
+def _js_day(ts):
+    # JS getDay(): Sunday = 0
+    return (ts.weekday() + 1) % 7
+
+
+def compute_heatmap(invites, matches, only_concrete=True):
+    """Invite propensity (invites / matches) by weekday and hour"""
+    cells = [[{'day': day, 'hour': hour, 'invites': 0, 'matches': 0, 'propensity': 0}
+              for hour in range(24)] for day in range(7)]
+    for ts in matches:
+        cells[_js_day(ts)][ts.hour]['matches'] += 1
+    for invite_time, concrete in invites:
+        if only_concrete and not concrete:
+            continue
+        cells[_js_day(invite_time)][invite_time.hour]['invites'] += 1
+
+    max_prop = 0
+    for row in cells:
+        for cell in row:
+            if cell['matches'] > 0:
+                cell['propensity'] = cell['invites'] / cell['matches']
+                if cell['propensity'] > max_prop:
+                    max_prop = cell['propensity']
+            else:
+                cell['propensity'] = 0
+    return {'grid': [cell for row in cells for cell in row], 'maxProp': max_prop}
+
+
+def format_hour_range(start, end):
+    def format_hour(hour):
+        suffix = 'pm' if hour >= 12 else 'am'
+        return f"{hour % 12 or 12}{suffix}"
+    return f"{format_hour(start)}–{format_hour(end)}"
+
+
+def find_hot_lane(grid):
+    """Label of the best 3-hour window of invite propensity"""
+    if not grid:
+        return '—'
+    by_day = {}
+    for cell in grid:
+        by_day.setdefault(cell['day'], []).append(cell)
+
+    best = {'score': -math.inf, 'day': 0, 'start': 0, 'end': 0}
+    for day, cells in by_day.items():
+        ordered = sorted(cells, key=lambda c: c['hour'])
+        for h in range(len(ordered)):
+            window = ordered[h:h + 3]
+            score = 0
+            for cell in window:
+                score += cell['propensity']
+            if score > best['score']:
+                best = {'score': score, 'day': day, 'start': window[0]['hour'], 'end': window[-1]['hour'] + 1}
+
+    if best['score'] <= 0:
+        top = None
+        for cell in grid:
+            if cell['propensity'] > (top['propensity'] if top else -1):
+                top = cell
+        if not top or not top['propensity']:
+            return '—'
+        return f"{DAY_LABELS[top['day']]} {format_hour_range(top['hour'], top['hour'] + 1)}"
+    return f"{DAY_LABELS[best['day']]} {format_hour_range(best['start'], best['end'])}"
+
+
+def build_story(records):
+    """Every chart aggregate the page needs, in the shapes its renderers take"""
+    survival = compute_survival(records)
+    survival['samplesPerHour'] = SURVIVAL_SAMPLES_PER_HOUR
+    survival['grid'] = sample_survival(survival.pop('curve'))
+    invites, method = compute_invite_timing(records)
+    matches = [ts for ts in (parse_date(d.get('match_time')) for d in records) if ts]
+    heatmap_concrete = compute_heatmap(invites, matches, True)
+    heatmap_all = compute_heatmap(invites, matches, False)
+    return {
+        'version': STORY_VERSION,
+        'conversations': len(records),
+        'survival': survival,
+        'inviteBins': bin_first_invite(records),
+        'quadrants': quadrant_summary(records),
+        'delays': delay_summary(records),
+        'inviteTimingMethod': method,
+        'heatmap': {
+            'concrete': {**heatmap_concrete, 'hotLane': find_hot_lane(heatmap_concrete['grid'])},
+            'all': {**heatmap_all, 'hotLane': find_hot_lane(heatmap_all['grid'])},
+        },
+    }
+
+
+def save_story(records, path):
+    """Write the precomputed story aggregates to path"""
+    with atomic_write(path) as f:
+        json.dump(build_story(records), f, separators=(',', ':'), allow_nan=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default='data',
+                        help=f'folder holding the feature table and receiving {STORY_NAME}')
+    args = parser.parse_args()
+    data_dir = Path(args.data_dir)
+    records = load_features(data_dir)
+    output_path = data_dir / STORY_NAME
+    save_story(records, output_path)
+    print(f"✅ Story aggregates for {len(records)} conversations saved to {output_path}")
+    print(f"   File size: {output_path.stat().st_size / 1024:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Vectorized (NumPy) conversation survival analysis
+
+Same model as the page's computeSurvival: a conversation "dies" 72h after its
+last message and is censored at the 168h horizon. Records are grouped by
+event time with array operations instead of a per-record walk, and bootstrap
+confidence bands are computed by resampling across a process pool.
+"""
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from atomic_write import atomic_write
+from feature_store import ENUMS, MET_YES, open_store
+from story_stats import parse_date
+
+MAX_HOURS = 168
+INACTIVITY_HOURS = 72
+SMOOTH_WINDOW = 5
+
+# Bands are reported on this grid (every half hour, like the page's line)
+BAND_STEP_HOURS = 0.5
+
+# Resamples per task; each chunk gets its own seed, so results don't depend
+# on how many workers share the work
+BOOTSTRAP_CHUNK = 50
+
+
+def load_spans(data_dir, json_name='conversations_features.json'):
+    """(hours from match to last message, met code) arrays for every conversation
+
+    duration_hours is used when present; otherwise the span falls back to
+    last_msg_time - match_time, as the page does. Conversations with no
+    usable span get NaN.
+    """
+    json_path = Path(data_dir) / json_name
+    store = open_store(json_path)
+    if store is not None:
+
+        def column(name, dtype):
+            values = np.frombuffer(store.values(name), dtype=dtype)
+            valid = store.valid(name)
+            return values, (None if valid is None else np.frombuffer(valid, dtype=np.uint8).view(bool))
+
+        duration, duration_ok = column('duration_hours', np.float64)
+        match, match_ok = column('match_time', np.int64)
+        last, last_ok = column('last_msg_time', np.int64)
+        met, _ = column('met', np.uint8)
+        fallback = (last - match) / 3600
+        spans = np.where(duration_ok, duration, np.where(match_ok & last_ok, fallback, np.nan))
+        met = met.copy()
+        del duration, duration_ok, match, match_ok, last, last_ok
+        store.close()
+        return spans, met
+
+    with open(json_path) as f:
+        rows = json.load(f)
+    codes = {value: code for code, value in enumerate(ENUMS['met'], 1)}
+    spans = np.full(len(rows), np.nan)
+    met = np.zeros(len(rows), dtype=np.uint8)
+    for i, row in enumerate(rows):
+        duration = row.get('duration_hours')
+        if isinstance(duration, (int, float)):
+            spans[i] = duration
+        else:
+            match = parse_date(row.get('match_time'))
+            last = parse_date(row.get('last_msg_time'))
+            if match and last:
+                spans[i] = (last - match).total_seconds() / 3600
+        met[i] = codes.get(row.get('met'), 0)
+    return spans, met
+
+
+def death_times(spans, max_hours=MAX_HOURS, inactivity=INACTIVITY_HOURS):
+    """(capped time, event flag, raw death time) for the usable spans"""
+    spans = spans[np.isfinite(spans) & (spans >= 0)]
+    raw = spans + inactivity
+    return np.minimum(raw, max_hours), raw <= max_hours, raw
+
+
+def group_events(times, events):
+    """Distinct event times, deaths and censorings at each, and each record's group"""
+    order = np.argsort(times, kind='stable')
+    ordered = times[order]
+    starts = np.concatenate(([True], np.diff(ordered) >= 1e-6))
+    group_sorted = np.cumsum(starts) - 1
+    group = np.empty_like(group_sorted)
+    group[order] = group_sorted
+    unique_times = ordered[starts]
+    deaths = np.bincount(group, weights=events.astype(np.float64), minlength=len(unique_times))
+    totals = np.bincount(group, minlength=len(unique_times))
+    return unique_times, deaths, totals - deaths, group
+
+
+def kaplan_meier(deaths, censored):
+    """Survival after each distinct time, for deaths / censorings per time"""
+    leaving = deaths + censored
+    at_risk = leaving.sum() - np.concatenate(([0], np.cumsum(leaving)[:-1]))
+    factors = np.ones(len(deaths))
+    alive = at_risk > 0
+    factors[alive] = 1 - deaths[alive] / at_risk[alive]
+    return np.cumprod(factors)
+
+
+def median_life(unique_times, survival):
+    """First time survival drops to 0.5 or below, or None"""
+    below = np.flatnonzero(survival <= 0.5)
+    return float(unique_times[below[0]]) if len(below) else None
+
+
+def survival_at(unique_times, survival, hours):
+    """Evaluate the KM step function at each of hours"""
+    idx = np.searchsorted(unique_times, hours, side='right') - 1
+    return np.where(idx >= 0, survival[np.maximum(idx, 0)], 1.0)
+
+
+def moving_average(values, window=SMOOTH_WINDOW):
+    """Centred moving average, shrinking the window at the edges"""
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    i = np.arange(len(values))
+    start = np.maximum(0, i - window // 2)
+    end = np.minimum(len(values), i + (window + 1) // 2)
+    return (sums[end] - sums[start]) / (end - start)
+
+
+def hazard_series(times, events, max_hours=MAX_HOURS):
+    """Hourly (at risk, hazard, smoothed hazard) arrays over the horizon"""
+    buckets = np.minimum(max_hours - 1, np.floor(np.clip(times - 1e-6, 0, max_hours - 1))).astype(np.int64)
+    is_death = events & (times < max_hours)
+    deaths = np.bincount(buckets[is_death], minlength=max_hours)
+    leaving = np.bincount(buckets, minlength=max_hours)
+    at_risk = len(times) - np.concatenate(([0], np.cumsum(leaving)[:-1]))
+    hazard = np.zeros(max_hours)
+    alive = at_risk > 0
+    hazard[alive] = deaths[alive] / at_risk[alive]
+    return at_risk, hazard, moving_average(hazard)
+
+
+_WORKER_STATE = {}
+
+
+def _init_worker(group, events, unique_times, grid):
+    _WORKER_STATE.update(group=group, events=events, unique_times=unique_times, grid=grid)
+
+
+def _bootstrap_chunk(resamples, seed):
+    """Survival on the band grid and median life for `resamples` resamples"""
+    group = _WORKER_STATE['group']
+    events = _WORKER_STATE['events']
+    unique_times = _WORKER_STATE['unique_times']
+    grid = _WORKER_STATE['grid']
+    rng = np.random.default_rng(seed)
+    n = len(group)
+    k = len(unique_times)
+    curves = np.empty((resamples, len(grid)))
+    medians = np.full(resamples, np.nan)
+    for r in range(resamples):
+        # A resample only changes how many records land on each distinct
+        # time, so the grouping from the full sample is reused
+        picks = rng.integers(0, n, n)
+        totals = np.bincount(group[picks], minlength=k)
+        deaths = np.bincount(group[picks], weights=events[picks], minlength=k)
+        survival = kaplan_meier(deaths, totals - deaths)
+        curves[r] = survival_at(unique_times, survival, grid)
+        below = np.flatnonzero(survival <= 0.5)
+        if len(below):
+            medians[r] = unique_times[below[0]]
+    return curves, medians
+
+
+def bootstrap_bands(times, events, resamples=200, workers=None, seed=0, level=0.95,
+                    max_hours=MAX_HOURS):
+    """Pointwise bootstrap confidence bands for the KM curve and median life
+
+    Resamples are split into fixed, independently seeded chunks and run on
+    a process pool (workers=1 runs in-process), so a given seed gives the
+    same bands for any worker count.
+    """
+    unique_times, _, _, group = group_events(times, events)
+    events = events.astype(np.float64)
+    grid = np.arange(0, max_hours + BAND_STEP_HOURS / 2, BAND_STEP_HOURS)
+    sizes = [min(BOOTSTRAP_CHUNK, resamples - start) for start in range(0, resamples, BOOTSTRAP_CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    state = (group, events, unique_times, grid)
+
+    if workers == 1 or len(sizes) <= 1:
+        _init_worker(*state)
+        results = [_bootstrap_chunk(size, s) for size, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=state) as pool:
+            results = list(pool.map(_bootstrap_chunk, sizes, seeds))
+
+    curves = np.concatenate([curves for curves, _ in results])
+    medians = np.concatenate([medians for _, medians in results])
+    tail = (1 - level) / 2 * 100
+    lower, upper = np.percentile(curves, [tail, 100 - tail], axis=0)
+    found = medians[np.isfinite(medians)]
+    # Only bound the median when most resamples actually reach 50%
+    if len(found) * 2 > len(medians):
+        median_ci = [float(v) for v in np.percentile(found, [tail, 100 - tail])]
+    else:
+        median_ci = None
+    return {
+        'resamples': resamples,
+        'level': level,
+        'hours': grid.tolist(),
+        'lower': lower.tolist(),
+        'upper': upper.tolist(),
+        'median_life': median_ci,
+    }
+
+
+def _curve(unique_times, survival, max_hours=MAX_HOURS):
+    times = [0.0] + unique_times.tolist()
+    values = [1.0] + survival.tolist()
+    if times[-1] < max_hours:
+        times.append(float(max_hours))
+        values.append(values[-1])
+    return {'time': times, 'survival': values}
+
+
+def _rate(outcomes):
+    return float(outcomes.mean()) if len(outcomes) else None
+
+
+def kaplan_meier_summary(spans, met=None, resamples=0, workers=None, seed=0):
+    """KM curve, median life, hourly hazard and (optionally) bootstrap bands"""
+    usable = np.isfinite(spans) & (spans >= 0)
+    times, events, raw = death_times(spans)
+    result = {
+        'conversations': int(len(times)),
+        'horizon_hours': MAX_HOURS,
+        'inactivity_hours': INACTIVITY_HOURS,
+    }
+    if not len(times):
+        result.update(curve={'time': [0, MAX_HOURS], 'survival': [1, 1]}, median_life=None,
+                      hazard=None, bands=None)
+        return result
+
+    unique_times, deaths, censored, _ = group_events(times, events)
+    survival = kaplan_meier(deaths, censored)
+    at_risk, hazard, smooth = hazard_series(times, events)
+    result.update(
+        curve=_curve(unique_times, survival),
+        median_life=median_life(unique_times, survival),
+        hazard={
+            'hour': (np.arange(MAX_HOURS) + 0.5).tolist(),
+            'at_risk': at_risk.tolist(),
+            'hazard': hazard.tolist(),
+            'smooth': smooth.tolist(),
+        },
+    )
+    if met is not None:
+        # Split on the conversation itself lasting 72h (the page's rawTime
+        # split can't fire: rawTime already includes the 72h of silence)
+        known = met[usable] != 0
+        yes = met[usable] == MET_YES
+        lasted = raw - INACTIVITY_HOURS >= 72
+        result['meet_rate'] = {
+            'lasted_72h': _rate(yes[known & lasted]),
+            'ended_before_72h': _rate(yes[known & ~lasted]),
+        }
+    result['bands'] = bootstrap_bands(times, events, resamples, workers, seed) if resamples else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default='data',
+                        help='folder holding the feature table and receiving survival_stats.json')
+    parser.add_argument('--resamples', type=int, default=200,
+                        help='bootstrap resamples for the confidence bands (0 to skip)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes for the bootstrap (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=0, help='bootstrap random seed')
+    args = parser.parse_args()
+
+    spans, met = load_spans(args.data_dir)
+    result = kaplan_meier_summary(spans, met, args.resamples, args.workers, args.seed)
+
+    output_path = Path(args.data_dir) / 'survival_stats.json'
+    with atomic_write(output_path) as f:
+        json.dump(result, f)
+
+    print(f"⏳ Survival over {result['conversations']:,} conversations")
+    median = result['median_life']
+    print(f"   Median lifetime: {f'{median:.1f}h' if median is not None else 'beyond the horizon'}")
+    bands = result['bands']
+    if bands and bands['median_life']:
+        low, high = bands['median_life']
+        print(f"   {bands['level']:.0%} band ({bands['resamples']} resamples): {low:.1f}h – {high:.1f}h")
+    print(f"✅ Survival data saved to {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic, seeded Hinge matches.json export
+
+Matches, chats and we_met responses have the same shape the analysis
+scripts read from a real export, so every script can be run (and timed) at
+any size without anyone's personal data. The same seed and options always
+produce the same file.
+"""
+import argparse
+import json
+import math
+import random
+from datetime import datetime, timedelta
+
+HINGE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Relative weight of each hour of day for match and message times
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 1, 2, 3, 4, 4, 4, 5, 6, 5, 5, 5, 6, 7, 9, 11, 12, 12, 9, 5]
+
+OPENERS = [
+    'hey!', 'hi there', 'hey, how is your week going?', 'ok your travel photos are amazing',
+    'what is the story behind your third picture?', 'hello :)', 'that hike looks incredible, where was it?',
+]
+REPLIES = [
+    'haha yes', 'not bad, busy with work', 'I just got back from a trip actually',
+    'I love that place', 'what do you do for fun?', 'same here', 'that sounds like a lot of fun',
+    'how long have you lived in the city?', 'I mostly cook and go climbing on weekends',
+    'honestly I could talk about books forever', 'lol', 'what kind of music are you into?',
+    'that is a great question, let me think about it',
+]
+INVITES = [
+    'want to grab coffee sometime?', 'we should get a drink', 'would you want to meet up?',
+    'dinner sometime?', 'want to hang out this week?',
+]
+CONCRETE_INVITES = [
+    'want to grab coffee tomorrow at 10am?', 'drinks on friday at 7pm?',
+    'how about dinner saturday night?', 'are you free this weekend for brunch?',
+    'want to meet at the cafe on sunday at 3pm?',
+]
+FOLLOW_UPS = [
+    'sounds good!', 'perfect, see you then', 'can we do a bit later?', 'yes! looking forward to it',
+    'I can do that', 'let me check my schedule', 'great, I will send you the address',
+]
+
+
+class ExportGenerator:
+    """Seeded source of synthetic matches
+
+    chat_rate is the share of matches with a conversation, mean_messages the
+    mean conversation length (log-normal, so most are short and a few run
+    long), met_rate the share of conversations with a we_met response, and
+    start/days the window match times are spread over.
+    """
+
+    def __init__(self, seed=0, chat_rate=0.45, mean_messages=14, max_messages=400,
+                 met_rate=0.1, invite_rate=0.35, start=datetime(2021, 1, 1), days=3 * 365):
+        self.rng = random.Random(seed)
+        self.chat_rate = chat_rate
+        self.max_messages = max_messages
+        self.met_rate = met_rate
+        self.invite_rate = invite_rate
+        self.start = start
+        self.days = days
+        # Log-normal with the requested mean: mu = ln(mean) - sigma^2 / 2
+        self.sigma = 1.0
+        self.mu = math.log(max(mean_messages, 1)) - self.sigma ** 2 / 2
+        self.hours = list(range(24))
+
+    def _match_time(self):
+        rng = self.rng
+        day = self.start + timedelta(days=rng.randrange(self.days))
+        hour = rng.choices(self.hours, HOUR_WEIGHTS)[0]
+        return day + timedelta(hours=hour, minutes=rng.randrange(60), seconds=rng.randrange(60))
+
+    def _gap(self):
+        # Mostly quick back-and-forth, sometimes a day or more of silence
+        rng = self.rng
+        if rng.random() < 0.8:
+            return timedelta(seconds=int(rng.lognormvariate(5, 1.2)))
+        return timedelta(seconds=int(rng.lognormvariate(10.5, 1.0)))
+
+    def _chats(self, match_time):
+        rng = self.rng
+        count = min(self.max_messages, max(1, int(rng.lognormvariate(self.mu, self.sigma))))
+        invite_at = rng.randrange(count) if rng.random() < self.invite_rate else None
+        # First message delay: minutes to a few days after the match
+        when = match_time + timedelta(seconds=int(rng.lognormvariate(8, 1.5)))
+        chats = []
+        for i in range(count):
+            if i == 0:
+                body = rng.choice(OPENERS)
+            elif i == invite_at:
+                body = rng.choice(CONCRETE_INVITES if rng.random() < 0.5 else INVITES)
+            elif invite_at is not None and i > invite_at and rng.random() < 0.3:
+                body = rng.choice(FOLLOW_UPS)
+            else:
+                body = rng.choice(REPLIES)
+                if rng.random() < 0.15:
+                    body = f"{body} {rng.choice(REPLIES)}"
+            chats.append({'body': body, 'timestamp': when.strftime(HINGE_FORMAT)})
+            last = when
+            when += self._gap()
+        return chats, invite_at is not None, last
+
+    def _we_met(self, last_time, invited):
+        rng = self.rng
+        if invited:
+            outcome = rng.choices(['Yes', 'No', 'Not yet'], [6, 2, 2])[0]
+        else:
+            outcome = rng.choices(['Yes', 'No', 'Not yet'], [2, 5, 3])[0]
+        response = {
+            'timestamp': (last_time + timedelta(days=rng.randint(1, 14))).strftime(HINGE_FORMAT),
+            'did_meet_subject': outcome,
+        }
+        if outcome == 'Yes':
+            response['was_my_type'] = rng.random() < 0.6
+        return [response]
+
+    def match(self):
+        """One synthetic match record"""
+        rng = self.rng
+        match_time = self._match_time()
+        record = {'match': {'timestamp': match_time.strftime(HINGE_FORMAT)}}
+        if rng.random() < self.chat_rate:
+            chats, invited, last_time = self._chats(match_time)
+            record['chats'] = chats
+            if rng.random() < self.met_rate:
+                record['we_met'] = self._we_met(last_time, invited)
+        return record
+
+
+def write_export(path, matches, **options):
+    """Write `matches` synthetic matches to path as one JSON array
+
+    Matches are generated and written one at a time, so memory stays flat at
+    any size. Returns {'matches', 'conversations', 'messages'} counts.
+    """
+    generator = ExportGenerator(**options)
+    conversations = 0
+    messages = 0
+    with open(path, 'w') as f:
+        f.write('[')
+        for i in range(matches):
+            record = generator.match()
+            if 'chats' in record:
+                conversations += 1
+                messages += len(record['chats'])
+            if i:
+                f.write(',\n')
+            f.write(json.dumps(record))
+        f.write(']\n')
+    return {'matches': matches, 'conversations': conversations, 'messages': messages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output', help='path of the matches.json to write')
+    parser.add_argument('--matches', type=int, default=10000, help='number of matches')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--chat-rate', type=float, default=0.45,
+                        help='share of matches with a conversation')
+    parser.add_argument('--mean-messages', type=float, default=14,
+                        help='mean messages per conversation (log-normal)')
+    parser.add_argument('--max-messages', type=int, default=400,
+                        help='cap on messages per conversation')
+    parser.add_argument('--met-rate', type=float, default=0.1,
+                        help='share of conversations with a we_met response')
+    parser.add_argument('--start', default='2021-01-01', help='first day of the match window (YYYY-MM-DD)')
+    parser.add_argument('--days', type=int, default=3 * 365, help='length of the match window in days')
+    args = parser.parse_args()
+
+    counts = write_export(
+        args.output, args.matches, seed=args.seed, chat_rate=args.chat_rate,
+        mean_messages=args.mean_messages, max_messages=args.max_messages, met_rate=args.met_rate,
+        start=datetime.strptime(args.start, '%Y-%m-%d'), days=args.days,
+    )
+    print(f"✅ Wrote {counts['matches']:,} matches ({counts['conversations']:,} conversations, "
+          f"{counts['messages']:,} messages) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Check DataCube slices against brute-force counts over the feature rows, and
+its per-dimension rollups against story_stats' quadrant and delay summaries
+
+Runs under pytest or directly: python3 test_data_cube.py
+"""
+import json
+import random
+import tempfile
+from pathlib import Path
+
+from data_cube import ALL, DIMENSIONS, DataCube, build_cube, row_members
+from story_stats import delay_summary, met_value, quadrant_summary
+
+ROUNDS = 500
+
+
+def random_rows(n, seed):
+    """Feature rows with missing, null and out-of-range values in every dimension"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        row = {'met': rng.choice(['Yes', 'No', 'Not yet', None, 'Maybe'])}
+        for key, value in [
+            ('year', rng.choice([2021, 2022, 2024, None, '2023'])),
+            ('invite_is_concrete', rng.choice([True, False, None, 1])),
+            ('first_invite_msg_index', rng.choice([None, 0, 2, 3, 7, 15, 40, 4.5])),
+            ('first_msg_delay_minutes', rng.choice([None, -5, 0, 9.9, 10, 59, 200, 2000, 9000])),
+            ('question_density_first10', rng.choice([None, 0, 0.3, 0.31, 0.8])),
+            ('median_len_first10', rng.choice([None, 50, 120, 121, 300])),
+        ]:
+            if rng.random() < 0.9:
+                row[key] = value
+        rows.append(row)
+    return rows
+
+
+def known_outcomes(rows):
+    """(met, cube coordinates) for each row with a known outcome"""
+    out = []
+    for row in rows:
+        outcome = met_value(row.get('met'))
+        if outcome is None:
+            continue
+        coords = row_members(row)
+        out.append((outcome, coords if isinstance(coords[0], int) else (None,) + coords[1:]))
+    return out
+
+
+def brute_force(outcomes, filters):
+    wanted = [None if filters.get(dim, ALL) == ALL
+              else filters[dim] if isinstance(filters[dim], list) else [filters[dim]]
+              for dim in DIMENSIONS]
+    met = total = 0
+    for outcome, coords in outcomes:
+        if all(members is None or coord in members for members, coord in zip(wanted, coords)):
+            met += outcome
+            total += 1
+    return met, total
+
+
+def random_filters(rng, cube):
+    filters = {}
+    for dim in DIMENSIONS:
+        members = cube.members[dim] + ([2023, 1999] if dim == 'year' else [])
+        kind = rng.random()
+        if kind < 0.4:
+            continue
+        if kind < 0.5:
+            filters[dim] = ALL
+        elif kind < 0.8:
+            filters[dim] = rng.choice(members)
+        else:
+            filters[dim] = rng.sample(members, rng.randint(0, 3))
+    return filters
+
+
+def test_counts_match_brute_force():
+    rng = random.Random(0)
+    rows = random_rows(3000, 1)
+    cube = DataCube.build(rows)
+    outcomes = known_outcomes(rows)
+    assert cube.counts() == brute_force(outcomes, {})
+    for _ in range(ROUNDS):
+        filters = random_filters(rng, cube)
+        assert cube.counts(**filters) == brute_force(outcomes, filters), filters
+
+
+def test_rollups_match_story_stats():
+    rows = random_rows(5000, 2)
+    cube = DataCube.build(rows)
+    for q in quadrant_summary(rows):
+        assert cube.query(quadrant=q['id'])['total'] == q['count']
+        assert cube.query(quadrant=q['id'])['rate'] == q['rate']
+    for b in delay_summary(rows):
+        result = cube.query(delay_bin=b['id'])
+        assert (result['rate'], result['total'], result['ci']) == (b['rate'], b['count'], b['ci'])
+
+
+def test_absent_year_and_bad_members():
+    cube = DataCube.build(random_rows(500, 3))
+    assert cube.counts(year=1999) == (0, 0)
+    assert cube.query(year=[1999])['rate'] is None
+    assert cube.counts(year=[]) == (0, 0)
+    for filters in [{'year': True}, {'year': '2022'}, {'concrete': 1}, {'quadrant': 'tall-curious'},
+                    {'delay_bin': 10}, {'invite_bin': None}, {'month': 3}]:
+        try:
+            cube.counts(**filters)
+        except ValueError:
+            continue
+        raise AssertionError(f'{filters} should raise ValueError')
+
+
+def test_json_round_trip():
+    rows = random_rows(2000, 4)
+    cube = DataCube.build(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'data_cube.json'
+        cube.save(path)
+        copy = DataCube.load(path)
+        with open(Path(tmp) / 'conversations_features.json', 'w') as f:
+            json.dump(rows, f)
+        from_dir = build_cube(tmp)
+    assert copy.to_json() == cube.to_json() == from_dir.to_json()
+    assert copy.breakdown('year', concrete=True) == cube.breakdown('year', concrete=True)
+
+
+if __name__ == '__main__':
+    tests = [test_counts_match_brute_force, test_rollups_match_story_stats,
+             test_absent_year_and_bad_members, test_json_round_trip]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
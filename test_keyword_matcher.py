@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Check KeywordMatcher against the any(keyword in body) loop it replaced
+
+Runs under pytest or directly: python3 test_keyword_matcher.py
+"""
+import random
+
+from keyword_matcher import KeywordMatcher, trie_pattern
+from rebuild_features import CONCRETE_INDICATORS, INVITE_KEYWORDS
+
+ALPHABET = 'abt e?'
+ROUNDS = 2000
+
+
+def reference(keywords, text):
+    return any(keyword in text for keyword in keywords)
+
+
+def random_text(rng, max_len):
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_len)))
+
+
+def check(keywords, texts):
+    matcher = KeywordMatcher(keywords, keywords)
+    for text in texts:
+        expected = reference(keywords, text)
+        assert matcher.is_invite(text) == expected, (keywords, text, trie_pattern(keywords))
+        assert matcher.is_concrete(text) == expected, (keywords, text, trie_pattern(keywords))
+
+
+def test_random_keyword_lists():
+    """Short keywords over a tiny alphabet, so prefixes, overlaps and duplicates are common"""
+    rng = random.Random(0)
+    for _ in range(ROUNDS):
+        keywords = [random_text(rng, 4) for _ in range(rng.randint(0, 6))]
+        check(keywords, [random_text(rng, 12) for _ in range(10)])
+
+
+def test_overlapping_keywords():
+    """One keyword a prefix, suffix or infix of another"""
+    keywords = ['date ', 'at ', 'a', 'ab', 'abc', 'bc', 'c']
+    texts = ['', 'date', 'date ', 'at', 'at ', 'xbx', 'b', 'bc', 'abd', 'dat e', 'up to date ']
+    check(keywords, texts)
+    check(['abc', 'ab'], ['a', 'ab', 'abx', 'xabc'])
+    check(['ab', 'abc'], ['a', 'ab', 'abx', 'xabc'])
+
+
+def test_empty_keywords():
+    """An empty list never matches; an empty keyword matches everything"""
+    check([], ['', 'a', 'date '])
+    check([''], ['', 'a', 'date '])
+    check(['', 'abc'], ['', 'x', 'abc'])
+
+
+def test_default_lists():
+    rng = random.Random(1)
+    words = INVITE_KEYWORDS + CONCRETE_INDICATORS + ['hey', 'so', 'what', 'do', 'you', 'think', '?', '!']
+    texts = [' '.join(rng.choice(words) for _ in range(rng.randint(0, 8))) for _ in range(ROUNDS)]
+    matcher = KeywordMatcher(INVITE_KEYWORDS, CONCRETE_INDICATORS)
+    for text in texts:
+        assert matcher.is_invite(text) == reference(INVITE_KEYWORDS, text), text
+        assert matcher.is_concrete(text) == reference(CONCRETE_INDICATORS, text), text
+
+
+if __name__ == '__main__':
+    tests = [test_random_keyword_lists, test_overlapping_keywords,
+             test_empty_keywords, test_default_lists]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
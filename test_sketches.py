@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Check the sketches against exact answers: KLL rank error within rank_error,
+single and merged, and RunningStats against a direct computation
+
+Runs under pytest or directly: python3 test_sketches.py
+"""
+import bisect
+import math
+import random
+import statistics
+
+from sketches import Distribution, KLLSketch, RunningStats
+
+FRACTIONS = [i / 100 for i in range(1, 100)] + [0, 0.5, 1]
+
+
+def datasets(n=40000, seed=0):
+    rng = random.Random(seed)
+    return {
+        'uniform': [rng.random() for _ in range(n)],
+        'lognormal': [rng.lognormvariate(5, 1.5) for _ in range(n)],
+        'ties': [rng.randrange(20) for _ in range(n)],
+        'sorted': sorted(rng.random() for _ in range(n)),
+    }
+
+
+def worst_rank_error(sketch, values):
+    """Largest distance, as a fraction of the count, between a quantile's
+    target rank and the ranks its reported value actually occupies"""
+    ordered = sorted(values)
+    worst = 0
+    for q, value in zip(FRACTIONS, sketch.quantiles(FRACTIONS)):
+        low, high = bisect.bisect_left(ordered, value), bisect.bisect_right(ordered, value)
+        target = q * len(ordered)
+        worst = max(worst, max(low - target, target - high, 0) / len(ordered))
+    return worst
+
+
+def test_exact_below_k():
+    values = datasets(199)['lognormal']
+    sketch = KLLSketch(200).update(values)
+    assert sketch.exact and sketch.rank_error == 0
+    ordered = sorted(values)
+    expected = [ordered[min(len(ordered) - 1, math.floor(q * len(ordered)))] for q in FRACTIONS]
+    assert sketch.quantiles(FRACTIONS) == expected
+    assert not KLLSketch(200).update(values + [0.0]).exact
+
+
+def test_rank_error_single():
+    for name, values in datasets().items():
+        for k in (50, 200):
+            sketch = KLLSketch(k).update(values)
+            assert sketch.count == len(values)
+            error = worst_rank_error(sketch, values)
+            assert error <= sketch.rank_error, (name, k, error, sketch.rank_error)
+
+
+def test_add_matches_update():
+    values = datasets(5000)['uniform']
+    one_by_one = KLLSketch(50)
+    for value in values:
+        one_by_one.add(value)
+    assert one_by_one.levels == KLLSketch(50).update(values).levels
+
+
+def test_rank_error_merged():
+    rng = random.Random(1)
+    for name, values in datasets(seed=2).items():
+        for k in (50, 200):
+            cuts = sorted(rng.sample(range(1, len(values)), 7))
+            shards = [values[a:b] for a, b in zip([0] + cuts, cuts + [len(values)])]
+            sketches = [KLLSketch(k, seed).update(shard) for seed, shard in enumerate(shards)]
+            # Pairwise, as a tree of workers would merge them
+            while len(sketches) > 1:
+                sketches = [a.merge(b) for a, b in zip(sketches[::2], sketches[1::2])] + sketches[len(sketches) // 2 * 2:]
+            merged = sketches[0]
+            assert merged.count == len(values)
+            error = worst_rank_error(merged, values)
+            assert error <= merged.rank_error, (name, k, error, merged.rank_error)
+
+
+def test_running_stats_merge():
+    values = datasets(10000)['lognormal']
+    whole = RunningStats()
+    for value in values:
+        whole.add(value)
+    merged = RunningStats().update(values[:3000]).merge(RunningStats().update(values[3000:7500]))
+    merged.merge(RunningStats().update(values[7500:])).merge(RunningStats())
+    for stats in (whole, merged):
+        assert stats.count == len(values)
+        assert stats.min == min(values) and stats.max == max(values)
+        assert math.isclose(stats.mean, statistics.fmean(values), rel_tol=1e-9)
+        assert math.isclose(stats.variance, statistics.pvariance(values), rel_tol=1e-9)
+
+
+def test_distribution_json_round_trip():
+    distribution = Distribution(50).update(datasets(3000)['uniform'])
+    copy = Distribution.from_json(distribution.to_json())
+    assert copy.summary() == distribution.summary()
+
+
+if __name__ == '__main__':
+    tests = [test_exact_below_k, test_rank_error_single, test_add_matches_update,
+             test_rank_error_merged, test_running_stats_merge, test_distribution_json_round_trip]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
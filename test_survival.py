@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Check survival.py's vectorized Kaplan-Meier against story_stats.compute_survival,
+the per-record port of the page's computeSurvival (requires NumPy)
+
+Runs under pytest or directly: python3 test_survival.py
+"""
+import json
+import random
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from feature_store import store_path, write_store
+from story_stats import MAX_HOURS, compute_survival
+from survival import kaplan_meier_summary, load_spans
+
+START = datetime(2023, 1, 1)
+
+
+def random_rows(n, seed):
+    """Feature rows with tied, censored, missing and negative spans, some only
+    recoverable from match_time / last_msg_time"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        match = START + timedelta(seconds=rng.randrange(10 ** 7))
+        span = rng.choice([rng.expovariate(1 / 40), round(rng.uniform(0, 120) * 2) / 2, 96.0, -1.5])
+        row = {'met': rng.choice(['Yes', 'No', 'Not yet', None])}
+        kind = rng.random()
+        if kind < 0.6:
+            row['duration_hours'] = round(span, 2)
+        elif kind < 0.9:
+            # Whole seconds, so the JSON and columnar copies agree exactly
+            row['match_time'] = match.isoformat()
+            row['last_msg_time'] = (match + timedelta(seconds=round(span * 3600))).isoformat()
+        rows.append(row)
+    return rows
+
+
+def step_values(times, values, hours):
+    idx = np.searchsorted(np.asarray(times), hours, side='right') - 1
+    return np.asarray(values)[idx]
+
+
+def check(rows, spans):
+    expected = compute_survival(rows)
+    result = kaplan_meier_summary(spans)
+
+    hours = np.arange(0, MAX_HOURS + 0.125, 0.125)
+    page_curve = expected['curve']
+    assert np.allclose(step_values([p['time'] for p in page_curve], [p['survival'] for p in page_curve], hours),
+                       step_values(result['curve']['time'], result['curve']['survival'], hours))
+    assert (result['median_life'] is None) == (expected['medianLife'] is None)
+    if expected['medianLife'] is not None:
+        assert np.isclose(result['median_life'], expected['medianLife'])
+
+    hazard = result['hazard']
+    assert hazard['at_risk'] == [p['atRisk'] for p in expected['hazard']]
+    assert np.allclose(hazard['hazard'], [p['hazard'] for p in expected['hazard']])
+    assert np.allclose(hazard['smooth'], [p['smooth'] for p in expected['hazard']])
+
+
+def test_matches_story_stats():
+    for seed in range(5):
+        rows = random_rows(3000, seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = Path(tmp) / 'conversations_features.json'
+            with open(json_path, 'w') as f:
+                json.dump(rows, f)
+            json_spans, _ = load_spans(tmp)
+            write_store(rows, store_path(json_path), json_path)
+            store_spans, _ = load_spans(tmp)
+        assert np.array_equal(json_spans, store_spans, equal_nan=True)
+        check(rows, json_spans)
+
+
+def test_no_usable_spans():
+    rows = [{'duration_hours': -1}, {'met': 'Yes'}]
+    result = kaplan_meier_summary(np.array([-1.0, np.nan]))
+    assert result['conversations'] == 0 and result['median_life'] is None
+    assert compute_survival(rows)['medianLife'] is None
+
+
+if __name__ == '__main__':
+    for test in [test_matches_story_stats, test_no_usable_spans]:
+        test()
+        print(f"✅ {test.__name__}")
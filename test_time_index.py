@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Check TimeIndex range queries against brute-force counts over the message
+timestamps, the way analyze_timeline.py's summary would see them
+
+Runs under pytest or directly: python3 test_time_index.py
+"""
+import bisect
+import random
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from time_index import TimeIndex, write_index
+from timestamps import from_epoch, to_epoch
+
+ROUNDS = 300
+START = datetime(2021, 3, 17, 15, 42, 7)
+
+
+def random_messages(seed):
+    """Sorted epochs: bursts of conversation separated by quiet days and gaps
+    of months, plus one weekly slot that only rarely sees a message"""
+    rng = random.Random(seed)
+    epochs = []
+    at = to_epoch(START)
+    for _ in range(300):
+        at += rng.choice([rng.randrange(3600, 86400 * 3), rng.randrange(86400 * 20, 86400 * 60)])
+        burst = at
+        for _ in range(rng.randint(1, 30)):
+            burst += rng.randrange(0, 5400)
+            epochs.append(burst)
+    # A Wednesday 03:xx message every ~40 weeks
+    wednesday = to_epoch(datetime(2021, 3, 24, 3, 10))
+    epochs.extend(wednesday + week * 7 * 86400 for week in range(0, 200, 40))
+    return sorted(epochs)
+
+
+@lru_cache(maxsize=None)
+def _keys(epoch):
+    moment = from_epoch(epoch)
+    return moment.strftime('%Y-%m'), str(moment.year), moment.strftime('%A'), str(moment.hour)
+
+
+def brute_force(epochs, start, end):
+    """timeline_stats.json layout for the messages in the hours [start, end) covers"""
+    lo = 0 if start is None else bisect.bisect_left(epochs, to_epoch(start) // 3600 * 3600)
+    hi = len(epochs) if end is None else bisect.bisect_left(epochs, to_epoch(end) // 3600 * 3600)
+    selected = epochs[lo:max(lo, hi)]
+    if not selected:
+        return None
+    floor_hour = lambda epoch: epoch // 3600 * 3600
+    earliest = from_epoch(selected[0] if selected[0] == epochs[0] else floor_hour(selected[0]))
+    latest = from_epoch(selected[-1] if floor_hour(selected[-1]) == floor_hour(epochs[-1])
+                        else floor_hour(selected[-1]))
+    by_month, by_year, by_dow, by_hour = Counter(), Counter(), Counter(), Counter()
+    for month, year, day, hour in map(_keys, selected):
+        by_month[month] += 1
+        by_year[year] += 1
+        by_dow[day] += 1
+        by_hour[hour] += 1
+    return {
+        'earliest': earliest.isoformat(),
+        'latest': latest.isoformat(),
+        'total_messages': len(selected),
+        'duration_days': (latest - earliest).days,
+        'by_month': [{'month': month, 'count': count} for month, count in by_month.items()],
+        'by_year': dict(by_year),
+        'by_day_of_week': dict(by_dow),
+        'by_hour': dict(by_hour),
+    }
+
+
+def random_bound(rng, epochs):
+    if rng.random() < 0.1:
+        return None
+    margin = 86400 * 21
+    return from_epoch(rng.randrange(epochs[0] - margin, epochs[-1] + margin))
+
+
+def random_range(rng, epochs):
+    start = random_bound(rng, epochs)
+    kind = rng.random()
+    if kind < 0.3 and start is not None:
+        # Within a week or two, so ranges without a whole week are common
+        return start, start + timedelta(seconds=rng.randrange(0, 86400 * 14))
+    return start, random_bound(rng, epochs)
+
+
+def check_index(epochs, ranges):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'timeline_index.bin'
+        write_index(path, Counter(epoch // 3600 for epoch in epochs), epochs[0], epochs[-1])
+        with TimeIndex(path) as index:
+            assert index.header['total_messages'] == len(epochs)
+            for start, end in ranges:
+                expected = brute_force(epochs, start, end)
+                summary = index.summary(start, end)
+                # == ignores order; the index promises first-activity order too
+                assert summary == expected, (start, end)
+                if expected is not None:
+                    for key in ('by_year', 'by_day_of_week', 'by_hour'):
+                        assert list(summary[key]) == list(expected[key]), (key, start, end)
+                assert index.count(start, end) == (expected or {}).get('total_messages', 0)
+
+
+def test_random_ranges():
+    for seed in range(3):
+        rng = random.Random(seed)
+        epochs = random_messages(seed)
+        ranges = [(None, None)] + [random_range(rng, epochs) for _ in range(ROUNDS)]
+        check_index(epochs, ranges)
+
+
+def test_edges():
+    epochs = random_messages(7)
+    first, last = from_epoch(epochs[0]), from_epoch(epochs[-1])
+    hour = timedelta(hours=1)
+    ranges = [
+        (first, last), (first, last + hour), (last, None), (None, first), (None, first + hour),
+        (last + hour, None), (None, first - timedelta(days=30)), (last, first),
+        (first + timedelta(minutes=59), first + timedelta(minutes=61)),
+        (datetime(2021, 3, 22), datetime(2021, 3, 29)), (datetime(2022, 1, 1), datetime(2023, 1, 1)),
+    ]
+    check_index(epochs, ranges)
+    check_index([to_epoch(START)], [(None, None), (START, START), (START, START + hour)])
+
+
+if __name__ == '__main__':
+    for test in [test_random_ranges, test_edges]:
+        test()
+        print(f"✅ {test.__name__}")
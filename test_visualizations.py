@@ -5,19 +5,25 @@ Test what values the visualizations will show
 import json
 from datetime import datetime
 
-with open('data/conversations_features.json') as f:
-    data = json.load(f)
+from feature_store import load_features
+from sketches import Distribution
+
+data = load_features('data')
 
 print(f"Total conversations: {len(data)}")
 
-# Filter valid data
-valid = [d for d in data if d.get('duration_hours') is not None and d['duration_hours'] >= 0]
-print(f"With valid duration: {len(valid)}")
+# Stream valid durations into the sketch
+durations = Distribution()
+for d in data:
+    hours = d.get('duration_hours')
+    if hours is not None and hours >= 0:
+        durations.add(hours)
+print(f"With valid duration: {durations.count}")
 
-if valid:
-    durations = sorted([d['duration_hours'] for d in valid])
-    median_hours = durations[len(durations)//2]
-    print(f"\nMedian conversation lifespan: {median_hours:.1f} hours")
+if durations.count:
+    lifespan = durations.summary()
+    print(f"\nMedian conversation lifespan: {lifespan['p50']:.1f} hours")
+    print(f"  p10 {lifespan['p10']:.1f}h, p90 {lifespan['p90']:.1f}h, max {lifespan['max']:.1f}h")
 
 # Survival rates
 with_met = [d for d in data if d.get('met') in ['Yes', 'No', 'Not yet']]
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Persistent prefix-sum index of message activity, for any date range
+
+Messages are counted per hour and stored with running totals, so the number
+of messages in any [start, end) window is two lookups. The hours are laid
+out in whole weeks starting on a Monday, with a second set of running
+totals taken every 168 hours, so day-of-week/hour-of-day breakdowns of a
+range cost the same however long the range is. timeline_stats.json is
+rebuilt from the index, and `python3 time_index.py --start ... --end ...`
+answers range queries without reading matches.json.
+
+File layout: an 8-byte magic, a little-endian uint32 header length, a JSON
+header, then three int64 sections (hourly counts, hourly prefix sums and
+per-slot weekly prefix sums), each 8-byte aligned.
+"""
+import argparse
+import json
+import mmap
+import struct
+import sys
+from array import array
+from datetime import datetime
+from pathlib import Path
+
+from atomic_write import atomic_write
+from timestamps import from_epoch, to_epoch
+
+MAGIC = b'HTIMEIDX'
+VERSION = 1
+
+INDEX_NAME = 'timeline_index.bin'
+
+WEEK_HOURS = 168
+# Hour 0 of the epoch (1970-01-01) was a Thursday, 72 hours into its week
+EPOCH_WEEK_OFFSET = 72
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _first_above(values, lo, hi, value, stride=1, start=0):
+    """Smallest k in [lo, hi) with values[start + k * stride] > value, else hi
+
+    values must be non-decreasing along that stride (prefix sums are).
+    """
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if values[start + mid * stride] > value:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def write_index(path, hour_counts, first_epoch, last_epoch):
+    """Write an index for {hours since epoch: messages} to path
+
+    first_epoch / last_epoch are the exact first and last message times,
+    kept so the full-range summary isn't rounded to the hour.
+    """
+    if not hour_counts:
+        raise ValueError('cannot index an empty timeline')
+    first_hour = min(hour_counts)
+    base_hour = first_hour - (first_hour + EPOCH_WEEK_OFFSET) % WEEK_HOURS
+    weeks = (max(hour_counts) - base_hour) // WEEK_HOURS + 1
+    hours = weeks * WEEK_HOURS
+
+    counts = array('q', bytes(8 * hours))
+    for hour, count in hour_counts.items():
+        counts[hour - base_hour] = count
+
+    prefix = array('q', [0])
+    running = 0
+    for count in counts:
+        running += count
+        prefix.append(running)
+
+    # week_prefix[w * 168 + s]: messages in slot s over the first w weeks
+    week_prefix = array('q', bytes(8 * WEEK_HOURS))
+    for week in range(weeks):
+        row = week * WEEK_HOURS
+        week_prefix.extend([week_prefix[row + s] + counts[row + s] for s in range(WEEK_HOURS)])
+
+    sections = {}
+    offset = 0
+    for name, section in (('counts', counts), ('prefix', prefix), ('week_prefix', week_prefix)):
+        sections[name] = {'offset': offset, 'length': len(section)}
+        offset = _align(offset + len(section) * section.itemsize)
+
+    header = json.dumps({
+        'version': VERSION,
+        'byteorder': sys.byteorder,
+        'base_hour': base_hour,
+        'weeks': weeks,
+        'first_epoch': first_epoch,
+        'last_epoch': last_epoch,
+        'total_messages': running,
+        'sections': sections,
+    }).encode()
+    data_start = _align(len(MAGIC) + 4 + len(header))
+
+    with atomic_write(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        f.write(b'\0' * (data_start - f.tell()))
+        for section in (counts, prefix, week_prefix):
+            f.write(section.tobytes())
+
+
+class TimeIndex:
+    """Read-only, memory-mapped view of a time index
+
+    Ranges are half-open [start, end) naive datetimes (None = unbounded),
+    resolved to whole hours: both bounds are rounded down to the hour.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a time index')
+        (header_len,) = struct.unpack_from('<I', self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        self.header = json.loads(self._mmap[header_start:header_start + header_len])
+        if self.header['version'] != VERSION:
+            raise ValueError(f"unsupported time index version {self.header['version']}")
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {self.header['byteorder']}-endian machine")
+        self.base_hour = self.header['base_hour']
+        self.weeks = self.header['weeks']
+        self.hours = self.weeks * WEEK_HOURS
+        self.first_epoch = self.header['first_epoch']
+        self.last_epoch = self.header['last_epoch']
+        data_start = _align(header_start + header_len)
+        self._buffer = memoryview(self._mmap)
+        for name, section in self.header['sections'].items():
+            start = data_start + section['offset']
+            view = self._buffer[start:start + section['length'] * 8].cast('q')
+            setattr(self, name, view)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        try:
+            for name in self.header['sections']:
+                getattr(self, name).release()
+            self._buffer.release()
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def _offset(self, moment, default):
+        """Hour offset into the index for a datetime bound, clamped to the index"""
+        if moment is None:
+            return default
+        hour = to_epoch(moment) // 3600 - self.base_hour
+        return min(max(hour, 0), self.hours)
+
+    def _span(self, start, end):
+        a = self._offset(start, 0)
+        return a, max(a, self._offset(end, self.hours))
+
+    def count(self, start=None, end=None):
+        """Messages sent in [start, end)"""
+        a, b = self._span(start, end)
+        return self.prefix[b] - self.prefix[a]
+
+    def _slots(self, a, b):
+        """Messages per hour-of-week slot (0 = Monday 00:00) over offsets [a, b)"""
+        counts = self.counts
+        full_start = -(-a // WEEK_HOURS)
+        full_end = b // WEEK_HOURS
+        if full_start >= full_end:
+            slots = [0] * WEEK_HOURS
+            for i in range(a, b):
+                slots[i % WEEK_HOURS] += counts[i]
+            return slots
+        upper = self.week_prefix[full_end * WEEK_HOURS:(full_end + 1) * WEEK_HOURS]
+        lower = self.week_prefix[full_start * WEEK_HOURS:(full_start + 1) * WEEK_HOURS]
+        slots = [u - l for u, l in zip(upper, lower)]
+        for i in range(a, full_start * WEEK_HOURS):
+            slots[i % WEEK_HOURS] += counts[i]
+        for i in range(full_end * WEEK_HOURS, b):
+            slots[i % WEEK_HOURS] += counts[i]
+        return slots
+
+    def _first_in_slot(self, a, b, slot):
+        """First offset in [a, b) landing on slot with any messages, else None"""
+        counts = self.counts
+        i = a + (slot - a) % WEEK_HOURS
+        # Partial week at the start
+        if i < b and i < -(-a // WEEK_HOURS) * WEEK_HOURS:
+            if counts[i]:
+                return i
+            i += WEEK_HOURS
+        if i >= b:
+            return None
+        # Whole weeks: binary search the slot's weekly running total
+        week = i // WEEK_HOURS
+        last_week = (b - 1 - slot) // WEEK_HOURS
+        before = self.week_prefix[week * WEEK_HOURS + slot]
+        found = _first_above(self.week_prefix, week + 1, last_week + 2, before, WEEK_HOURS, slot)
+        if found <= last_week + 1:
+            return (found - 1) * WEEK_HOURS + slot
+        return None
+
+    def _active_bounds(self, a, b):
+        """(first, last) offsets in [a, b) with messages, or None if there are none"""
+        prefix = self.prefix
+        if prefix[b] == prefix[a]:
+            return None
+        first = _first_above(prefix, a + 1, b + 1, prefix[a]) - 1
+        last = _first_above(prefix, a, b + 1, prefix[b] - 1) - 1
+        return first, last
+
+    def breakdown(self, start=None, end=None):
+        """Messages in [start, end) by day of week and by hour of day
+
+        Keys are listed in order of first activity in the range, the same
+        order a walk through the messages would add them in.
+        """
+        a, b = self._span(start, end)
+        slots = self._slots(a, b)
+        firsts = {slot: self._first_in_slot(a, b, slot) for slot in range(WEEK_HOURS) if slots[slot]}
+        by_dow = {}
+        by_hour = {}
+        day_first = {}
+        hour_first = {}
+        for slot, first in firsts.items():
+            day, hour = divmod(slot, 24)
+            by_dow[DAYS[day]] = by_dow.get(DAYS[day], 0) + slots[slot]
+            by_hour[hour] = by_hour.get(hour, 0) + slots[slot]
+            day_first[DAYS[day]] = min(first, day_first.get(DAYS[day], first))
+            hour_first[hour] = min(first, hour_first.get(hour, first))
+        by_dow = {day: by_dow[day] for day in sorted(by_dow, key=day_first.get)}
+        by_hour = {hour: by_hour[hour] for hour in sorted(by_hour, key=hour_first.get)}
+        return by_dow, by_hour
+
+    def by_month(self, start=None, end=None):
+        """[(YYYY-MM, messages)] for every active month in [start, end)"""
+        a, b = self._span(start, end)
+        bounds = self._active_bounds(a, b)
+        if bounds is None:
+            return []
+        first, last = bounds
+        month = from_epoch((self.base_hour + first) * 3600).replace(day=1, hour=0)
+        months = []
+        while True:
+            following = month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+            lo = max(a, to_epoch(month) // 3600 - self.base_hour)
+            hi = min(b, to_epoch(following) // 3600 - self.base_hour)
+            count = self.prefix[hi] - self.prefix[lo]
+            if count:
+                months.append((month.strftime('%Y-%m'), count))
+            if hi > last:
+                return months
+            month = following
+
+    def summary(self, start=None, end=None):
+        """Activity in [start, end) in the timeline_stats.json layout
+
+        earliest / latest are exact when the range holds the first / last
+        message overall, and otherwise the start of the first / last active
+        hour in the range.
+        """
+        a, b = self._span(start, end)
+        bounds = self._active_bounds(a, b)
+        if bounds is None:
+            return None
+        first, last = bounds
+        earliest = self.first_epoch if self.first_epoch // 3600 - self.base_hour == first \
+            else (self.base_hour + first) * 3600
+        latest = self.last_epoch if self.last_epoch // 3600 - self.base_hour == last \
+            else (self.base_hour + last) * 3600
+        earliest, latest = from_epoch(earliest), from_epoch(latest)
+
+        months = self.by_month(start, end)
+        by_year = {}
+        for month, count in months:
+            by_year[month[:4]] = by_year.get(month[:4], 0) + count
+        by_dow, by_hour = self.breakdown(start, end)
+        return {
+            'earliest': earliest.isoformat(),
+            'latest': latest.isoformat(),
+            'total_messages': self.prefix[b] - self.prefix[a],
+            'duration_days': (latest - earliest).days,
+            'by_month': [{'month': month, 'count': count} for month, count in months],
+            'by_year': by_year,
+            'by_day_of_week': by_dow,
+            'by_hour': {str(hour): count for hour, count in by_hour.items()}
+        }
+
+
+def _parse_bound(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default='data', help='folder holding the time index')
+    parser.add_argument('--start', help='range start, inclusive (YYYY-MM-DD[THH:MM])')
+    parser.add_argument('--end', help='range end, exclusive (YYYY-MM-DD[THH:MM])')
+    parser.add_argument('--rebuild-stats', action='store_true',
+                        help='rewrite timeline_stats.json from the index (whole range)')
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    index_path = data_dir / INDEX_NAME
+    if not index_path.exists():
+        print(f"❌ No time index at {index_path}; run analyze_timeline.py first")
+        sys.exit(1)
+
+    with TimeIndex(index_path) as index:
+        if args.rebuild_stats:
+            output_path = data_dir / 'timeline_stats.json'
+            with atomic_write(output_path) as f:
+                json.dump(index.summary(), f, indent=2)
+            print(f"✅ Timeline data saved to {output_path}")
+            return
+
+        summary = index.summary(_parse_bound(args.start), _parse_bound(args.end))
+
+    if summary is None:
+        print("📅 No messages in that range")
+        return
+    print(f"📅 {summary['total_messages']:,} messages, {summary['earliest']} to {summary['latest']}")
+    print(f"\n📊 Activity by Day of Week:")
+    for day in DAYS:
+        print(f"  {day:9s}: {summary['by_day_of_week'].get(day, 0):6d}")
+    print(f"\n🕐 Activity by Hour:")
+    for hour in range(24):
+        print(f"  {hour:02d}:00-{hour + 1:02d}:00: {summary['by_hour'].get(str(hour), 0):6d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Fast decoding of Hinge export timestamps ('YYYY-MM-DD HH:MM:SS')
+"""
+from array import array
+from datetime import datetime, timedelta
+
+HINGE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+# Placeholder for blank or unparseable entries in position-preserving arrays
+MISSING = -2 ** 63
+
+
+def _fast_parse(value):
+    # The export always uses the fixed-width layout; for exactly that shape
+    # the C fromisoformat agrees with strptime and is ~20x faster
+    if (len(value) == 19 and value[10] == ' ' and value[4] == '-' and value[7] == '-'
+            and value[13] == ':' and value[16] == ':'):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    # Anything else (unpadded fields, garbage) gets strptime's verdict
+    return datetime.strptime(value, HINGE_FORMAT)
+
+
+def to_epoch(ts):
+    """datetime -> int seconds since 1970-01-01 (timestamps are naive, read as UTC)"""
+    return (ts.toordinal() - EPOCH_ORDINAL) * 86400 + ts.hour * 3600 + ts.minute * 60 + ts.second
+
+
+def from_epoch(seconds):
+    """int seconds since 1970-01-01 -> naive datetime"""
+    return EPOCH + timedelta(seconds=seconds)
+
+
+class TimestampDecoder:
+    """Decode export timestamps, counting the ones that can't be parsed
+
+    Blank values (None / '') are skipped without counting; anything else that
+    doesn't parse is tallied in `failures` instead of being silently dropped.
+    """
+
+    def __init__(self):
+        self.parsed = 0
+        self.failures = 0
+
+    def parse(self, value):
+        """Timestamp string -> datetime, or None if blank / unparseable"""
+        if not value:
+            return None
+        if not isinstance(value, str):
+            self.failures += 1
+            return None
+        try:
+            ts = _fast_parse(value)
+        except ValueError:
+            self.failures += 1
+            return None
+        self.parsed += 1
+        return ts
+
+    def epoch(self, value):
+        """Timestamp string -> int epoch seconds, or None if blank / unparseable"""
+        ts = self.parse(value)
+        return to_epoch(ts) if ts is not None else None
+
+    def epochs(self, values, keep_missing=False):
+        """Decode a whole batch of timestamps into an int64 epoch array
+
+        By default blanks and failures are left out; with keep_missing they
+        stay in place as MISSING so positions line up with the input.
+        """
+        out = array('q')
+        append = out.append
+        parse = self.parse
+        for value in values:
+            ts = parse(value)
+            if ts is not None:
+                append((ts.toordinal() - EPOCH_ORDINAL) * 86400
+                       + ts.hour * 3600 + ts.minute * 60 + ts.second)
+            elif keep_missing:
+                append(MISSING)
+        return out
+
+    def merge(self, other):
+        """Add another decoder's counts into this one"""
+        self.parsed += other.parsed
+        self.failures += other.failures
+
+
+def as_datetime64(epochs):
+    """View an epoch array from TimestampDecoder.epochs as NumPy datetime64[s]
+
+    MISSING entries come out as NaT. Requires NumPy.
+    """
+    import numpy as np
+    return np.frombuffer(epochs, dtype=np.int64).view('datetime64[s]')
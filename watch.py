@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Watch data/ and recompute the dashboard outputs whenever the export changes
+
+Polls the export (data/matches.json, or a Hinge zip dropped into data/)
+and the feature table for changes, waits for a burst of writes to settle -
+e.g. a large export still being copied in - and then reruns only the
+stages that depend on what changed:
+
+  matches.json                 -> funnel, timeline, features, then everything below
+  conversations_features.json  -> personal stats, story stats, data cube
+
+The export is read through its snapshot (snapshot.py) and features reuse the
+incremental cache, so an update takes seconds. The dashboard is served at
+the same time (stats_server.py) and every output whose bytes actually changed
+is announced on /events, where index.html picks it up and re-renders just
+the charts built from it.
+"""
+import argparse
+import asyncio
+import json
+import time
+import traceback
+from pathlib import Path
+
+from feature_store import store_path, write_store
+from hinge_export import export_path
+from keyword_matcher import KeywordMatcher
+from pipeline import STAGES, close_stages, discard_stages, run_store
+from rebuild_features import INVITE_MATCHER
+from snapshot import file_hash, open_snapshot
+from stats_server import StatsServer
+
+EXPORT = 'matches.json'  # whichever file hinge_export.export_path picks
+FEATURES = 'conversations_features.json'
+
+# Watched input -> the stages it feeds, in pipeline order
+EXPORT_STAGES = ['funnel', 'timeline', 'features']
+FEATURE_STAGES = ['personal', 'story', 'cube']
+
+
+def _version(path):
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _digest(path):
+    try:
+        return file_hash(path)
+    except OSError:
+        return None
+
+
+class Watcher:
+    """Recomputes the outputs in data_dir that depend on a changed input
+
+    seen holds the (mtime, size) of each input as of the last update, so the
+    watcher's own writes to the feature table don't trigger it again; digests
+    their content hashes, so a touched but unchanged input is skipped.
+    """
+
+    def __init__(self, data_dir, matcher=INVITE_MATCHER):
+        self.data_dir = Path(data_dir)
+        self.matcher = matcher
+        self.seen = {}
+        self.digests = {}
+        self.updates = 0
+
+    def scan(self):
+        """Current (mtime, size) of each watched input, None when missing"""
+        return {name: _version(self.path(name)) for name in (EXPORT, FEATURES)}
+
+    def path(self, name):
+        return export_path(self.data_dir) if name == EXPORT else self.data_dir / name
+
+    def changed(self, versions):
+        return {name for name, version in versions.items()
+                if version is not None and version != self.seen.get(name)}
+
+    def modified(self, changed):
+        """The inputs among changed whose bytes differ from the last update's"""
+        digests = {name: _digest(self.path(name)) for name in changed}
+        modified = {name for name, digest in digests.items() if digest != self.digests.get(name)}
+        self.digests.update(digests)
+        return modified
+
+    def stages_for(self, changed):
+        """Names of the stages to rerun for a set of changed inputs"""
+        if EXPORT in changed:
+            return EXPORT_STAGES + FEATURE_STAGES
+        if FEATURES in changed:
+            return FEATURE_STAGES
+        return []
+
+    def update(self, changed):
+        """Rerun the stages affected by changed; returns the outputs whose bytes changed"""
+        names = self.stages_for(changed)
+        # Hashed before the stages exist, so the digests are of the previous outputs
+        paths = [self.data_dir / STAGES[name].output for name in names]
+        before = {path: _digest(path) for path in paths}
+        options = {'features': {'matcher': self.matcher, 'incremental': True}}
+        stages = {name: STAGES[name](self.data_dir, **options.get(name, {})) for name in names}
+
+        if EXPORT in changed:
+            try:
+                snapshot = open_snapshot(self.data_dir, self.matcher)
+            except BaseException:
+                discard_stages(stages)
+                raise
+            with snapshot:
+                results = run_store(snapshot, stages)
+        else:
+            # Nothing to stream: these stages read the feature table on close,
+            # through a columnar store that has to be rebuilt from the edit
+            features = self.data_dir / FEATURES
+            with open(features) as f:
+                write_store(json.load(f), store_path(features), features)
+            results = close_stages(stages)
+
+        self.updates += 1
+        for name, result in results.items():
+            print(f"   {name}: {result}")
+        return [path.name for path in paths if _digest(path) != before[path]]
+
+    async def run(self, events=None, interval=1.0, settle=2.0):
+        """Poll every interval seconds until cancelled, publishing updates to events"""
+        while True:
+            versions = self.scan()
+            changed = self.changed(versions)
+            if not changed:
+                await asyncio.sleep(interval)
+                continue
+            # Coalesce a burst of writes: wait until the inputs stop changing
+            while True:
+                await asyncio.sleep(settle)
+                latest = self.scan()
+                if latest == versions:
+                    break
+                versions = latest
+                changed |= self.changed(versions)
+            changed = await asyncio.to_thread(self.modified, changed)
+            if not changed:
+                self.seen = versions
+                continue
+
+            print(f"🔄 {', '.join(sorted(changed))} changed, updating...")
+            started = time.perf_counter()
+            try:
+                files = await asyncio.to_thread(self.update, changed)
+            except Exception:
+                # Most likely an export caught mid-write; the next change retries
+                traceback.print_exc()
+                print("❌ Update failed, waiting for the next change")
+                files = None
+                for name in changed:
+                    self.digests.pop(name, None)
+            # Our own rewrite of the feature table is the new baseline
+            self.seen = self.scan()
+            self.digests[FEATURES] = await asyncio.to_thread(_digest, self.data_dir / FEATURES)
+            if files is None:
+                continue
+            elapsed = time.perf_counter() - started
+            if files:
+                print(f"✅ Updated {', '.join(files)} in {elapsed:.1f}s")
+                if events is not None:
+                    events.publish(files)
+            else:
+                print(f"✅ No output changed ({elapsed:.1f}s)")
+
+
+async def watch(watcher, server, host, port, interval, settle):
+    tasks = [watcher.run(server.events if server else None, interval, settle)]
+    if server is not None:
+        tasks.append(server.serve(host, port))
+    await asyncio.gather(*tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default='data',
+                        help='folder holding matches.json and receiving the outputs')
+    parser.add_argument('--keywords', metavar='JSON',
+                        help='invite/concrete keyword lists for the features stage')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='seconds between checks for changes')
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help='seconds the inputs must stay unchanged before updating')
+    parser.add_argument('--no-serve', action='store_true',
+                        help='only recompute; do not serve the dashboard')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on')
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    matcher = KeywordMatcher.from_file(args.keywords) if args.keywords else INVITE_MATCHER
+    watcher = Watcher(data_dir, matcher)
+    # The page and its code live here; data_dir is mounted as its ./data/
+    server = None if args.no_serve else StatsServer(Path(__file__).parent, data_dir)
+    print(f"👀 Watching {export_path(data_dir)} (Ctrl-C to stop)")
+    try:
+        asyncio.run(watch(watcher, server, args.host, args.port, args.interval, args.settle))
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+
+
+if __name__ == '__main__':
+    main()